@@ -10,6 +10,10 @@ artifactor:
             enabled: True
             plugin: logger
             level: DEBUG
+
+Log records are either sent one by one with the ``log_message`` hook, or in batches with the
+``log_messages`` hook when the ``cfme`` log handler runs buffered (see ``log_batch_size`` in
+:py:mod:`fixtures.artifactor_plugin`).
 """
 import os
 from logging import makeLogRecord
@@ -29,6 +33,7 @@ class Logger(ArtifactorBasePlugin):
         self.register_plugin_hook('start_test', self.start_test)
         self.register_plugin_hook('finish_test', self.finish_test)
         self.register_plugin_hook('log_message', self.log_message)
+        self.register_plugin_hook('log_messages', self.log_messages)
 
     def configure(self):
         self.configured = True
@@ -65,15 +70,22 @@ class Logger(ArtifactorBasePlugin):
             slaveid = "Master"
         self.store[slaveid].in_progress = False
 
-    @ArtifactorBasePlugin.check_configured
-    def log_message(self, log_record, slaveid):
+    def _handle_record(self, log_record, slaveid):
         # json transport fallout: args must be a dict or a tuple, json makes a tuple into a list
         args = log_record['args']
         log_record['args'] = tuple(args) if isinstance(args, list) else args
         record = makeLogRecord(log_record)
-        if not slaveid:
-            slaveid = "Master"
         if slaveid in self.store:
             handler = self.store[slaveid].handler
             if handler and record.levelno >= handler.level:
                 handler.handle(record)
+
+    @ArtifactorBasePlugin.check_configured
+    def log_message(self, log_record, slaveid):
+        self._handle_record(log_record, slaveid or "Master")
+
+    @ArtifactorBasePlugin.check_configured
+    def log_messages(self, log_records, slaveid):
+        slaveid = slaveid or "Master"
+        for log_record in log_records:
+            self._handle_record(log_record, slaveid)
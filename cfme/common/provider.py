@@ -15,6 +15,7 @@ from cfme.utils.appliance import Navigatable
 from cfme.utils.appliance.implementations.ui import navigate_to, navigator
 from cfme.utils.log import logger
 from cfme.utils.net import resolve_hostname
+from cfme.utils.rest import index_resources, query_collection
 from cfme.utils.stats import tol_check
 from cfme.utils.update import Updateable
 from cfme.utils.varmeth import variable
@@ -933,38 +934,51 @@ class BaseProvider(Taggable, Updateable, Navigatable):
         Returns a dictionary mapping template ids to their name, type, and guid
         """
         # TODO: Move to TemplateCollection.all
-        all_details = {}
-        for id in self.get_all_template_ids():
-            all_details[id] = self.get_template_details(id)
-        return all_details
+        return {
+            template['id']: {key: template[key] for key in ('name', 'type', 'guid')}
+            for template in query_collection(
+                self.appliance.rest_api, 'templates', ['name', 'type', 'guid'])}
+
+    def get_vm_index(self, refresh=False):
+        """
+        Returns a dictionary mapping VM names to their id, name, type and guid
+
+        The VMs are queried in bulk and kept for a short while, ``refresh`` queries them again.
+        When several VMs have the same name, the first one the API returns is in the index.
+        """
+        # TODO: Move to VMCollection.all
+        return index_resources(
+            query_collection(self.appliance.rest_api, 'vms', ['name', 'type', 'guid'],
+                             refresh=refresh),
+            'name')
+
+    def get_template_index(self):
+        """
+        Returns a dictionary mapping template guids to their id, name, type and guid
+        """
+        # TODO: Move to TemplateCollection.all
+        return index_resources(
+            query_collection(self.appliance.rest_api, 'templates', ['name', 'type', 'guid']),
+            'guid')
 
     def get_vm_id(self, vm_name):
         """
         Return the ID associated with the specified VM name
         """
         # TODO: Get Provider object from VMCollection.find, then use VM.id to get the id
-        logger.debug('Retrieving the ID for VM: {}'.format(vm_name))
-        for vm_id in self.get_all_vm_ids():
-            details = self.get_vm_details(vm_id)
-            if details['name'] == vm_name:
-                return vm_id
+        return self.get_vm_ids([vm_name]).get(vm_name)
 
     def get_vm_ids(self, vm_names):
         """
         Returns a dictionary mapping each VM name to it's id
         """
         # TODO: Move to VMCollection.find or VMCollection.all
-        name_list = vm_names[:]
-        logger.debug('Retrieving the IDs for {} VM(s)'.format(len(name_list)))
-        id_map = {}
-        for vm_id in self.get_all_vm_ids():
-            if not name_list:
-                break
-            vm_name = self.get_vm_details(vm_id)['name']
-            if vm_name in name_list:
-                id_map[vm_name] = vm_id
-                name_list.remove(vm_name)
-        return id_map
+        logger.debug('Retrieving the IDs for {} VM(s)'.format(len(vm_names)))
+        vm_index = self.get_vm_index()
+        if not all(vm_name in vm_index for vm_name in vm_names):
+            # the VMs could have been added since the index was queried
+            vm_index = self.get_vm_index(refresh=True)
+        return {vm_name: vm_index[vm_name]['id'] for vm_name in vm_names if vm_name in vm_index}
 
     def get_template_guids(self, template_dict):
         """
@@ -973,17 +987,15 @@ class BaseProvider(Taggable, Updateable, Navigatable):
         mapping a provider to its templates
         """
         # TODO: Move to TemplateCollection
+        guids_by_name = {}
+        for guid, template in self.get_template_index().items():
+            if self.db_types[0] in template['type']:
+                guids_by_name.setdefault(template['name'], []).append(guid)
         result_list = []
-        all_template_details = self.get_all_template_details()
         for provider, templates in template_dict.items():
             for template_name in templates:
-                inner_tuple = ()
-                for id in all_template_details:
-                    if ((all_template_details[id]['name'] == template_name) and
-                            (self.db_types[0] in all_template_details[id]['type'])):
-                        inner_tuple += (all_template_details[id]['guid'],)
-                        inner_tuple += (provider,)
-                        result_list.append(inner_tuple)
+                for guid in guids_by_name.get(template_name, []):
+                    result_list.append((guid, provider))
         return result_list
 
 
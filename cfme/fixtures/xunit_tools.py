@@ -325,6 +325,9 @@ def pytest_collection_modifyitems(config, items):
     """Generates the XML files using collected items."""
     if not (config.getoption('generate_xmls') or config.getoption('generate_legacy_xmls')):
         return
+    if pytest.store.parallelizer_role == 'slave':
+        # The master generates them from the whole collection
+        return
 
     gen_duplicates_log(items)
 
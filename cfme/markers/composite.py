@@ -17,6 +17,10 @@ def pytest_collection_modifyitems(session, config, items):
     from fixtures.artifactor_plugin import get_test_idents
     from fixtures.pytest_store import store
 
+    if store.parallelizer_role == 'slave':
+        # The master uncollected them already, slaves run only what they get from it
+        return
+
     from cfme.utils.log import logger
     from cfme.utils.trackerbot import composite_uncollect
 
@@ -45,6 +45,9 @@ def pytest_collection_modifyitems(session, config, items):
     # the other, it made sense to just combine this here for now and organize these marks better
     # later on.
     yield
+    if pytest.store.parallelizer_role == 'slave':
+        # The master orders the tests, slaves collect module by module
+        return
 
     # Split marked and unmarked tests
     split_tests = defaultdict(list)
@@ -68,6 +68,9 @@ def pytest_itemcollected(item):
 
 
 def pytest_collection_modifyitems(session, config, items):
+    if pytest.store.parallelizer_role == 'slave':
+        # The master printed and checked the streams already
+        return
     # Just to print out the appliance's streams
     from fixtures.terminalreporter import reporter
 
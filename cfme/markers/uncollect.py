@@ -117,31 +117,42 @@ def uncollectif(item):
         return True
 
 
+def is_uncollected(item):
+    """Whether the item has the uncollect mark or its uncollectif condition holds"""
+    return bool(item.get_marker('uncollect')) or not uncollectif(item)
+
+
 def pytest_collection_modifyitems(session, config, items):
     from fixtures.pytest_store import store
     len_collected = len(items)
 
     new_items = []
-
-    from cfme.utils.path import log_path
-    with log_path.join('uncollected.log').open('w') as f:
-        for item in items:
-            # First filter out all items who have the uncollect mark
-            if item.get_marker('uncollect') or not uncollectif(item):
-                # if a uncollect marker has been added,
-                # give it priority for the explanation
-                uncollect = item.get_marker('uncollect')
-                marker = uncollect or item.get_marker('uncollectif')
-                if marker:
-                    reason = marker.kwargs.get('reason', "No reason given")
-                else:
-                    reason = None
-                f.write("{} - {}\n".format(item.name, reason))
+    uncollected = []
+
+    for item in items:
+        # First filter out all items who have the uncollect mark
+        if is_uncollected(item):
+            # if a uncollect marker has been added,
+            # give it priority for the explanation
+            uncollect = item.get_marker('uncollect')
+            marker = uncollect or item.get_marker('uncollectif')
+            if marker:
+                reason = marker.kwargs.get('reason', "No reason given")
             else:
-                new_items.append(item)
+                reason = None
+            uncollected.append((item.name, reason))
+        else:
+            new_items.append(item)
 
     items[:] = new_items
 
+    # Slaves collect module by module, the master logs what the whole collection uncollected
+    if store.parallelizer_role != 'slave':
+        from cfme.utils.path import log_path
+        with log_path.join('uncollected.log').open('w') as f:
+            for name, reason in uncollected:
+                f.write("{} - {}\n".format(name, reason))
+
     len_filtered = len(items)
     filtered_count = len_collected - len_filtered
     store.uncollection_stats['uncollectif'] = filtered_count
@@ -64,6 +64,7 @@ pytest_plugins = (
     'fixtures.log',
     'fixtures.maximized',
     'fixtures.merkyl',
+    'fixtures.nav_timing',
     'fixtures.nelson',
     'fixtures.node_annotate',
     'fixtures.page_screenshots',
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 import json
 import os
+import random
 import requests
+import time
+from contextlib import contextmanager
 
 import attr
 
@@ -10,7 +13,7 @@ from cfme.utils.appliance import current_appliance, IPAppliance
 from cfme.utils.conf import credentials, env
 # TODO: use custom wait_for logger fitting sprout
 from cfme.utils.log import logger
-from cfme.utils.wait import wait_for
+from cfme.utils.wait import TimedOutError, wait_for
 
 
 class SproutException(Exception):
@@ -30,41 +33,125 @@ class APIMethodCall(object):
         return self._client.call_method(self._method_name, *args, **kwargs)
 
 
+@attr.s
+class BatchCall(object):
+    """A call made in :py:meth:`SproutClient.batch`, its result is known after the batch"""
+    _client = attr.ib()
+    _method_name = attr.ib()
+    _data = attr.ib(repr=False)
+    _response = attr.ib(default=None, init=False, repr=False)
+
+    @property
+    def done(self):
+        return self._response is not None
+
+    @property
+    def result(self):
+        """The result of the call, raises the same exceptions :py:meth:`call_method` would"""
+        if self._response is None:
+            raise SproutException("Batch with {} was not sent yet".format(self._method_name))
+        return self._client._result(self._response)
+
+
 @attr.s
 class SproutClient(object):
+    #: Statuses Sprout answers with while it is being updated
+    RETRY_STATUSES = {502, 503}
+    RETRY_TIMEOUT = 60
+    RETRY_DELAY = 0.5
+    RETRY_MAX_DELAY = 8
+
     _proto = attr.ib(default="http")
     _host = attr.ib(default="localhost")
     _port = attr.ib(default=8000)
     _entry = attr.ib(default="appliances/api")
     _auth = attr.ib(default=None)
+    # Keeps the connection to Sprout open between the calls
+    _session = attr.ib(default=attr.Factory(requests.Session), repr=False)
+    _batch = attr.ib(default=None, init=False, repr=False)
 
     @property
     def api_entry(self):
         return "{}://{}:{}/{}".format(self._proto, self._host, self._port, self._entry)
 
-    def _post(self, **data):
-        return requests.post(self.api_entry, data=json.dumps(data))
-
-    def _call_post(self, **data):
-        """Protect from the Sprout being updated (error 502,503)"""
-        result = wait_for(
-            lambda: self._post(**data),
-            num_sec=60,
-            fail_condition=lambda r: r.status_code in {502, 503},
-            delay=2,
-        )
-        return result.out.json()
-
-    def call_method(self, name, *args, **kwargs):
+    def _post(self, data):
+        return self._session.post(self.api_entry, data=json.dumps(data))
+
+    def _call_post(self, data):
+        """Protect from the Sprout being updated (error 502,503)
+
+        Retries with exponentially growing delays, randomized so that the clients that failed
+        together do not come back at the same time.
+        """
+        deadline = time.time() + self.RETRY_TIMEOUT
+        delay = self.RETRY_DELAY
+        while True:
+            response = self._post(data)
+            if response.status_code not in self.RETRY_STATUSES:
+                return response.json()
+            if time.time() >= deadline:
+                raise TimedOutError("Sprout answered {} for {} seconds".format(
+                    response.status_code, self.RETRY_TIMEOUT))
+            time.sleep(min(random.uniform(0, delay), max(0, deadline - time.time())))
+            delay = min(2 * delay, self.RETRY_MAX_DELAY)
+
+    def _request_data(self, name, args, kwargs):
         req_data = {
             "method": name,
             "args": args,
             "kwargs": kwargs,
         }
-        logger.info("SPROUT: Called {} with {} {}".format(name, args, kwargs))
         if self._auth is not None:
             req_data["auth"] = self._auth
-        result = self._call_post(**req_data)
+        return req_data
+
+    @contextmanager
+    def batch(self):
+        """Sends the calls made in the block to Sprout in one request when the block ends.
+
+        :py:meth:`call_method` returns a :py:class:`BatchCall` meanwhile, the results are
+        available after the block. A failing call does not affect the others.
+
+        .. code-block:: python
+
+            with client.batch():
+                checks = {pool: client.request_check(pool) for pool in pools}
+            for pool, check in checks.items():
+                result = check.result
+        """
+        if self._batch is not None:
+            # Part of the batch around
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+        finally:
+            calls, self._batch = self._batch, None
+        if calls:
+            self._send_batch(calls)
+
+    def _send_batch(self, calls):
+        logger.info("SPROUT: Sending a batch of %d calls", len(calls))
+        responses = self._call_post([call._data for call in calls])
+        if isinstance(responses, list):
+            for call, response in zip(calls, responses):
+                call._response = response
+        else:
+            # Sprout that does not know batches
+            for call in calls:
+                call._response = self._call_post(call._data)
+
+    def call_method(self, name, *args, **kwargs):
+        logger.info("SPROUT: Called {} with {} {}".format(name, args, kwargs))
+        req_data = self._request_data(name, args, kwargs)
+        if self._batch is not None:
+            call = BatchCall(self, name, req_data)
+            self._batch.append(call)
+            return call
+        return self._result(self._call_post(req_data))
+
+    def _result(self, result):
         try:
             if result["status"] == "exception":
                 raise SproutException(
@@ -112,15 +199,41 @@ class SproutClient(object):
             provider_type=provider_type, group=stream, provider=provider, lease_time=lease_time,
             ram=ram, cpu=cpu, count=count
         )
-        wait_for(
-            lambda: self.call_method('request_check', str(request_id))['finished'], num_sec=300,
+        data = self.wait_for_pool(
+            request_id, num_sec=300,
             message='provision {} appliance(s) from sprout'.format(count))
-        data = self.call_method('request_check', str(request_id))
         logger.debug(data)
         appliances = []
         for appliance in data['appliances']:
             appliances.append(IPAppliance(hostname=appliance['ip_address']))
         return appliances, request_id
 
+    def wait_for_pool(self, request_id, num_sec=300, message=None):
+        """Waits until the pool is finished and returns its status.
+
+        Sprout answers ``wait_for_pool_change`` once the state of the pool changes, so there is
+        no need to poll ``request_check``. Sprout versions without it are polled.
+        """
+        message = message or 'sprout pool {} to finish'.format(request_id)
+        deadline = time.time() + num_sec
+        version = None
+        while True:
+            try:
+                data = self.call_method(
+                    'wait_for_pool_change', str(request_id), version=version,
+                    timeout=max(0, min(20, int(deadline - time.time()))))
+            except SproutException as e:
+                if 'NameError' not in str(e):
+                    raise
+                wait_for(
+                    lambda: self.call_method('request_check', str(request_id))['finished'],
+                    num_sec=max(0, deadline - time.time()), message=message)
+                return self.call_method('request_check', str(request_id))
+            if data['finished']:
+                return data
+            if time.time() >= deadline:
+                raise TimedOutError('Could not do {} in {} seconds'.format(message, num_sec))
+            version = data['version']
+
     def destroy_pool(self, pool_id):
         self.call_method('destroy_pool', id=pool_id)
@@ -1,9 +1,11 @@
 import re
 import pytest
 import random
+import time
 import attr
 from six.moves.urllib.parse import urlparse
 from threading import Timer
+import diaper
 from cfme.utils import at_exit, conf
 # todo: use own logger after logfix merge
 from cfme.utils.log import logger as log
@@ -65,6 +67,31 @@ def dump_pool_info(log, pool_data):
             log.info("\t\t%s: %s", key, appliance[key])
 
 
+def sprout_appliance_args(appliance):
+    """Turns the appliance data from a Sprout pool into ``--appliance`` style arguments"""
+    appliance_args = {'hostname': appliance['url']}
+    provider_data = conf.cfme_data['management_systems'].get(appliance['provider'])
+    if provider_data and provider_data['type'] == 'openshift':
+        ocp_creds = conf.credentials[provider_data['credentials']]
+        ssh_creds = conf.credentials[provider_data['ssh_creds']]
+        extra_args = {
+            'container': appliance['container'],
+            'db_host': appliance['db_host'],
+            'project': appliance['project'],
+            'openshift_creds': {
+                'hostname': provider_data['hostname'],
+                'username': ocp_creds['username'],
+                'password': ocp_creds['password'],
+                'ssh': {
+                    'username': ssh_creds['username'],
+                    'password': ssh_creds['password'],
+                }
+            }
+        }
+        appliance_args.update(extra_args)
+    return appliance_args
+
+
 def mangle_in_sprout_appliances(config):
     """
     this helper function resets the appliances option of the config and mangles in
@@ -80,28 +107,7 @@ def mangle_in_sprout_appliances(config):
     appliances = config.option.appliances
     log.info("Appliances were provided:")
     for appliance in requested_appliances:
-
-        appliance_args = {'hostname': appliance['url']}
-        provider_data = conf.cfme_data['management_systems'].get(appliance['provider'])
-        if provider_data and provider_data['type'] == 'openshift':
-            ocp_creds = conf.credentials[provider_data['credentials']]
-            ssh_creds = conf.credentials[provider_data['ssh_creds']]
-            extra_args = {
-                'container': appliance['container'],
-                'db_host': appliance['db_host'],
-                'project': appliance['project'],
-                'openshift_creds': {
-                    'hostname': provider_data['hostname'],
-                    'username': ocp_creds['username'],
-                    'password': ocp_creds['password'],
-                    'ssh': {
-                        'username': ssh_creds['username'],
-                        'password': ssh_creds['password'],
-                    }
-                }
-            }
-            appliance_args.update(extra_args)
-        appliances.append(appliance_args)
+        appliances.append(sprout_appliance_args(appliance))
         log.info("- %s is %s", appliance['url'], appliance['name'])
 
     mgr.reset_timer()
@@ -193,6 +199,15 @@ class SproutManager(object):
             if jenkins_job:
                 self.clean_jenkins_job(jenkins_job)
 
+        self.pool = self.client.request_appliances(
+            provision_request.group, **self.request_kwargs(provision_request))
+        log.info("Pool %s. Waiting for fulfillment ...", self.pool)
+
+        if provision_request.desc is not None:
+            self.client.set_pool_description(self.pool, provision_request.desc)
+
+    @staticmethod
+    def request_kwargs(provision_request):
         kargs = {
             'count': provision_request.count,
             'version': provision_request.version,
@@ -206,14 +221,7 @@ class SproutManager(object):
         }
         if provision_request.template_type:
             kargs['template_type'] = provision_request.template_type
-
-        self.pool = self.client.request_appliances(
-            provision_request.group, **kargs
-        )
-        log.info("Pool %s. Waiting for fulfillment ...", self.pool)
-
-        if provision_request.desc is not None:
-            self.client.set_pool_description(self.pool, provision_request.desc)
+        return kargs
 
     def destroy_pool(self):
         try:
@@ -293,6 +301,81 @@ class SproutManager(object):
             self.reset_timer(timeout=timeout)
 
 
+@attr.s
+class SproutReplacementPolicy(object):
+    """Requests a replacement appliance from Sprout for every parallelizer slave that dies
+
+    Replacements are requested as separate one-appliance pools, which are merged into the
+    session's pool once fulfilled, so they share its lease and get destroyed with it. Requests
+    not fulfilled within the provisioning timeout are given up on.
+    """
+    manager = attr.ib()
+    provision_request = attr.ib()
+    check_interval = attr.ib(default=60)
+    # {pool id: time requested}
+    requests = attr.ib(init=False, default=attr.Factory(dict))
+    last_check = attr.ib(init=False, default=0, repr=False)
+
+    @property
+    def pending(self):
+        return len(self.requests)
+
+    def slave_died(self, slave):
+        request = attr.evolve(self.provision_request, count=1)
+        try:
+            pool = self.manager.client.request_appliances(
+                request.group, **self.manager.request_kwargs(request))
+        except Exception as e:
+            log.error('Could not request a replacement for %s from Sprout: %s', slave.id, e)
+            return
+        log.info('Requested a replacement for %s in Sprout pool %s', slave.id, pool)
+        self.requests[pool] = time.time()
+
+    def poll(self):
+        """Returns the ``--appliance`` style arguments of replacements fulfilled since last time"""
+        if not self.requests or time.time() - self.last_check < self.check_interval:
+            return []
+        self.last_check = time.time()
+        fulfilled = []
+        timeout = self.provision_request.provision_timeout * 60
+        client = self.manager.client
+        with client.batch():
+            checks = {pool: client.request_check(pool) for pool in self.requests}
+        for pool, requested in list(self.requests.items()):
+            try:
+                result = checks[pool].result
+            except SproutException as e:
+                log.error('Replacement Sprout pool %s failed: %s', pool, e)
+                del self.requests[pool]
+                continue
+            if not result['fulfilled']:
+                if self.last_check - requested > timeout:
+                    log.error('Replacement Sprout pool %s was not fulfilled in time', pool)
+                    del self.requests[pool]
+                    diaper(self.manager.client.destroy_pool, pool)
+                continue
+            del self.requests[pool]
+            try:
+                self.manager.client.merge_pools(self.manager.pool, pool)
+            except Exception as e:
+                log.warning('Could not merge pool %s into %s, destroying it separately: %s',
+                            pool, self.manager.pool, e)
+                at_exit(self.manager.client.destroy_pool, pool)
+            fulfilled.extend(sprout_appliance_args(appliance)
+                             for appliance in result['appliances'])
+        return fulfilled
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_parallel_configured(parallel_session):
+    if parallel_session is None:
+        return
+    config = parallel_session.config
+    if config.getoption('use_sprout') and getattr(config, '_sprout_mgr', None) is not None:
+        parallel_session.replacement_policy = SproutReplacementPolicy(
+            config._sprout_mgr, SproutProvisioningRequest.from_config(config))
+
+
 def pytest_addhooks(pluginmanager):
     pluginmanager.add_hookspecs(NewHooks)
 
@@ -311,11 +394,12 @@ class ShutdownPlugin(object):
             log.debug("Trying to end appliance {}".format(ip_address))
             if config.getoption('--use-sprout'):
                 try:
-                    call_method = config._sprout_mgr.client.call_method
-                    log.debug("appliance data %r", call_method('appliance_data', ip_address))
-                    log.debug(
-                        "destroy appliance result: %r",
-                        call_method('destroy_appliance', ip_address))
+                    client = config._sprout_mgr.client
+                    with client.batch():
+                        data = client.call_method('appliance_data', ip_address)
+                        destroyed = client.call_method('destroy_appliance', ip_address)
+                    log.debug("appliance data %r", data.result)
+                    log.debug("destroy appliance result: %r", destroyed.result)
                 except Exception as e:
                     log.debug('Error trying to end sprout appliance %s', ip_address)
                     log.debug(e)
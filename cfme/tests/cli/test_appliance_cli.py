@@ -95,26 +95,26 @@ def test_appliance_console_cli_external_create(
 @pytest.mark.parametrize('auth_type', ['sso_enabled', 'saml_enabled', 'local_login_disabled'],
     ids=['sso', 'saml', 'local_login'])
 def test_external_auth(auth_type, ipa_crud, app_creds):
-    evm_tail = LogValidator('/var/www/miq/vmdb/log/evm.log',
-                            matched_patterns=['.*{} to true.*'.format(auth_type)],
-                            hostname=ipa_crud.hostname,
-                            username=app_creds['sshlogin'],
-                            password=app_creds['password'])
-    evm_tail.fix_before_start()
-    command = 'appliance_console_cli --extauth-opts="/authentication/{}=true"'.format(auth_type)
-    ipa_crud.ssh_client.run_command(command)
-    evm_tail.validate_logs()
-
-    evm_tail = LogValidator('/var/www/miq/vmdb/log/evm.log',
-                            matched_patterns=['.*{} to false.*'.format(auth_type)],
-                            hostname=ipa_crud.hostname,
-                            username=app_creds['sshlogin'],
-                            password=app_creds['password'])
-
-    evm_tail.fix_before_start()
-    command2 = 'appliance_console_cli --extauth-opts="/authentication/{}=false"'.format(auth_type)
-    ipa_crud.ssh_client.run_command(command2)
-    evm_tail.validate_logs()
+    with LogValidator('/var/www/miq/vmdb/log/evm.log',
+                      matched_patterns=['.*{} to true.*'.format(auth_type)],
+                      hostname=ipa_crud.hostname,
+                      username=app_creds['sshlogin'],
+                      password=app_creds['password']) as evm_tail:
+        evm_tail.fix_before_start()
+        command = 'appliance_console_cli --extauth-opts="/authentication/{}=true"'.format(auth_type)
+        ipa_crud.ssh_client.run_command(command)
+        evm_tail.validate_logs()
+
+    with LogValidator('/var/www/miq/vmdb/log/evm.log',
+                      matched_patterns=['.*{} to false.*'.format(auth_type)],
+                      hostname=ipa_crud.hostname,
+                      username=app_creds['sshlogin'],
+                      password=app_creds['password']) as evm_tail:
+        evm_tail.fix_before_start()
+        command2 = 'appliance_console_cli --extauth-opts="/authentication/{}=false"'.format(
+            auth_type)
+        ipa_crud.ssh_client.run_command(command2)
+        evm_tail.validate_logs()
 
 
 @pytest.mark.uncollect('No IPA servers currently available')
@@ -296,26 +296,25 @@ def test_appliance_console_external_auth(auth_type, app_creds, ipa_crud):
     """'ap' launches appliance_console, '' clears info screen, '12' change ext auth options,
     'auth_type' auth type to change, '4' apply changes."""
 
-    evm_tail = LogValidator('/var/www/miq/vmdb/log/evm.log',
-                            matched_patterns=['.*{} to true.*'.format(auth_type.option)],
-                            hostname=ipa_crud.hostname,
-                            username=app_creds['sshlogin'],
-                            password=app_creds['password'])
-    evm_tail.fix_before_start()
-    command_set = ('ap', '', '12', auth_type.index, '4')
-    ipa_crud.appliance_console.run_commands(command_set)
-    evm_tail.validate_logs()
-
-    evm_tail = LogValidator('/var/www/miq/vmdb/log/evm.log',
-                            matched_patterns=['.*{} to false.*'.format(auth_type.option)],
-                            hostname=ipa_crud.hostname,
-                            username=app_creds['sshlogin'],
-                            password=app_creds['password'])
-
-    evm_tail.fix_before_start()
-    command_set = ('ap', '', '12', auth_type.index, '4')
-    ipa_crud.appliance_console.run_commands(command_set)
-    evm_tail.validate_logs()
+    with LogValidator('/var/www/miq/vmdb/log/evm.log',
+                      matched_patterns=['.*{} to true.*'.format(auth_type.option)],
+                      hostname=ipa_crud.hostname,
+                      username=app_creds['sshlogin'],
+                      password=app_creds['password']) as evm_tail:
+        evm_tail.fix_before_start()
+        command_set = ('ap', '', '12', auth_type.index, '4')
+        ipa_crud.appliance_console.run_commands(command_set)
+        evm_tail.validate_logs()
+
+    with LogValidator('/var/www/miq/vmdb/log/evm.log',
+                      matched_patterns=['.*{} to false.*'.format(auth_type.option)],
+                      hostname=ipa_crud.hostname,
+                      username=app_creds['sshlogin'],
+                      password=app_creds['password']) as evm_tail:
+        evm_tail.fix_before_start()
+        command_set = ('ap', '', '12', auth_type.index, '4')
+        ipa_crud.appliance_console.run_commands(command_set)
+        evm_tail.validate_logs()
 
 
 @pytest.mark.uncollect('No IPA servers currently available')
@@ -323,28 +322,27 @@ def test_appliance_console_external_auth_all(app_creds, ipa_crud):
     """'ap' launches appliance_console, '' clears info screen, '12' change ext auth options,
     'auth_type' auth type to change, '4' apply changes."""
 
-    evm_tail = LogValidator('/var/www/miq/vmdb/log/evm.log',
-                            matched_patterns=['.*sso_enabled to true.*', '.*saml_enabled to true.*',
-                                '.*local_login_disabled to true.*'],
-                            hostname=ipa_crud.hostname,
-                            username=app_creds['sshlogin'],
-                            password=app_creds['password'])
-    evm_tail.fix_before_start()
-    command_set = ('ap', '', '12', '1', '2', '3', '4')
-    ipa_crud.appliance_console.run_commands(command_set)
-    evm_tail.validate_logs()
-
-    evm_tail = LogValidator('/var/www/miq/vmdb/log/evm.log',
-                            matched_patterns=['.*sso_enabled to false.*',
-                                '.*saml_enabled to false.*', '.*local_login_disabled to false.*'],
-                            hostname=ipa_crud.hostname,
-                            username=app_creds['sshlogin'],
-                            password=app_creds['password'])
-
-    evm_tail.fix_before_start()
-    command_set = ('ap', '', '12', '1', '2', '3', '4')
-    ipa_crud.appliance_console.run_commands(command_set)
-    evm_tail.validate_logs()
+    with LogValidator('/var/www/miq/vmdb/log/evm.log',
+                      matched_patterns=['.*sso_enabled to true.*', '.*saml_enabled to true.*',
+                          '.*local_login_disabled to true.*'],
+                      hostname=ipa_crud.hostname,
+                      username=app_creds['sshlogin'],
+                      password=app_creds['password']) as evm_tail:
+        evm_tail.fix_before_start()
+        command_set = ('ap', '', '12', '1', '2', '3', '4')
+        ipa_crud.appliance_console.run_commands(command_set)
+        evm_tail.validate_logs()
+
+    with LogValidator('/var/www/miq/vmdb/log/evm.log',
+                      matched_patterns=['.*sso_enabled to false.*',
+                          '.*saml_enabled to false.*', '.*local_login_disabled to false.*'],
+                      hostname=ipa_crud.hostname,
+                      username=app_creds['sshlogin'],
+                      password=app_creds['password']) as evm_tail:
+        evm_tail.fix_before_start()
+        command_set = ('ap', '', '12', '1', '2', '3', '4')
+        ipa_crud.appliance_console.run_commands(command_set)
+        evm_tail.validate_logs()
 
 
 def test_appliance_console_scap(temp_appliance_preconfig, soft_assert):
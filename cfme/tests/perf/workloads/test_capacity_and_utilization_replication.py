@@ -41,6 +41,7 @@ def test_workload_capacity_and_utilization_rep(appliance, request, scenario, set
     # Spawn tail before hand to prevent unncessary waiting on MiqServer starting since applinace
     # under test is cleaned first, followed by master appliance
     sshtail_evm = SSHTail('/var/www/miq/vmdb/log/evm.log')
+    request.addfinalizer(sshtail_evm.close)
     sshtail_evm.set_initial_file_end()
     logger.info('Clean appliance under test ({})'.format(ssh_client))
     appliance.clean_appliance()
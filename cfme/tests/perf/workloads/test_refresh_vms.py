@@ -4,6 +4,7 @@ from cfme.utils.conf import cfme_performance
 from cfme.utils.grafana import get_scenario_dashboard_urls
 from cfme.utils.log import logger
 from cfme.utils.providers import get_crud
+from cfme.utils.rest_load import RestActionLoad
 from cfme.utils.smem_memory_monitor import add_workload_quantifiers, SmemMemoryMonitor
 from cfme.utils.workloads import get_refresh_vms_scenarios
 from itertools import cycle
@@ -35,8 +36,15 @@ def test_refresh_vms(appliance, request, scenario):
         'scenario': scenario}
     monitor_thread = SmemMemoryMonitor(appliance.ssh_client(), scenario_data)
 
+    refresh_load = RestActionLoad(appliance.rest_api,
+                                  rate=scenario.get('refresh_rate'),
+                                  workers=scenario.get('refresh_workers', 10),
+                                  bulk_size=scenario.get('refresh_bulk_size'))
+
     def cleanup_workload(scenario, from_ts, quantifiers, scenario_data):
         starttime = time.time()
+        refresh_load.close()
+        quantifiers.update(refresh_load.quantifiers('VM_Refresh'))
         to_ts = int(starttime * 1000)
         g_urls = get_scenario_dashboard_urls(scenario, from_ts, to_ts)
         logger.debug('Started cleaning up monitoring thread.')
@@ -81,8 +89,7 @@ def test_refresh_vms(appliance, request, scenario):
     while ((time.time() - starttime) < total_time):
         start_refresh_time = time.time()
         refresh_list = [next(vms_iter) for x in range(refresh_size)]
-        for vm in refresh_list:
-            vm.action.reload()
+        refresh_load.run('vms', 'reload', refresh_list)
         total_refreshed_vms += len(refresh_list)
         iteration_time = time.time()
 
@@ -2202,23 +2202,25 @@ class IPAppliance(object):
             evm_tail = SSHTail('/var/www/miq/vmdb/log/evm.log')
             evm_tail.set_initial_file_end()
 
-        attempts = 0
-        detected = False
-        max_attempts = 60
-        while (not detected and attempts < max_attempts):
-            logger.debug('Attempting to detect MIQ Server workers started: {}'.format(attempts))
-            for line in evm_tail:
-                if 'MiqServer#wait_for_started_workers' in line:
-                    if ('All workers have been started' in line):
-                        logger.info('Detected MIQ Server is ready.')
-                        detected = True
-                        break
-            sleep(poll_interval)  # Allow more log lines to accumulate
-            attempts += 1
-        if not (attempts < max_attempts):
-            logger.error('Could not detect MIQ Server workers started in {}s.'.format(
-                poll_interval * max_attempts))
-        evm_tail.close()
+        try:
+            attempts = 0
+            detected = False
+            max_attempts = 60
+            while (not detected and attempts < max_attempts):
+                logger.debug('Attempting to detect MIQ Server workers started: {}'.format(attempts))
+                for line in evm_tail:
+                    if 'MiqServer#wait_for_started_workers' in line:
+                        if ('All workers have been started' in line):
+                            logger.info('Detected MIQ Server is ready.')
+                            detected = True
+                            break
+                sleep(poll_interval)  # Allow more log lines to accumulate
+                attempts += 1
+            if not (attempts < max_attempts):
+                logger.error('Could not detect MIQ Server workers started in {}s.'.format(
+                    poll_interval * max_attempts))
+        finally:
+            evm_tail.close()
 
     @logger_wrap("Setting dev branch: {}")
     def use_dev_branch(self, repo, branch, log_callback=None):
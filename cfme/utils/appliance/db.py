@@ -109,10 +109,13 @@ class ApplianceDB(AppliancePlugin):
             'guid': 'select guid from miq_servers',
             'region': 'select region from miq_regions'
         }
-        for data_type, db_query in data_query.items():
+        data_types = list(data_query)
+        query_results = ssh.run_commands_parallel(
+            ['psql -d vmdb_production -t -c "{}"'.format(data_query[data_type])
+             for data_type in data_types], timeout=15)
+        for data_type, (rc, out) in zip(data_types, query_results):
+            db_query = data_query[data_type]
             data_filepath = '/var/www/miq/vmdb/{}'.format(data_type.upper())
-            rc, out = ssh.run_command(
-                'psql -d vmdb_production -t -c "{}"'.format(db_query), timeout=15)
             assert rc == 0, "Failed to fetch {}: {}".format(data_type, out)
             db_data = out.strip()
             assert db_data, "No {} found in database; query '{}' returned no records".format(
@@ -5,6 +5,7 @@ from inspect import isclass
 from time import sleep
 
 import os
+import attr
 from cached_property import cached_property
 from jsmin import jsmin
 from navmazing import Navigate, NavigateStep
@@ -17,6 +18,7 @@ from widgetastic.utils import VersionPick
 from widgetastic.widget import Text, View
 
 from cfme import exceptions
+from cfme.utils import nav_timing
 from cfme.utils.browser import manager
 from cfme.utils.log import logger, create_sublogger
 from cfme.utils.version import Version
@@ -52,6 +54,34 @@ class ErrorView(View):
         return None
 
 
+@attr.s(frozen=True)
+class PageState(object):
+    """What :py:attr:`CFMENavigateStep.PAGE_STATE` found on the page
+
+    The defaults describe a healthy page, which is also what is assumed when the probe fails.
+    """
+    #: Blocker div, notification or a modal backdrop covering the page
+    blocked = attr.ib(default=False)
+    #: Large modal dialog left open
+    modal = attr.ib(default=False)
+    jquery = attr.ib(default=True)
+    #: Text of the displayed rails error like :py:meth:`ErrorView.get_rails_error` returns it
+    rails_error = attr.ib(default=None)
+    exception = attr.ib(default=False)
+    proxy_error = attr.ib(default=False)
+    #: 503 and similar error pages
+    app_error = attr.ib(default=False)
+    rails_dialog = attr.ib(default=False)
+    #: Main menu displayed without its bottom part, BZ#1112574
+    menu_glitch = attr.ib(default=False)
+    logged_in = attr.ib(default=True)
+
+    @classmethod
+    def from_probe(cls, result):
+        names = {field.name for field in attr.fields(cls)}
+        return cls(**{str(key): value for key, value in result.items() if key in names})
+
+
 class MiqBrowserPlugin(DefaultPlugin):
     # Here we dismiss notifications as they obscure lower elements which need to be clicked on
     # We don't bother iterating and instead choose [0] and [1] to simplify the codepath
@@ -142,8 +172,8 @@ class MiqBrowserPlugin(DefaultPlugin):
 
     def after_keyboard_input(self, element, keyboard_input):
         observed_field_attr = None
-        for attr in self.OBSERVED_FIELD_MARKERS:
-            observed_field_attr = self.browser.get_attribute(attr, element)
+        for marker in self.OBSERVED_FIELD_MARKERS:
+            observed_field_attr = self.browser.get_attribute(marker, element)
             if observed_field_attr is not None:
                 break
         else:
@@ -212,9 +242,119 @@ def can_skip_badness_test(fn):
     return fn
 
 
+class DestinationCache(object):
+    """Remembers the URLs navigation destinations were found at
+
+    Navigating to a known destination again opens its URL and only runs the prerequisite and the
+    step when the destination's view is not displayed then. Destinations reached by AJAX without
+    a URL of their own are found out after the first navigation and not tried again.
+    """
+    def __init__(self):
+        self.enabled = False
+        #: URL for every known destination, None for the ones that cannot be reached by URL
+        self.urls = {}
+
+    def key(self, step, args, kwargs):
+        """Key of the destination, None if it cannot be cached
+
+        Only the plain navigations without any extra arguments for the step are cached.
+        """
+        if not self.enabled or step.VIEW is None or args or kwargs:
+            return None
+        key = (step.appliance.url, step.obj, step._name)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def learn(self, key, step):
+        """Remembers where the step navigated to, if the destination view validates there"""
+        if key in self.urls:
+            return
+        try:
+            displayed = step.view.is_displayed
+        except (AttributeError, NoSuchElementException):
+            displayed = False
+        self.urls[key] = step.appliance.browser.widgetastic.url if displayed else None
+
+    def forget(self, key):
+        self.urls[key] = None
+
+
+destination_cache = DestinationCache()
+
+
 class CFMENavigateStep(NavigateStep):
     VIEW = None
 
+    # Everything check_for_badness looks for, in one round trip. Turns the sparkle off on the way.
+    PAGE_STATE = jsmin('''\
+        try {
+            miqSparkleOff();
+        } catch(err) {
+        }
+
+        function isDisplayed(el) {
+            return window.getComputedStyle(el).visibility !== "hidden" &&
+                !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+        }
+        function find(xpath) {
+            var result = document.evaluate(
+                xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            var elements = [];
+            for (var i = 0; i < result.snapshotLength; i++) {
+                elements.push(result.snapshotItem(i));
+            }
+            return elements;
+        }
+        function displayed(elements) {
+            for (var i = 0; i < elements.length; i++) {
+                if (isDisplayed(elements[i])) {
+                    return elements[i];
+                }
+            }
+            return null;
+        }
+        function text(xpath) {
+            var el = displayed(find(xpath));
+            return el === null ? "" : el.innerText.trim();
+        }
+
+        var appError = displayed(find("//body[./h1 and ./p and ./hr and ./address]")) !== null;
+        var railsError = null;
+        if (appError) {
+            railsError = text("//body/h1") + ": " + text("//body/p");
+        } else if (displayed(find("//h1[normalize-space(.)='Unexpected error encountered']"))) {
+            railsError = text(
+                "//h1[normalize-space(.)='Unexpected error encountered']" +
+                "/following-sibling::h3[not(fieldset)]");
+        }
+
+        return {
+            blocked: (
+                displayed(find("//div[@id='blocker_div' or @id='notification']")) !== null ||
+                displayed(document.querySelectorAll(".modal-backdrop.fade.in")) !== null),
+            modal: displayed(find(
+                "//div[contains(@class, 'modal-dialog') and contains(@class, 'modal-lg')]"
+            )) !== null,
+            jquery: typeof jQuery !== "undefined",
+            rails_error: railsError,
+            exception: displayed(find("//div[@id='exception_div']")) !== null,
+            proxy_error: displayed(find("//body/h1[normalize-space(.)='Proxy Error']")) !== null,
+            app_error: appError,
+            rails_dialog: displayed(find("//body/div[@class='dialog' and ./h1 and ./p]")) !== null,
+            menu_glitch: (
+                find("//ul[@id='maintab']/li[@class='inactive']").length > 0 &&
+                find("//ul[@id='maintab']/li[@class='active']/ul/li").length === 0),
+            logged_in: displayed(find("//li[./a[@id='dropdownMenu2']]")) !== null
+        };
+        ''')
+
+    _page_state = None
+    #: :py:class:`cfme.utils.nav_timing.NavStepTiming` of the navigation in progress
+    timing = None
+
     @cached_property
     def view(self):
         if self.VIEW is None:
@@ -234,10 +374,36 @@ class CFMENavigateStep(NavigateStep):
         except (AttributeError, NoSuchElementException):
             return False
 
+    def page_state(self, refresh=False):
+        """Probes the page with :py:attr:`PAGE_STATE` and returns a :py:class:`PageState`
+
+        The state is kept until the page changes during the navigation step, ``refresh`` forces a
+        new probe.
+        """
+        if self._page_state is not None and not refresh:
+            return self._page_state
+        br = self.appliance.browser.widgetastic
+        try:
+            result = br.execute_script(self.PAGE_STATE, silent=True)
+        except Exception:
+            # Probably an alert, get rid of it and probe again
+            br.dismiss_any_alerts()
+            try:
+                result = br.execute_script(self.PAGE_STATE, silent=True)
+            except Exception as e:
+                self.log_message("Could not probe the page state: {}".format(e), level="warning")
+                return PageState()
+        self._page_state = PageState.from_probe(result)
+        return self._page_state
+
+    def invalidate_page_state(self):
+        self._page_state = None
+
     def check_for_badness(self, fn, _tries, nav_args, *args, **kwargs):
         if getattr(fn, '_can_skip_badness_test', False):
             # self.log_message('Op is a Nop! ({})'.format(fn.__name__))
             return
+        checks_started = time.time()
 
         # TODO: Uncomment after resolving the issue in widgetastic. Shouldn't be needed though :)
         # if self.VIEW:
@@ -252,47 +418,30 @@ class CFMENavigateStep(NavigateStep):
             self.appliance.browser.quit_browser()
             _tries -= 1
             self.go(_tries, *args, **go_kwargs)
+            self.invalidate_page_state()
 
         br = self.appliance.browser
-
-        try:
-            br.widgetastic.execute_script('miqSparkleOff();', silent=True)
-        except:  # noqa
-            # miqSparkleOff undefined, so it's definitely off.
-            # Or maybe it is alerts? Let's only do this when we get an exception.
-            self.appliance.browser.widgetastic.dismiss_any_alerts()
-            # If we went so far, let's put diapers on one more miqSparkleOff just to be sure
-            # It can be spinning in the back
-            try:
-                br.widgetastic.execute_script('miqSparkleOff();', silent=True)
-            except:  # noqa
-                pass
+        state = self.page_state()
 
         # Check if the page is blocked with blocker_div. If yes, let's headshot the browser right
         # here
-        if (
-                br.widgetastic.is_displayed("//div[@id='blocker_div' or @id='notification']") or
-                br.widgetastic.is_displayed(".modal-backdrop.fade.in")):
+        if state.blocked:
             logger.warning("Page was blocked with blocker div on start of navigation, recycling.")
             self.appliance.browser.quit_browser()
             self.go(_tries, *args, **go_kwargs)
+            state = self.page_state(refresh=True)
 
         # Check if modal window is displayed
-        if (br.widgetastic.is_displayed(
-                "//div[contains(@class, 'modal-dialog') and contains(@class, 'modal-lg')]")):
+        if state.modal:
             logger.warning("Modal window was open; closing the window")
             br.widgetastic.click(
                 "//button[contains(@class, 'close') and contains(@data-dismiss, 'modal')]")
+            state = self.page_state(refresh=True)
 
         # Check if jQuery present
-        try:
-            br.widgetastic.execute_script("jQuery", silent=True)
-        except Exception as e:
-            if "jQuery" not in str(e):
-                logger.error("Checked for jQuery but got something different.")
-                logger.exception(e)
+        if not state.jquery:
             # Restart some workers
-            logger.warning("Restarting UI and VimBroker workers!")
+            logger.warning("jQuery not present! Restarting UI and VimBroker workers!")
             with self.appliance.ssh_client as ssh:
                 # Blow off the Vim brokers and UI workers
                 ssh.run_rails_command("\"(MiqVimBrokerWorker.all + MiqUiWorker.all).each &:kill\"")
@@ -302,10 +451,10 @@ class CFMENavigateStep(NavigateStep):
             self.appliance.browser.quit_browser()
             self.appliance.browser.open_browser(url_key=self.obj.appliance.server.address())
             self.go(_tries, *args, **go_kwargs)
+            state = self.page_state(refresh=True)
 
         # Same with rails errors
-        view = br.widgetastic.create_view(ErrorView)
-        rails_e = view.get_rails_error()
+        rails_e = state.rails_error
 
         if rails_e is not None:
             logger.warning("Page was blocked by rails error, renavigating.")
@@ -323,6 +472,7 @@ class CFMENavigateStep(NavigateStep):
             self.appliance.browser.quit_browser()
             self.appliance.browser.open_browser()
             self.go(_tries, *args, **go_kwargs)
+            state = self.page_state(refresh=True)
             # If there is a rails error past this point, something is really awful
 
         # Set this to True in the handlers below to trigger a browser restart
@@ -332,6 +482,7 @@ class CFMENavigateStep(NavigateStep):
         # Includes recycling so you don't need to specify recycle = False
         restart_evmserverd = False
 
+        self.timing.badness += time.time() - checks_started
         try:
             self.log_message(
                 "Invoking {}, with {} and {}".format(fn.func_name, args, kwargs), level="debug")
@@ -371,19 +522,18 @@ class CFMENavigateStep(NavigateStep):
                 logger.exception(
                     "UI failed in some way, jQuery not found, (probably) recycling the browser.")
                 recycle = True
+            state = self.page_state(refresh=True)
             # If the page is blocked, then recycle...
             # TODO .modal-backdrop.fade.in catches the 'About' modal resulting in nav loop
-            if (
-                    br.widgetastic.is_displayed("//div[@id='blocker_div' or @id='notification']") or
-                    br.widgetastic.is_displayed(".modal-backdrop.fade.in")):
+            if state.blocked:
                 logger.warning("Page was blocked with blocker div, recycling.")
                 recycle = True
-            elif br.widgetastic.is_displayed("//div[@id='exception_div']"):
+            elif state.exception:
                 logger.exception("CFME Exception before force navigate started!: {}".format(
                     br.widgetastic.text(
                         "//div[@id='exception_div']//td[@id='maincol']/div[2]/h3[2]")))
                 recycle = True
-            elif br.widgetastic.is_displayed("//body/h1[normalize-space(.)='Proxy Error']"):
+            elif state.proxy_error:
                 # 502
                 logger.exception("Proxy error detected. Killing browser and restarting evmserverd.")
                 req = br.widgetastic.elements("/html/body/p[1]//a")
@@ -392,14 +542,14 @@ class CFMENavigateStep(NavigateStep):
                 reason = br.widgetastic.text(reason[0]) if reason else "No reason stated"
                 logger.info("Proxy error: {} / {}".format(req, reason))
                 restart_evmserverd = True
-            elif br.widgetastic.is_displayed("//body[./h1 and ./p and ./hr and ./address]"):
+            elif state.app_error:
                 # 503 and similar sort of errors
                 title = br.widgetastic.text("//body/h1")
                 body = br.widgetastic.text("//body/p")
                 logger.exception("Application error {}: {}".format(title, body))
                 sleep(5)  # Give it a little bit of rest
                 recycle = True
-            elif br.widgetastic.is_displayed("//body/div[@class='dialog' and ./h1 and ./p]"):
+            elif state.rails_dialog:
                 # Rails exception detection
                 logger.exception("Rails exception before force navigate started!: %r:%r at %r",
                     br.widgetastic.text("//body/div[@class='dialog']/h1"),
@@ -407,12 +557,11 @@ class CFMENavigateStep(NavigateStep):
                     getattr(manager.browser, 'current_url', "error://dead-browser")
                 )
                 recycle = True
-            elif br.widgetastic.elements("//ul[@id='maintab']/li[@class='inactive']") and not\
-                    br.widgetastic.elements("//ul[@id='maintab']/li[@class='active']/ul/li"):
+            elif state.menu_glitch:
                 # If upstream and is the bottom part of menu is not displayed
                 logger.exception("Detected glitch from BZ#1112574. HEADSHOT!")
                 recycle = True
-            elif not self.obj.appliance.server.logged_in():
+            elif not state.logged_in:
                 # Session timeout or whatever like that, login screen appears.
                 logger.exception("Looks like we are logged out. Try again.")
                 recycle = True
@@ -462,9 +611,20 @@ class CFMENavigateStep(NavigateStep):
         )
 
     def go(self, _tries=0, *args, **kwargs):
+        class_name = self.obj.__name__ if isclass(self.obj) else self.obj.__class__.__name__
+        timing = nav_timing.profiler.start(self._name, class_name)
+        # go is called again from check_for_badness to recover, that gets a record of its own
+        outer_timing, self.timing = self.timing, timing
+        start_time = time.time()
+        try:
+            return self._navigate(timing, start_time, _tries, *args, **kwargs)
+        finally:
+            self.timing = outer_timing
+            nav_timing.profiler.finish(timing, time.time() - start_time)
+
+    def _navigate(self, timing, start_time, _tries, *args, **kwargs):
         nav_args = {'use_resetter': True, 'wait_for_view': False}
         self.log_message("Beginning Navigation...", level="info")
-        start_time = time.time()
         if _tries > 2:
             # Need at least three tries:
             # 1: login_admin handles an alert or CannotContinueWithNavigation appears.
@@ -472,9 +632,12 @@ class CFMENavigateStep(NavigateStep):
             raise exceptions.NavigationError(self._name)
 
         _tries += 1
+        # The page state is probed once and reused until something changes the page
+        self.invalidate_page_state()
         for arg in nav_args:
             if arg in kwargs:
                 nav_args[arg] = kwargs.pop(arg)
+        shortcut_key = destination_cache.key(self, args, kwargs)
         self.check_for_badness(self.pre_navigate, _tries, nav_args, *args, **kwargs)
         here = False
         resetter_used = False
@@ -484,9 +647,15 @@ class CFMENavigateStep(NavigateStep):
         except Exception as e:
             self.log_message(
                 "Exception raised [{}] whilst checking if already here".format(e), level="error")
-        if not here:
+        if not here and shortcut_key is not None:
+            timing.shortcut = self.navigate_by_shortcut(shortcut_key)
+        if not (here or timing.shortcut):
             self.log_message("Prerequisite Needed")
+            prerequisite_started = time.time()
             self.prerequisite_view = self.prerequisite()
+            timing.prerequisite = time.time() - prerequisite_started
+            self.invalidate_page_state()
+            step_started, badness = time.time(), timing.badness
             try:
                 self.check_for_badness(self.step, _tries, nav_args, *args, **kwargs)
             except (exceptions.CandidateNotFound, exceptions.ItemNotFound) as e:
@@ -495,7 +664,12 @@ class CFMENavigateStep(NavigateStep):
                     .format(e), level="error"
                 )
                 self.appliance.browser.widgetastic.refresh()
+                self.invalidate_page_state()
                 self.check_for_badness(self.step, _tries, nav_args, *args, **kwargs)
+            timing.step = time.time() - step_started - (timing.badness - badness)
+            self.invalidate_page_state()
+            if shortcut_key is not None:
+                destination_cache.learn(shortcut_key, self)
         if nav_args['use_resetter']:
             resetter_used = True
             self.check_for_badness(self.resetter, _tries, nav_args, *args, **kwargs)
@@ -509,11 +683,26 @@ class CFMENavigateStep(NavigateStep):
                 lambda: view.is_displayed, num_sec=10,
                 message="Waiting for view [{}] to display".format(view.__class__.__name__)
             )
+        timing.here, timing.resetter, timing.waited = bool(here), resetter_used, waited
         self.log_message(
             self.construct_message(here, resetter_used, view, duration, waited), level="info"
         )
         return view
 
+    def navigate_by_shortcut(self, key):
+        """Opens the URL the destination was found at before, returns whether the view validates"""
+        url = destination_cache.urls.get(key)
+        if url is None:
+            return False
+        self.log_message("Taking the shortcut to {}".format(url))
+        self.appliance.browser.widgetastic.url = url
+        self.invalidate_page_state()
+        if self.am_i_here():
+            return True
+        self.log_message("Shortcut did not lead to the destination, navigating", level="warning")
+        destination_cache.forget(key)
+        return False
+
 
 navigator = Navigate()
 navigate_to = navigator.navigate
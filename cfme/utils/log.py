@@ -130,13 +130,17 @@ Members
 ^^^^^^^
 
 """
+import atexit
 import inspect
 import logging
 import sys
+import threading
 import warnings
 from time import time
 from traceback import extract_tb, format_tb
 
+from six.moves import queue
+
 from cfme.utils import conf, safe_string
 from cfme.utils.path import get_rel_path, log_path, project_path
 
@@ -432,26 +436,122 @@ def nth_frame_info(n):
 
 
 class ArtifactorHandler(logging.Handler):
-    """Logger handler that hands messages off to the artifactor"""
+    """Logger handler that hands messages off to the artifactor
+
+    By default every record is sent with its own ``log_message`` hook call. When
+    :py:meth:`set_buffered` was called, records are queued in-process instead and shipped
+    in batches via the ``log_messages`` hook by a background thread. A batch is sent
+    when ``batch_size`` records are waiting, when ``flush_interval`` seconds have passed,
+    or when :py:meth:`flush` is called (e.g. at test boundaries).
+    """
 
     slaveid = artifactor = None
+    buffered = False
+    batch_size = 500
+    flush_interval = 1.0
+
+    def __init__(self, *args, **kwargs):
+        super(ArtifactorHandler, self).__init__(*args, **kwargs)
+        self._queue = queue.Queue()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
 
     def createLock(self):  # NOQA: false positive, base class override
         # opt out of locking since artifactor hook calling is threadsave
         self.lock = None
 
+    def set_buffered(self, batch_size=None, flush_interval=None):
+        """Switch the handler to batched, asynchronous shipping
+
+        Args:
+            batch_size: Number of queued records which triggers an immediate flush
+            flush_interval: Maximum number of seconds a record waits in the queue
+        """
+        if batch_size is not None:
+            self.batch_size = int(batch_size)
+        if flush_interval is not None:
+            self.flush_interval = float(flush_interval)
+        self.buffered = True
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._flush_loop, name='artifactor-log-flusher')
+            self._thread.daemon = True
+            self._thread.start()
+
+    @staticmethod
+    def _record_data(record):
+        """Snapshot the record so that later changes of its args can't alter the message"""
+        data = dict(record.__dict__)
+        try:
+            data['msg'] = record.getMessage()
+            data['args'] = ()
+        except Exception:
+            # leave msg/args as they are, the receiving side will handle the error
+            pass
+        return data
+
     def emit(self, record):
-        if self.artifactor:
+        if not self.artifactor:
+            return
+        if self.buffered:
+            self._queue.put(self._record_data(record))
+            if self._queue.qsize() >= self.batch_size:
+                self._wakeup.set()
+        else:
             self.artifactor.fire_hook(
                 'log_message',
                 log_record=record.__dict__,
                 slaveid=self.slaveid,
             )
 
+    def _drain(self):
+        records = []
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                return records
+
+    def flush(self):
+        """Send all queued records to the artifactor, blocks until they were handed off"""
+        with self._flush_lock:
+            records = self._drain()
+            if not records or not self.artifactor:
+                return
+            for start in range(0, len(records), self.batch_size):
+                self.artifactor.fire_hook(
+                    'log_messages',
+                    log_records=records[start:start + self.batch_size],
+                    slaveid=self.slaveid,
+                )
+
+    def _flush_loop(self):
+        while self.buffered:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # the logger must never take the test run down
+                pass
+
+    def close(self):
+        """Stop the background thread, shipping everything which is still queued"""
+        self.buffered = False
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(self.flush_interval + 1)
+        self._thread = None
+        self.flush()
+        super(ArtifactorHandler, self).close()
+
 
 logger = setup_logger(logging.getLogger('cfme'))
 artifactor_handler = ArtifactorHandler()
 logger.addHandler(artifactor_handler)
+# make sure buffered records are not lost when the process goes away
+atexit.register(artifactor_handler.close)
 
 add_prefix = PrefixAddingLoggerFilter()
 logger.addFilter(add_prefix)
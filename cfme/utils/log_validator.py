@@ -1,10 +1,100 @@
 import re
+import sre_constants
+import sre_parse
+
 import pytest
+import six
 
 from ssh import SSHTail
 from cfme.utils.log import logger
 
 
+def _required_literal(pattern):
+    """Returns the longest literal substring every line matching the pattern has to contain.
+
+    Only the top level of the pattern is inspected, so the result is ``None`` for patterns like
+    ``'a|b'`` or when the pattern uses flags which change how literals match.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except sre_constants.error:
+        return None
+    state = getattr(parsed, 'state', None) or parsed.pattern
+    if state.flags & (re.IGNORECASE | re.LOCALE | re.VERBOSE):
+        return None
+    to_char = six.unichr if isinstance(pattern, six.text_type) else chr
+    longest = current = pattern[:0]
+    for op, value in parsed.data:
+        if op == sre_constants.LITERAL:
+            current += to_char(value)
+            continue
+        longest = max(longest, current, key=len)
+        current = ''
+    longest = max(longest, current, key=len)
+    return longest or None
+
+
+class PatternMatcher(object):
+    """Matches lines against a list of regex patterns, counting which of them matched.
+
+    All patterns are compiled once. A pattern is only tried on a line containing the literal
+    text the pattern requires, which is a cheap substring check. Patterns without such a
+    literal are guarded by a single combined alternation of all of them instead, so a line
+    matching none of the patterns costs at most one regex call.
+
+    Args:
+        patterns: list of regex patterns, matched from the start of the line like ``re.match``
+    """
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._compiled = [re.compile(pattern) for pattern in self.patterns]
+        self._literals = [_required_literal(pattern) for pattern in self.patterns]
+        unguarded = [compiled for compiled, literal in zip(self._compiled, self._literals)
+                     if literal is None]
+        if unguarded and not any(compiled.groups for compiled in unguarded):
+            # groups would get renumbered in the alternation and break backreferences
+            self._combined = re.compile(
+                '|'.join('(?:{})'.format(compiled.pattern) for compiled in unguarded))
+        else:
+            self._combined = None
+        self.counts = dict.fromkeys(self.patterns, 0)
+        self.first_lines = {}
+
+    def _matching(self, line):
+        combined_hit = self._combined is None or self._combined.match(line)
+        for pattern, compiled, literal in zip(self.patterns, self._compiled, self._literals):
+            if literal is None:
+                if not combined_hit:
+                    continue
+            elif literal not in line:
+                continue
+            if compiled.match(line):
+                yield pattern
+
+    def _record(self, pattern, line):
+        self.counts[pattern] += 1
+        self.first_lines.setdefault(pattern, line)
+
+    def first_match(self, line):
+        """Returns the first pattern matching the line (and records it) or ``None``"""
+        for pattern in self._matching(line):
+            self._record(pattern, line)
+            return pattern
+        return None
+
+    def all_matches(self, line):
+        """Records and returns all patterns matching the line"""
+        matched = list(self._matching(line))
+        for pattern in matched:
+            self._record(pattern, line)
+        return matched
+
+    @property
+    def matched(self):
+        """Patterns matched at least once, in the original order"""
+        return [pattern for pattern in self.patterns if self.counts[pattern]]
+
+
 class LogValidator(object):
     """
     Log content validator class provides methods
@@ -22,20 +112,27 @@ class LogValidator(object):
     to be possible to skip particular ERROR log,
     but fail for wider range of other ERRORs.
 
+    All the new lines are checked before the test is failed, the failure message lists how many
+    times each failure pattern matched and the first line it matched. Per-pattern match counts
+    are available in ``matches`` and in :py:meth:`report`.
+
     Args:
         remote_filename: path to the remote log file
         skip_patterns: array of skip regex patterns
         failure_patterns: array of failure regex patterns
         matched_patterns: array of expected regex patterns to be matched
 
+    The validator keeps an SSH connection to follow the log, :py:meth:`close` it when done or
+    use it as a context manager.
+
     Usage:
         .. code-block:: python
-          evm_tail = LogValidator('/var/www/miq/vmdb/log/evm.log',
-                                  skip_patterns=['PARTICULAR_ERROR'],
-                                  failure_patterns=['.*ERROR.*'],
-                                  matched_patterns=['PARTICULAR_INFO'])
-          evm_tail.fix_before_start()
-          evm_tail.validate_logs()
+          with LogValidator('/var/www/miq/vmdb/log/evm.log',
+                            skip_patterns=['PARTICULAR_ERROR'],
+                            failure_patterns=['.*ERROR.*'],
+                            matched_patterns=['PARTICULAR_INFO']) as evm_tail:
+              evm_tail.fix_before_start()
+              evm_tail.validate_logs()
     """
 
     def __init__(self, remote_filename, **kwargs):
@@ -43,40 +140,71 @@ class LogValidator(object):
         self.failure_patterns = kwargs.pop('failure_patterns', [])
         self.matched_patterns = kwargs.pop('matched_patterns', [])
 
+        self._skip_matcher = PatternMatcher(self.skip_patterns)
+        self._failure_matcher = PatternMatcher(self.failure_patterns)
+        self._match_matcher = PatternMatcher(self.matched_patterns)
+
         self._remote_file_tail = SSHTail(remote_filename, **kwargs)
-        self.matches = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def close(self):
+        """Closes the tail of the remote file"""
+        self._remote_file_tail.close()
+
+    @property
+    def matches(self):
+        """Match counts of the expected patterns which matched so far"""
+        return {pattern: self._match_matcher.counts[pattern]
+                for pattern in self._match_matcher.matched}
+
+    def report(self):
+        """Returns ``{kind: {pattern: {'count': int, 'first_line': str}}}`` for all patterns"""
+        return {
+            kind: {
+                pattern: {'count': matcher.counts[pattern],
+                          'first_line': matcher.first_lines.get(pattern)}
+                for pattern in matcher.patterns}
+            for kind, matcher in (('skip', self._skip_matcher),
+                                  ('failure', self._failure_matcher),
+                                  ('matched', self._match_matcher))}
 
     def fix_before_start(self):
         self._remote_file_tail.set_initial_file_end()
 
     def validate_logs(self):
-        for line in self._remote_file_tail:
-            if self._check_skip_logs(line):
+        self.validate_lines(self._remote_file_tail)
+
+    def validate_lines(self, lines):
+        """Checks the lines against all the patterns, fails the test when they don't comply"""
+        for line in lines:
+            if self._skip_matcher.first_match(line) is not None:
                 continue
-            self._check_fail_logs(line)
-            self._check_match_logs(line)
+            self._failure_matcher.first_match(line)
+            self._match_matcher.all_matches(line)
+        for pattern in self._skip_matcher.matched:
+            logger.info('Skip pattern %s was matched %d times, first on line %s', pattern,
+                        self._skip_matcher.counts[pattern], self._skip_matcher.first_lines[pattern])
+        for pattern in self._match_matcher.matched:
+            logger.info('Expected pattern %s was matched %d times, first on line %s', pattern,
+                        self._match_matcher.counts[pattern],
+                        self._match_matcher.first_lines[pattern])
+        self._verify_fail_logs()
         self._verify_match_logs()
 
-    def _check_skip_logs(self, line):
-        for pattern in self.skip_patterns:
-            if re.match(pattern, line):
-                logger.info('Skip pattern {} was matched on line {},\
-                            so skipping this line'.format(pattern, line))
-                return True
-        return False
-
-    def _check_fail_logs(self, line):
-        for pattern in self.failure_patterns:
-            if re.match(pattern, line):
-                pytest.fail('Failure pattern {} was matched on line {}'.format(pattern, line))
-
-    def _check_match_logs(self, line):
-        for pattern in self.matched_patterns:
-            if re.match(pattern, line):
-                logger.info('Expected pattern {} was matched on line {}'.format(pattern, line))
-                self.matches[pattern] = True
+    def _verify_fail_logs(self):
+        matcher = self._failure_matcher
+        failures = ['Failure pattern {} was matched {} times, first on line {}'.format(
+            pattern, matcher.counts[pattern], matcher.first_lines[pattern])
+            for pattern in matcher.matched]
+        if failures:
+            pytest.fail('\n'.join(failures))
 
     def _verify_match_logs(self):
         for pattern in self.matched_patterns:
-            if pattern not in self.matches:
+            if not self._match_matcher.counts[pattern]:
                 pytest.fail('Expected pattern {} did not match'.format(pattern))
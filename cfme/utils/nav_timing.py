@@ -0,0 +1,122 @@
+"""Timing records of the UI navigation steps
+
+Every :py:meth:`cfme.utils.appliance.implementations.ui.CFMENavigateStep.go` records how long it
+spent in the prerequisite, in the step itself and in ``check_for_badness``. A navigation started
+from a test is recorded as a chain, the navigations its prerequisites needed are nested in it.
+
+Recording is switched on by the ``--nav-timing`` option, see :py:mod:`fixtures.nav_timing`.
+"""
+from collections import OrderedDict
+
+import attr
+
+
+@attr.s
+class NavStepTiming(object):
+    """Timing of one navigation step, durations are in seconds"""
+    destination = attr.ib()
+    cls = attr.ib()
+    test = attr.ib(default=None)
+    here = attr.ib(default=False)
+    resetter = attr.ib(default=False)
+    waited = attr.ib(default=False)
+    #: Arrived by the destination URL shortcut, without the prerequisite and the step
+    shortcut = attr.ib(default=False)
+    prerequisite = attr.ib(default=0.0)
+    step = attr.ib(default=0.0)
+    badness = attr.ib(default=0.0)
+    total = attr.ib(default=0.0)
+    children = attr.ib(default=attr.Factory(list))
+
+    @property
+    def name(self):
+        return '{}/{}'.format(self.cls, self.destination)
+
+    @property
+    def chain(self):
+        """Names of the steps in the order they were navigated, prerequisites first"""
+        names = []
+        for child in self.children:
+            names.extend(child.chain)
+        names.append(self.name)
+        return names
+
+    def to_dict(self):
+        return attr.asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data['children'] = [cls.from_dict(child) for child in data.get('children', [])]
+        return cls(**{str(key): value for key, value in data.items()})
+
+
+class NavigationProfiler(object):
+    """Collects the :py:class:`NavStepTiming` of the navigations in this process"""
+    def __init__(self):
+        self.enabled = False
+        #: Node id of the test running now
+        self.test = None
+        self.chains = []
+        self._stack = []
+
+    def start(self, destination, cls):
+        """Starts the record of a step, nested in the step being navigated now if there is one"""
+        timing = NavStepTiming(destination, cls, test=self.test)
+        self._stack.append(timing)
+        return timing
+
+    def finish(self, timing, duration):
+        timing.total = duration
+        self._stack.remove(timing)
+        if not self.enabled:
+            return
+        if self._stack:
+            self._stack[-1].children.append(timing)
+        else:
+            self.chains.append(timing)
+
+    def tests(self):
+        """Navigation count and time per test, the most expensive test first"""
+        tests = OrderedDict()
+        for chain in self.chains:
+            count, total = tests.get(chain.test, (0, 0.0))
+            tests[chain.test] = (count + 1, total + chain.total)
+        return sorted(tests.items(), key=lambda item: item[1][1], reverse=True)
+
+    def slowest_chains(self, count=None):
+        """Navigation chains aggregated over the run, the largest total time first
+
+        Returns:
+            list of ``(chain, navigations, total, maximum)``
+        """
+        chains = OrderedDict()
+        for chain in self.chains:
+            key = ' > '.join(chain.chain)
+            navigations, total, maximum = chains.get(key, (0, 0.0, 0.0))
+            chains[key] = (navigations + 1, total + chain.total, max(maximum, chain.total))
+        result = sorted(
+            ((key,) + values for key, values in chains.items()),
+            key=lambda item: item[2], reverse=True)
+        return result[:count]
+
+    def report(self, count=10):
+        """Lines of text with the slowest chains and the tests spending most time navigating"""
+        lines = ['Slowest navigation chains:']
+        for chain, navigations, total, maximum in self.slowest_chains(count):
+            lines.append('{:>9.1f}s {:>5}x max {:>6.1f}s  {}'.format(
+                total, navigations, maximum, chain))
+        lines.append('Tests spending most time navigating:')
+        for test, (navigations, total) in self.tests()[:count]:
+            lines.append('{:>9.1f}s {:>5}x  {}'.format(total, navigations, test))
+        return lines
+
+    def to_dict(self):
+        return {'chains': [chain.to_dict() for chain in self.chains]}
+
+    def merge(self, data):
+        """Adds the chains recorded by another process, ``data`` as :py:meth:`to_dict` returns"""
+        self.chains.extend(NavStepTiming.from_dict(chain) for chain in data['chains'])
+
+
+profiler = NavigationProfiler()
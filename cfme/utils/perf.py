@@ -103,26 +103,28 @@ def set_rails_loglevel(level, validate_against_worker='MiqUiWorker'):
         evm_tail = SSHTail('/var/www/miq/vmdb/log/evm.log')
         evm_tail.set_initial_file_end()
 
-        yaml_data = {'log': {'level_rails': level}}
-        store.current_appliance.set_yaml_config(yaml_data)
-
-        attempts = 0
-        detected = False
-        while (not detected and attempts < 60):
-            logger.debug('Attempting to detect log level_rails change: {}'.format(attempts))
-            for line in evm_tail:
-                if ui_worker_pid in line:
-                    if 'Log level for production.log has been changed to' in line:
-                        # Detects a log level change but does not validate the log level
-                        logger.info('Detected change to log level for production.log')
-                        detected = True
-                        break
-            time.sleep(1)  # Allow more log lines to accumulate
-            attempts += 1
-        if not (attempts < 60):
-            # Note the error in the logger but continue as the appliance could be slow at logging
-            # that the log level changed
-            logger.error('Could not detect log level_rails change.')
-        evm_tail.close()
+        try:
+            yaml_data = {'log': {'level_rails': level}}
+            store.current_appliance.set_yaml_config(yaml_data)
+
+            attempts = 0
+            detected = False
+            while (not detected and attempts < 60):
+                logger.debug('Attempting to detect log level_rails change: {}'.format(attempts))
+                for line in evm_tail:
+                    if ui_worker_pid in line:
+                        if 'Log level for production.log has been changed to' in line:
+                            # Detects a log level change but does not validate the log level
+                            logger.info('Detected change to log level for production.log')
+                            detected = True
+                            break
+                time.sleep(1)  # Allow more log lines to accumulate
+                attempts += 1
+            if not (attempts < 60):
+                # Note the error in the logger but continue as the appliance could be slow at
+                # logging that the log level changed
+                logger.error('Could not detect log level_rails change.')
+        finally:
+            evm_tail.close()
     else:
         logger.info('Log level_rails already set to {}'.format(level))
@@ -11,6 +11,7 @@ import dateutil.parser as du_parser
 from datetime import timedelta
 from time import time
 import csv
+import multiprocessing
 import numpy
 import os
 import pygal
@@ -59,107 +60,351 @@ miq_top = re.compile(r'([0-9]+)\s+[0-9]+\s+[A-Za-z0-9]+\s+[0-9]+\s+[0-9\-]+\s+([
     r'([0-9\.mg]+)\s+([0-9\.mg]+)\s+[SRDZ]\s+([0-9\.]+)\s+([0-9\.]+)')
 
 
-def evm_to_messages(evm_file, filters):
-    test_start = ''
-    test_end = ''
-    line_count = 0
-    messages = {}
-    msg_cmds = {}
+# Roughly how much of evm.log a single parser process handles at once
+EVM_CHUNK_SIZE = 64 * 1024 * 1024
 
-    runningtime = time()
-    evmlogfile = open(evm_file, 'r')
-    evm_log_line = evmlogfile.readline()
-    while evm_log_line:
-        line_count += 1
-        evm_log_line = evm_log_line.strip()
+# MiqQueue log lines evm_to_messages follows a message through
+QUEUE_EVENTS = {
+    'MiqQueue.put': 'put',
+    'MiqQueue.get_via_drb': 'get',
+    'MiqQueue.delivered': 'delivered',
+}
 
+
+def split_file_at_lines(file_name, chunk_size=EVM_CHUNK_SIZE, min_chunks=1):
+    """Splits a file into ``(start, end)`` byte ranges which all end at a line boundary"""
+    file_size = os.path.getsize(file_name)
+    chunks = max(min_chunks, file_size // chunk_size + 1)
+    bounds = [0]
+    with open(file_name, 'r') as f:
+        for chunk in range(1, chunks):
+            f.seek(max(bounds[-1], file_size * chunk // chunks))
+            f.readline()
+            if f.tell() >= file_size:
+                break
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+    bounds.append(file_size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parse_evm_chunk(chunk):
+    """Parses the MiqQueue put/get/delivered lines of one ``(evm_file, start, end)`` chunk.
+
+    Runs in the parser processes of :py:func:`evm_to_message_columns`, so it only extracts the
+    per-line data and leaves following the messages across lines to the caller.
+
+    Returns:
+        A tuple ``(line_count, first_timestamp, events)``. ``first_timestamp`` is the timestamp
+        of the first ``MIQ()`` line or ``None`` when there is none. ``events`` are tuples of
+        ``(kind, line_number, msg_id, timestamp, pid, value...)``, line numbers are relative to
+        the chunk.
+    """
+    evm_file, start, end = chunk
+    with open(evm_file, 'r') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = data.split('\n')
+    if lines and lines[-1] == '':
+        lines.pop()
+
+    first_timestamp = None
+    events = []
+    for line_number, evm_log_line in enumerate(lines, 1):
+        # cheap substring check before any regex, most lines are not MIQ() ones
+        if 'MIQ(' not in evm_log_line:
+            continue
+        evm_log_line = evm_log_line.strip()
         miqmsg_result = miqmsg.search(evm_log_line)
-        if miqmsg_result:
+        if not miqmsg_result:
+            continue
+        if first_timestamp is None:
+            first_timestamp = get_msg_timestamp_pid(evm_log_line)[0]
+        kind = QUEUE_EVENTS.get(miqmsg_result.group(1))
+        if kind is None:
+            continue
+        msg_id = get_msg_id(evm_log_line)
+        if not msg_id:
+            events.append((kind, line_number, msg_id, None, None))
+            continue
+        ts, pid = get_msg_timestamp_pid(evm_log_line)
+        if kind == 'put':
+            events.append((kind, line_number, msg_id, ts, pid, get_msg_cmd(evm_log_line),
+                get_msg_args(evm_log_line)))
+        elif kind == 'get':
+            events.append((kind, line_number, msg_id, ts, pid, get_msg_deq(evm_log_line)))
+        else:
+            events.append((kind, line_number, msg_id, ts, pid, get_msg_del(evm_log_line)))
+    return len(lines), first_timestamp, events
 
-            # Obtains the first timestamp in the log file
-            if test_start == '':
-                ts, pid = get_msg_timestamp_pid(evm_log_line)
-                test_start = ts
 
-            # A message was first put on the queue, this starts its queuing time
-            if (miqmsg_result.group(1) == 'MiqQueue.put'):
+def _text(value):
+    """Fixed width numpy strings are bytes on python 3"""
+    return value if isinstance(value, str) else value.decode('ascii')
+
+
+class GrowingColumn(object):
+    """A numpy array which can be appended to, growing its storage geometrically"""
+
+    def __init__(self, dtype, capacity=1024):
+        self._data = numpy.zeros(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, value):
+        if self._size == len(self._data):
+            self._data = numpy.concatenate([self._data, numpy.zeros_like(self._data)])
+        self._data[self._size] = value
+        self._size += 1
 
-                msg_cmd = get_msg_cmd(evm_log_line)
-                msg_id = get_msg_id(evm_log_line)
-                if msg_id:
-                    ts, pid = get_msg_timestamp_pid(evm_log_line)
+    def __getitem__(self, index):
+        return self._data[index]
+
+    def __setitem__(self, index, value):
+        self._data[index] = value
+
+    @property
+    def values(self):
+        return self._data[:self._size]
+
+
+class Interner(object):
+    """Maps repeated strings (commands, args, pids) to small integer ids and back"""
+
+    def __init__(self):
+        self.values = []
+        self._ids = {}
+
+    def __call__(self, value):
+        try:
+            return self._ids[value]
+        except KeyError:
+            self._ids[value] = len(self.values)
+            self.values.append(value)
+            return self._ids[value]
+
+
+class MessageColumns(object):
+    """Per-message data of the queue messages, stored column-wise.
+
+    Every column is a numpy array and row ``i`` of all of them belongs to the same message.
+    Strings repeated across messages (commands, args and pids) are interned, their columns
+    hold ids into ``cmds``, ``args`` and ``pids``. Timestamps are fixed width byte strings.
+
+    While parsing, messages are added with :py:meth:`put`, :py:meth:`get` and
+    :py:meth:`delivered`. :py:meth:`finish` then sorts the rows by message id and applies the
+    command filters, after that the columns are available as plain arrays.
+    """
+    headers = ['msg_id', 'msg_cmd', 'msg_args', 'pid_put', 'pid_get', 'puttime', 'gettime',
+        'deq_time', 'del_time', 'total_time']
+    numeric = ['deq_time', 'del_time', 'total_time']
+    interned = {'cmd_id': 'cmds', 'args_id': 'args', 'pid_put_id': 'pids', 'pid_get_id': 'pids'}
+    timestamps = ['puttime', 'gettime']
+    columns = ['msg_id'] + sorted(interned) + timestamps + numeric
+
+    def __init__(self):
+        self._rows = {}
+        self._cmds = Interner()
+        self._args = Interner()
+        self._pids = Interner()
+        self._pids('')
+        self.msg_id = GrowingColumn(numpy.int64)
+        for column in self.interned:
+            setattr(self, column, GrowingColumn(numpy.int32))
+        for column in self.timestamps:
+            setattr(self, column, GrowingColumn('S26'))
+        for column in self.numeric:
+            setattr(self, column, GrowingColumn(numpy.float64))
+
+    def __len__(self):
+        return len(self.msg_id)
+
+    def __contains__(self, msg_id):
+        return int(msg_id) in self._rows
+
+    def put(self, msg_id, msg_cmd, msg_args, pid, puttime):
+        """A message was put on the queue, a repeated put starts the message over"""
+        values = {'cmd_id': self._cmds(msg_cmd), 'args_id': self._args(msg_args),
+            'pid_put_id': self._pids(pid), 'pid_get_id': 0, 'puttime': puttime, 'gettime': '',
+            'deq_time': 0.0, 'del_time': 0.0, 'total_time': 0.0}
+        msg_id = int(msg_id)
+        row = self._rows.get(msg_id)
+        if row is None:
+            self._rows[msg_id] = len(self)
+            self.msg_id.append(msg_id)
+            for column, value in values.items():
+                getattr(self, column).append(value)
+        else:
+            for column, value in values.items():
+                getattr(self, column)[row] = value
+
+    def get(self, msg_id, pid, gettime, deq_time):
+        row = self._rows[int(msg_id)]
+        self.pid_get_id[row] = self._pids(pid)
+        self.gettime[row] = gettime
+        self.deq_time[row] = deq_time
+
+    def delivered(self, msg_id, del_time):
+        row = self._rows[int(msg_id)]
+        self.del_time[row] = del_time
+        self.total_time[row] = self.deq_time[row] + del_time
+
+    def finish(self, filters):
+        """Sorts the rows and appends the matching filter names to the commands.
+
+        Returns:
+            A dict mapping each command to the lists of its non-zero ``total``, ``queue`` and
+            ``execute`` timings, rounded to 2 decimals.
+        """
+        # the ids are sorted as strings, that's the order the reports always used
+        order = numpy.argsort(self.msg_id.values.astype('S20'), kind='mergesort')
+        for column in self.columns:
+            setattr(self, column, getattr(self, column).values[order])
+        self._rows = None
+        self.pids = self._pids.values
+        self.args = self._args.values
+
+        # By filtering over messages, we can better display what is occuring under the covers,
+        # as a daily rollup is picked up off the queue different than a hourly rollup, etc.
+        # Filters only depend on the command and args, so every distinct pair is filtered once.
+        cmds = Interner()
+        pairs, pair_ids = numpy.unique(
+            self.cmd_id.astype(numpy.int64) * len(self.args) + self.args_id, return_inverse=True)
+        filtered_ids = numpy.zeros(len(pairs), dtype=numpy.int32)
+        for index, pair in enumerate(pairs):
+            msg_cmd = self._cmds.values[pair // len(self.args)]
+            msg_args = self.args[pair % len(self.args)]
+            # Determine if the pattern matches and append to the command if it does
+            for p_filter in filters:
+                if filters[p_filter].search(msg_args.strip()):
+                    msg_cmd = '{}{}'.format(msg_cmd, p_filter)
+                    break
+            filtered_ids[index] = cmds(msg_cmd)
+        self.cmd_id = filtered_ids[pair_ids].reshape(-1)
+        self.cmds = cmds.values
+
+        msg_cmds = {}
+        for cmd_id, msg_cmd in enumerate(self.cmds):
+            timed = (self.cmd_id == cmd_id) & (self.total_time != 0)
+            msg_cmds[msg_cmd] = {
+                'total': [round(value, 2) for value in self.total_time[timed].tolist()],
+                'queue': [round(value, 2) for value in self.deq_time[timed].tolist()],
+                'execute': [round(value, 2) for value in self.del_time[timed].tolist()],
+            }
+        return msg_cmds
+
+    def by_cmd(self):
+        """Yields ``(msg_cmd, row_mask)`` for every command"""
+        for cmd_id, msg_cmd in enumerate(self.cmds):
+            yield msg_cmd, self.cmd_id == cmd_id
+
+    def rows(self):
+        """Yields one dict per message, with the keys of :py:attr:`headers`"""
+        for row in range(len(self)):
+            yield {
+                'msg_id': '\'{}\''.format(self.msg_id[row]),
+                'msg_cmd': self.cmds[self.cmd_id[row]],
+                'msg_args': self.args[self.args_id[row]],
+                'pid_put': self.pids[self.pid_put_id[row]],
+                'pid_get': self.pids[self.pid_get_id[row]],
+                'puttime': _text(self.puttime[row]),
+                'gettime': _text(self.gettime[row]),
+                'deq_time': float(self.deq_time[row]),
+                'del_time': float(self.del_time[row]),
+                'total_time': float(self.total_time[row]),
+            }
+
+
+def evm_to_message_columns(evm_file, filters, processes=None):
+    """Parses evm.log for queue messages in parallel.
+
+    The file is split at line boundaries and the chunks are parsed by a pool of ``processes``
+    worker processes (one per CPU by default). The put/get/delivered records are then merged by
+    message id in file order, so the results are the same as parsing the file line by line.
+
+    Returns:
+        A tuple ``(columns, msg_cmds, test_start, test_end, line_count)`` where ``columns`` is a
+        :py:class:`MessageColumns` and ``msg_cmds`` maps each command to lists of its
+        ``total``, ``queue`` and ``execute`` timings.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    chunks = [(evm_file, start, end)
+              for start, end in split_file_at_lines(evm_file, min_chunks=processes)]
+
+    test_start = ''
+    test_end = ''
+    line_count = 0
+    columns = MessageColumns()
+
+    if processes > 1 and len(chunks) > 1:
+        pool = multiprocessing.Pool(processes)
+        parsed_chunks = pool.imap(parse_evm_chunk, chunks)
+    else:
+        pool = None
+        parsed_chunks = (parse_evm_chunk(chunk) for chunk in chunks)
+
+    runningtime = time()
+    try:
+        for chunk_line_count, first_timestamp, events in parsed_chunks:
+            # Obtains the first timestamp in the log file
+            if test_start == '' and first_timestamp is not None:
+                test_start = first_timestamp
+            for event in events:
+                kind, event_line, msg_id, ts, pid = event[:5]
+                if not msg_id:
+                    logger.error('Could not obtain message id, line #: %s',
+                        line_count + event_line)
+                    continue
+                if kind == 'put':
+                    # A message was first put on the queue, this starts its queuing time
+                    msg_cmd, msg_args = event[5:]
                     test_end = ts
-                    messages[msg_id] = MiqMsgStat()
-                    messages[msg_id].msg_id = msg_id
-                    messages[msg_id].msg_id = '\'' + msg_id + '\''
-                    messages[msg_id].msg_cmd = msg_cmd
-                    messages[msg_id].pid_put = pid
-                    messages[msg_id].puttime = ts
-                    msg_args = get_msg_args(evm_log_line)
                     if msg_args is False:
-                        logger.debug('Could not obtain message args line #: %s', line_count)
-                    else:
-                        messages[msg_id].msg_args = msg_args
-                else:
-                    logger.error('Could not obtain message id, line #: %s', line_count)
-
-            elif (miqmsg_result.group(1) == 'MiqQueue.get_via_drb'):
-                msg_id = get_msg_id(evm_log_line)
-                if msg_id:
-                    if msg_id in messages:
-                        ts, pid = get_msg_timestamp_pid(evm_log_line)
+                        logger.debug('Could not obtain message args line #: %s',
+                            line_count + event_line)
+                        msg_args = ''
+                    columns.put(msg_id, msg_cmd, msg_args, pid, ts)
+                elif msg_id not in columns:
+                    if kind == 'delivered':
                         test_end = ts
-                        messages[msg_id].pid_get = pid
-                        messages[msg_id].gettime = ts
-                        messages[msg_id].deq_time = get_msg_deq(evm_log_line)
-                    else:
-                        logger.error('Message ID not in dictionary: %s', msg_id)
-                else:
-                    logger.error('Could not obtain message id, line #: %s', line_count)
-
-            elif (miqmsg_result.group(1) == 'MiqQueue.delivered'):
-                msg_id = get_msg_id(evm_log_line)
-                if msg_id:
-                    ts, pid = get_msg_timestamp_pid(evm_log_line)
+                    logger.error('Message ID not in dictionary: %s', msg_id)
+                elif kind == 'get':
                     test_end = ts
-                    if msg_id in messages:
-                        messages[msg_id].del_time = get_msg_del(evm_log_line)
-                        messages[msg_id].total_time = messages[msg_id].deq_time + \
-                            messages[msg_id].del_time
-                    else:
-                        logger.error('Message ID not in dictionary: %s', msg_id)
+                    columns.get(msg_id, pid, ts, event[5])
                 else:
-                    logger.error('Could not obtain message id, line #: %s', line_count)
-
-        if (line_count % 100000) == 0:
+                    test_end = ts
+                    columns.delivered(msg_id, event[5])
+            line_count += chunk_line_count
             timediff = time() - runningtime
             runningtime = time()
-            logger.info('Count {} : Parsed 100000 lines in %s', line_count, timediff)
-
-        evm_log_line = evmlogfile.readline()
-
-    # I tried to avoid two loops but this reduced the complexity of filtering on messages.
-    # By filtering over messages, we can better display what is occuring under the covers, as a
-    # daily rollup is picked up off the queue different than a hourly rollup, etc
-    for msg in sorted(messages.keys()):
-        msg_args = messages[msg].msg_args
-        # Determine if the pattern matches and append to the command if it does
-        for p_filter in filters:
-            results = filters[p_filter].search(msg_args.strip())
-            if results:
-                messages[msg].msg_cmd = '{}{}'.format(messages[msg].msg_cmd, p_filter)
-                break
-        msg_cmd = messages[msg].msg_cmd
-        if msg_cmd not in msg_cmds:
-            msg_cmds[msg_cmd] = {}
-            msg_cmds[msg_cmd]['total'] = []
-            msg_cmds[msg_cmd]['queue'] = []
-            msg_cmds[msg_cmd]['execute'] = []
-        if messages[msg].total_time != 0:
-            msg_cmds[msg_cmd]['total'].append(round(messages[msg].total_time, 2))
-            msg_cmds[msg_cmd]['queue'].append(round(messages[msg].deq_time, 2))
-            msg_cmds[msg_cmd]['execute'].append(round(messages[msg].del_time, 2))
+            logger.info('Count %s : Parsed %s lines in %s', line_count, chunk_line_count,
+                timediff)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    msg_cmds = columns.finish(filters)
+    return columns, msg_cmds, test_start, test_end, line_count
+
 
+def evm_to_messages(evm_file, filters, processes=None):
+    """Parses evm.log for queue messages, see :py:func:`evm_to_message_columns`
+
+    Returns:
+        A tuple ``(messages, msg_cmds, test_start, test_end, line_count)`` where ``messages``
+        maps each message id to a :py:class:`MiqMsgStat`.
+    """
+    columns, msg_cmds, test_start, test_end, line_count = evm_to_message_columns(
+        evm_file, filters, processes)
+    messages = {}
+    for row in columns.rows():
+        msg = MiqMsgStat()
+        for field, value in row.items():
+            setattr(msg, field, value)
+        messages[msg.msg_id[1:-1]] = msg
     return messages, msg_cmds, test_start, test_end, line_count
 
 
@@ -296,7 +541,7 @@ def generate_hourly_charts_and_csvs(hourly_buckets, charts_dir):
 
         logger.info('Writing %s csvs/charts', cmd)
         output_file = csv_rawdata_path.open('w', ensure=True)
-        csvwriter = csv.DictWriter(output_file, fieldnames=MiqMsgBucket().headers,
+        csvwriter = csv.DictWriter(output_file, fieldnames=MiqMsgBucket.headers,
             delimiter=',', quotechar='\'', quoting=csv.QUOTE_MINIMAL)
         csvwriter.writeheader()
         for dt in sorted(hourly_buckets[cmd].keys()):
@@ -361,6 +606,18 @@ def generate_raw_data_csv(rawdata_dict, csv_file_name):
         csvwriter.writerow(dict(rawdata_dict[key]))
 
 
+def generate_message_data_csv(columns, csv_file_name):
+    csv_rawdata_path = log_path.join('csv_output', csv_file_name)
+    output_file = csv_rawdata_path.open('w', ensure=True)
+    try:
+        csvwriter = csv.DictWriter(output_file, fieldnames=columns.headers, delimiter=',',
+            quotechar='\'', quoting=csv.QUOTE_MINIMAL)
+        csvwriter.writeheader()
+        csvwriter.writerows(columns.rows())
+    finally:
+        output_file.close()
+
+
 def generate_total_time_charts(msg_cmds, charts_dir):
     for cmd in sorted(msg_cmds):
         logger.info('Generating Total Time Chart for %s', cmd)
@@ -478,76 +735,67 @@ def line_chart_render(title, xtitle, ytitle, x_labels, lines, fname, stacked=Fal
     line_chart.render_to_file(str(fname))
 
 
-def messages_to_hourly_buckets(messages, test_start, test_end):
+def _hour_statistics(hours, values):
+    """Groups ``values`` by hour, ``hours`` holds ``'YYYY-MM-DD HH'`` keys for every value.
+
+    Returns:
+        A tuple ``(keys, counts, sums, minimums, maximums)`` of arrays with one item per hour.
+        Zero timings count as "not measured", the minimum is the one of the non-zero values.
+    """
+    keys, index = numpy.unique(hours, return_inverse=True)
+    counts = numpy.bincount(index, minlength=len(keys))
+    sums = numpy.bincount(index, weights=values, minlength=len(keys))
+    maximums = numpy.zeros(len(keys))
+    numpy.maximum.at(maximums, index, values)
+    minimums = numpy.full(len(keys), numpy.inf)
+    measured = values != 0
+    numpy.minimum.at(minimums, index[measured], values[measured])
+    minimums[numpy.isinf(minimums)] = 0.0
+    return keys, counts, sums, minimums, maximums
+
+
+def _hour_bucket(buckets, hour):
+    hour = _text(hour)
+    return buckets.setdefault(hour[:10], {}).setdefault(hour[11:13], MiqMsgBucket())
+
+
+def messages_to_hourly_buckets(columns, test_start, test_end):
+    """Buckets the message timings of a :py:class:`MessageColumns` by command, date and hour
+
+    Dequeue timings land in the hour the message was put on the queue, delivery timings in the
+    hour it was picked up. Messages never picked up land in the ``['']['']`` bucket.
+    """
     hr_bkt = {}
     # Hour buckets look like: hr_bkt[msg_cmd][msg_date][msg_hour] = MiqMsgBucket()
-    for msg in messages:
+    # Slicing 'YYYY-MM-DD HH:MM:SS.ffffff' to 13 characters leaves the date and the hour
+    put_hours = columns.puttime.astype('S13')
+    get_hours = columns.gettime.astype('S13')
+    for msg_cmd, rows in columns.by_cmd():
+        buckets = hr_bkt[msg_cmd] = provision_hour_buckets(test_start, test_end)
+
         # put on queue, deals with queuing:
-        msg_cmd = messages[msg].msg_cmd
-        putdate = messages[msg].puttime[:10]
-        puthour = messages[msg].puttime[11:13]
-        if msg_cmd not in hr_bkt:
-            hr_bkt[msg_cmd] = provision_hour_buckets(test_start, test_end)
-
-        hr_bkt[msg_cmd][putdate][puthour].total_put += 1
-        hr_bkt[msg_cmd][putdate][puthour].sum_deq += messages[msg].deq_time
-        if (hr_bkt[msg_cmd][putdate][puthour].min_deq == 0 or
-                hr_bkt[msg_cmd][putdate][puthour].min_deq > messages[msg].deq_time):
-            hr_bkt[msg_cmd][putdate][puthour].min_deq = messages[msg].deq_time
-        if (hr_bkt[msg_cmd][putdate][puthour].max_deq == 0 or
-                hr_bkt[msg_cmd][putdate][puthour].max_deq < messages[msg].deq_time):
-            hr_bkt[msg_cmd][putdate][puthour].max_deq = messages[msg].deq_time
-        hr_bkt[msg_cmd][putdate][puthour].avg_deq = \
-            hr_bkt[msg_cmd][putdate][puthour].sum_deq / hr_bkt[msg_cmd][putdate][puthour].total_put
+        for hour, count, total, minimum, maximum in zip(
+                *_hour_statistics(put_hours[rows], columns.deq_time[rows])):
+            bucket = _hour_bucket(buckets, hour)
+            bucket.total_put = int(count)
+            bucket.sum_deq = float(total)
+            bucket.min_deq = float(minimum)
+            bucket.max_deq = float(maximum)
+            bucket.avg_deq = bucket.sum_deq / bucket.total_put
 
         # Get time is when the message is delivered
-        getdate = messages[msg].gettime[:10]
-        gethour = messages[msg].gettime[11:13]
-
-        hr_bkt[msg_cmd][getdate][gethour].total_get += 1
-        hr_bkt[msg_cmd][getdate][gethour].sum_del += messages[msg].del_time
-        if (hr_bkt[msg_cmd][getdate][gethour].min_del == 0 or
-                hr_bkt[msg_cmd][getdate][gethour].min_del > messages[msg].del_time):
-            hr_bkt[msg_cmd][getdate][gethour].min_del = messages[msg].del_time
-        if (hr_bkt[msg_cmd][getdate][gethour].max_del == 0 or
-                hr_bkt[msg_cmd][getdate][gethour].max_del < messages[msg].del_time):
-            hr_bkt[msg_cmd][getdate][gethour].max_del = messages[msg].del_time
-
-        hr_bkt[msg_cmd][getdate][gethour].avg_del = \
-            hr_bkt[msg_cmd][getdate][gethour].sum_del / hr_bkt[msg_cmd][getdate][gethour].total_get
+        for hour, count, total, minimum, maximum in zip(
+                *_hour_statistics(get_hours[rows], columns.del_time[rows])):
+            bucket = _hour_bucket(buckets, hour)
+            bucket.total_get = int(count)
+            bucket.sum_del = float(total)
+            bucket.min_del = float(minimum)
+            bucket.max_del = float(maximum)
+            bucket.avg_del = bucket.sum_del / bucket.total_get
     return hr_bkt
 
 
-def messages_to_statistics_csv(messages, statistics_file_name):
-    all_statistics = []
-    for msg_id in messages:
-        msg = messages[msg_id]
-
-        added = False
-        if len(all_statistics) > 0:
-            for msg_statistics in all_statistics:
-                if msg_statistics.cmd == msg.msg_cmd:
-
-                    if msg.del_time > 0:
-                        msg_statistics.delivertimes.append(float(msg.del_time))
-                        msg_statistics.gets += 1
-                    msg_statistics.dequeuetimes.append(float(msg.deq_time))
-                    msg_statistics.totaltimes.append(float(msg.total_time))
-                    msg_statistics.puts += 1
-                    added = True
-                    break
-
-        if not added:
-            msg_statistics = MiqMsgLists()
-            msg_statistics.cmd = msg.msg_cmd
-            if msg.del_time > 0:
-                msg_statistics.delivertimes.append(float(msg.del_time))
-                msg_statistics.gets = 1
-            msg_statistics.dequeuetimes.append(float(msg.deq_time))
-            msg_statistics.totaltimes.append(float(msg.total_time))
-            msg_statistics.puts = 1
-            all_statistics.append(msg_statistics)
-
+def messages_to_statistics_csv(columns, statistics_file_name):
     csvdata_path = log_path.join('csv_output', statistics_file_name)
     outputfile = csvdata_path.open('w', ensure=True)
 
@@ -563,18 +811,22 @@ def messages_to_statistics_csv(messages, statistics_file_name):
         csvfile.writerow(headers)
 
         # Contents of CSV
-        for msg_statistics in sorted(all_statistics, key=lambda x: x.cmd):
-            if msg_statistics.gets > 1:
+        for msg_cmd, rows in sorted(columns.by_cmd()):
+            dequeuetimes = columns.deq_time[rows]
+            delivertimes = columns.del_time[rows]
+            delivertimes = delivertimes[delivertimes > 0]
+            totaltimes = columns.total_time[rows]
+            if len(delivertimes) > 1:
                 logger.debug('Samples/Avg/90th/Std: %s: %s : %s : %s,Cmd: %s',
-                    str(len(msg_statistics.totaltimes)).rjust(7),
-                    str(round(numpy.average(msg_statistics.totaltimes), 3)).rjust(7),
-                    str(round(numpy.percentile(msg_statistics.totaltimes, 90), 3)).rjust(7),
-                    str(round(numpy.std(msg_statistics.totaltimes), 3)).rjust(7),
-                    msg_statistics.cmd)
-            stats = [msg_statistics.cmd, msg_statistics.puts, msg_statistics.gets]
-            stats.extend(generate_statistics(msg_statistics.dequeuetimes, 3))
-            stats.extend(generate_statistics(msg_statistics.delivertimes, 3))
-            stats.extend(generate_statistics(msg_statistics.totaltimes, 3))
+                    str(len(totaltimes)).rjust(7),
+                    str(round(numpy.average(totaltimes), 3)).rjust(7),
+                    str(round(numpy.percentile(totaltimes, 90), 3)).rjust(7),
+                    str(round(numpy.std(totaltimes), 3)).rjust(7),
+                    msg_cmd)
+            stats = [msg_cmd, len(totaltimes), len(delivertimes)]
+            stats.extend(generate_statistics(dequeuetimes, 3))
+            stats.extend(generate_statistics(delivertimes, 3))
+            stats.extend(generate_statistics(totaltimes, 3))
             csvfile.writerow(stats)
     finally:
         outputfile.close()
@@ -809,7 +1061,8 @@ def perf_process_evm(evm_file, top_file):
     initialtime = starttime
 
     logger.info('----------- Parsing evm log file for messages -----------')
-    messages, msg_cmds, test_start, test_end, msg_lc = evm_to_messages(evm_file, msg_filters)
+    messages, msg_cmds, test_start, test_end, msg_lc = evm_to_message_columns(evm_file,
+        msg_filters)
     timediff = time() - starttime
     logger.info('----------- Completed Parsing evm log file -----------')
     logger.info('Parsed %s lines of evm log file for messages in %s', msg_lc, timediff)
@@ -852,7 +1105,7 @@ def perf_process_evm(evm_file, top_file):
 
     logger.info('----------- Generating Raw Data csv files -----------')
     starttime = time()
-    generate_raw_data_csv(messages, 'queue-rawdata.csv')
+    generate_message_data_csv(messages, 'queue-rawdata.csv')
     generate_raw_data_csv(workers, 'workers-rawdata.csv')
     timediff = time() - starttime
     logger.info('Generated Raw Data csv files in: %s', timediff)
@@ -1029,10 +1282,10 @@ def perf_process_evm(evm_file, top_file):
 
 
 class MiqMsgStat(object):
+    headers = MessageColumns.headers
+    __slots__ = headers
 
     def __init__(self):
-        self.headers = ['msg_id', 'msg_cmd', 'msg_args', 'pid_put', 'pid_get', 'puttime', 'gettime',
-            'deq_time', 'del_time', 'total_time']
         self.msg_id = ''
         self.msg_cmd = ''
         self.msg_args = ''
@@ -1055,6 +1308,7 @@ class MiqMsgStat(object):
 
 
 class MiqMsgLists(object):
+    __slots__ = ['cmd', 'puts', 'gets', 'dequeuetimes', 'delivertimes', 'totaltimes']
 
     def __init__(self):
         self.cmd = ''
@@ -1066,9 +1320,11 @@ class MiqMsgLists(object):
 
 
 class MiqMsgBucket(object):
+    headers = ['date', 'hour', 'total_put', 'total_get', 'sum_deq', 'min_deq', 'max_deq',
+        'avg_deq', 'sum_del', 'min_del', 'max_del', 'avg_del']
+    __slots__ = headers
+
     def __init__(self):
-        self.headers = ['date', 'hour', 'total_put', 'total_get', 'sum_deq', 'min_deq', 'max_deq',
-            'avg_deq', 'sum_del', 'min_del', 'max_del', 'avg_del']
         self.date = ''
         self.hour = ''
         self.total_put = 0
@@ -1094,9 +1350,10 @@ class MiqMsgBucket(object):
 
 
 class MiqWorker(object):
+    headers = ['worker_id', 'worker_type', 'pid', 'start_ts', 'end_ts', 'terminated']
+    __slots__ = headers
 
     def __init__(self):
-        self.headers = ['worker_id', 'worker_type', 'pid', 'start_ts', 'end_ts', 'terminated']
         self.worker_id = 0
         self.worker_type = ''
         self.pid = ''
@@ -1,12 +1,21 @@
 # -*- coding: utf-8 -*-
 """Helper functions for tests using REST API."""
 
+import time
 from collections import namedtuple
 
 from cfme.exceptions import OptionNotAvailable
 from cfme.utils import error
 from cfme.utils.wait import wait_for
 
+#: Resources requested at once by :py:func:`query_collection`
+QUERY_PAGE_SIZE = 1000
+#: How many seconds :py:func:`query_collection` keeps the resources it queried
+QUERY_CACHE_TIME = 30
+
+# (collection href, attributes) -> (time queried, resources)
+_query_cache = {}
+
 
 def assert_response(
         rest_obj, success=None, http_status=None, results_num=None, task_wait=600):
@@ -216,3 +225,43 @@ def query_resource_attributes(resource, soft_assert=None):
                 failure.type, failure.name, failure.response.status_code, failure.error))
 
     return outcome
+
+
+def query_collection(rest_api, col_name, attributes, refresh=False):
+    """Returns all resources of a collection as dicts with only the given attributes.
+
+    The resources are requested expanded, ``QUERY_PAGE_SIZE`` at once, instead of loading every
+    resource of the collection by its own request. The result is kept for ``QUERY_CACHE_TIME``
+    seconds for the collection of that appliance, unless ``refresh`` asks to query it again.
+
+    Args:
+        rest_api: :py:class:`cfme.utils.appliance.MiqApi` of the appliance
+        col_name: name of the collection, like ``vms``
+        attributes: names of the attributes the resources need, ``id`` and ``href`` always come
+    """
+    collection = getattr(rest_api.collections, col_name)
+    key = (collection._href, tuple(sorted(attributes)))
+    queried, resources = _query_cache.get(key, (None, None))
+    if not refresh and queried is not None and time.time() - queried < QUERY_CACHE_TIME:
+        return resources
+
+    resources = []
+    queried = time.time()
+    while True:
+        response = rest_api.get(
+            collection._href, expand='resources', attributes=','.join(key[1]),
+            offset=len(resources), limit=QUERY_PAGE_SIZE)
+        page = response.get('resources', [])
+        resources.extend(page)
+        if len(page) < QUERY_PAGE_SIZE:
+            break
+    _query_cache[key] = (queried, resources)
+    return resources
+
+
+def index_resources(resources, key):
+    """Maps the ``key`` attribute of the resources to the resources, the first one wins"""
+    index = {}
+    for resource in resources:
+        index.setdefault(resource.get(key), resource)
+    return index
@@ -0,0 +1,135 @@
+"""Generates load on an appliance by REST actions submitted at a target rate
+
+Workloads like the VM refresh one used to call ``vm.action.reload()`` for one VM after the other,
+so the rate they achieved was bound by the latency of the appliance. :py:class:`RestActionLoad`
+instead either submits the action for many resources in one collection request or runs the
+requests of single resources concurrently over a pool of connections. In both cases the requests
+start at the configured rate and their latencies are recorded for the workload quantifiers.
+
+.. code-block:: python
+
+    with RestActionLoad(appliance.rest_api, rate=20, workers=10) as load:
+        load.run('vms', 'reload', vms)
+    quantifiers.update(load.quantifiers('VM_Refresh'))
+"""
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from concurrent import futures
+
+from requests.adapters import HTTPAdapter
+
+from cfme.utils.log import logger
+from cfme.utils.perf import generate_statistics
+
+#: Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class RestActionLoad(object):
+    """Submits REST actions at a target rate and records their latencies
+
+    Args:
+        rest_api: :py:class:`cfme.utils.appliance.MiqApi` of the appliance
+        rate: requests started per second, as fast as possible if not set
+        workers: how many requests run at the same time
+        bulk_size: if set, the action is requested for this many resources at once through the
+            collection, otherwise every resource gets a request of its own
+    """
+    def __init__(self, rest_api, rate=None, workers=10, bulk_size=None):
+        self.rest_api = rest_api
+        self.rate = rate
+        self.workers = workers
+        self.bulk_size = bulk_size
+        self.latencies = []
+        self.errors = 0
+        #: How many seconds the requests started after their scheduled time at most
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+        self._next_start = None
+        # requests keeps only 10 connections per host by default, the workers need one each
+        rest_api._session.mount('https://', HTTPAdapter(pool_maxsize=workers))
+        self._executor = futures.ThreadPoolExecutor(max_workers=workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _wait_for_slot(self):
+        """Sleeps until the next request may start according to the rate"""
+        if self.rate is None:
+            return
+        now = time.time()
+        if self._next_start is None or self._next_start < now - 1:
+            # do not catch up after the load was idle
+            self._next_start = now
+        elif self._next_start > now:
+            time.sleep(self._next_start - now)
+        self.max_lag = max(self.max_lag, time.time() - self._next_start)
+        self._next_start += 1.0 / self.rate
+
+    def _request(self, func, *args):
+        start = time.time()
+        try:
+            return func(*args)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning('REST load request failed: %s', e)
+        finally:
+            with self._lock:
+                self.latencies.append(time.time() - start)
+
+    def submit(self, collection_name, action, resources):
+        """Schedules the action for the resources and returns the futures of the requests"""
+        resources = list(resources)
+        if self.bulk_size:
+            bulk_action = getattr(getattr(self.rest_api.collections, collection_name).action,
+                                  action)
+            calls = [(bulk_action, resources[i:i + self.bulk_size])
+                     for i in range(0, len(resources), self.bulk_size)]
+        else:
+            calls = [(getattr(resource.action, action), []) for resource in resources]
+        submitted = []
+        for func, args in calls:
+            self._wait_for_slot()
+            submitted.append(self._executor.submit(self._request, func, *args))
+        return submitted
+
+    def run(self, collection_name, action, resources):
+        """Like :py:meth:`submit`, but waits for the requests to finish
+
+        Returns:
+            How many requests failed
+        """
+        errors = self.errors
+        futures.wait(self.submit(collection_name, action, resources))
+        return self.errors - errors
+
+    def histogram(self):
+        """Numbers of requests by their latency, keyed by the upper bound of the bucket"""
+        counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        for latency in self.latencies:
+            counts[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+        keys = ['<={}s'.format(bound) for bound in LATENCY_BUCKETS]
+        keys.append('>{}s'.format(LATENCY_BUCKETS[-1]))
+        return OrderedDict(zip(keys, counts))
+
+    def quantifiers(self, name):
+        """Workload quantifiers of the requests made so far, named after ``name``"""
+        statistics = generate_statistics(self.latencies, decimals=3)
+        return {
+            '{}_Requests'.format(name): len(self.latencies),
+            '{}_Request_Errors'.format(name): self.errors,
+            '{}_Request_Max_Lag'.format(name): round(self.max_lag, 3),
+            '{}_Request_Latency'.format(name): OrderedDict(zip(
+                ('samples', 'min', 'avg', 'median', 'max', 'stddev', '90th', '99th'),
+                statistics)),
+            '{}_Request_Latency_Histogram'.format(name): self.histogram(),
+        }
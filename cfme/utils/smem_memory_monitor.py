@@ -1,6 +1,9 @@
 """Monitor Memory on a CFME/Miq appliance and builds report&graphs displaying usage per process."""
+import bisect
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+import multiprocessing
+import numpy
 import os
 import time
 import traceback
@@ -9,13 +12,13 @@ import six
 
 from cfme.utils.conf import cfme_performance
 from cfme.utils.log import logger
-from cfme.utils.path import results_path
+from cfme.utils.path import data_path, results_path
 from cfme.utils.version import get_version
 from cfme.utils.version import current_version
 from collections import OrderedDict
 from cycler import cycler
 from datetime import datetime
-from threading import Thread
+from threading import Thread, _MainThread, current_thread
 from yaycl import AttrDict
 import json
 import matplotlib as mpl
@@ -138,16 +141,272 @@ test_ts = time.strftime('%Y%m%d%H%M%S')
 # 10s sample interval (occasionally sampling can take almost 4s on an appliance doing a lot of work)
 SAMPLE_INTERVAL = 10
 
+MEMINFO_COMMAND = 'cat /proc/meminfo'
+SMEM_COMMAND = 'smem -c \'pid rss pss uss vss swap name command\' | sed 1d'
+
+# Batched sampling uploads this script, which then streams all measurements over one channel
+COLLECTOR_SCRIPT = data_path.join('bundles', 'memory_monitor', 'collector.py')
+COLLECTOR_REMOTE_PATH = '/tmp/smem_memory_collector.py'
+
+APPLIANCE_MEASUREMENTS = ['total', 'free', 'used', 'buffers', 'cached', 'slab', 'swap_total',
+    'swap_free']
+PROCESS_MEASUREMENTS = ['rss', 'pss', 'uss', 'vss', 'swap']
+
+# Processes tracked besides the miq workers, by smem process name
+system_processes = {
+    'httpd': 'httpd',
+    'postgres': 'postgres',
+    'postmaster': 'postgres',
+    'memcached': 'memcached',
+    'collectd': 'collectd',
+}
+# Ruby processes tracked besides the miq workers, by a part of their command line
+ruby_scripts = [
+    ('evm_server.rb', 'MIQ Server (evm_server.rb)'),
+    ('MIQ Server', 'MIQ Server (evm_server.rb)'),
+    ('evm_watchdog.rb', 'evm_watchdog.rb'),
+    ('appliance_console.rb', 'appliance_console.rb'),
+    ('evm:dbsync:replicate', 'evm:dbsync:replicate'),
+]
+
+
+def process_name(name, cmd):
+    """Returns the name results of a process not being a miq worker are kept under, or None"""
+    if name == 'ruby':
+        for script, result_name in ruby_scripts:
+            if script in cmd:
+                return result_name
+        return None
+    return system_processes.get(name)
+
+
+def appliance_memory(meminfo):
+    """Computes the appliance measurements (in MiB) from /proc/meminfo values (in kB)"""
+    # 5.5/5.6 - RHEL 7 / Centos 7
+    # Application Memory Used : MemTotal - (MemFree + Slab + Cached)
+    # 5.4 - RHEL 6 / Centos 6
+    # Application Memory Used : MemTotal - (MemFree + Buffers + Cached)
+    # Available memory could potentially be better metric
+    if 'MemAvailable' in meminfo:  # 5.5, RHEL 7/Centos 7
+        mem_used = meminfo['MemTotal'] - (meminfo['MemFree'] + meminfo['Slab'] +
+            meminfo['Cached'])
+    else:  # 5.4, RHEL 6/Centos 6
+        mem_used = meminfo['MemTotal'] - (meminfo['MemFree'] + meminfo['Buffers'] +
+            meminfo['Cached'])
+    return {
+        'total': meminfo['MemTotal'] / 1024,
+        'free': meminfo['MemFree'] / 1024,
+        'used': mem_used / 1024,
+        'buffers': meminfo['Buffers'] / 1024,
+        'cached': meminfo['Cached'] / 1024,
+        'slab': meminfo['Slab'] / 1024,
+        'swap_total': meminfo['SwapTotal'] / 1024,
+        'swap_free': meminfo['SwapFree'] / 1024,
+    }
+
+
+class SampleArray(object):
+    """Rows of measurements in a preallocated array, which doubles its capacity when full"""
+
+    def __init__(self, width, capacity=64):
+        self._data = numpy.empty((capacity, width))
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row):
+        if self._size == len(self._data):
+            self._data = numpy.concatenate([self._data, numpy.empty_like(self._data)])
+        self._data[self._size] = row
+        self._size += 1
+
+    @property
+    def values(self):
+        return self._data[:self._size]
+
+
+class MemorySamples(object):
+    """Compact storage of memory samples.
+
+    Sample times and appliance measurements are one row per sample. Every process (by name and
+    pid) keeps the indexes of the samples it was seen in and a row of measurements for each.
+    """
+
+    def __init__(self, capacity=4096):
+        self.times = SampleArray(1, capacity)
+        self.appliance = SampleArray(len(APPLIANCE_MEASUREMENTS), capacity)
+        self.processes = OrderedDict()
+
+    def __len__(self):
+        return len(self.times)
+
+    def add_sample(self, timestamp, appliance, processes):
+        """Stores a sample.
+
+        Args:
+            timestamp: Time of the sample, in seconds since the epoch.
+            appliance: Dict of the :py:data:`APPLIANCE_MEASUREMENTS`.
+            processes: Iterable of ``(name, pid, measurements)``, ``measurements`` being the
+                :py:data:`PROCESS_MEASUREMENTS` in this order.
+        """
+        index = len(self.times)
+        self.times.append(timestamp)
+        self.appliance.append([appliance[measurement] for measurement in APPLIANCE_MEASUREMENTS])
+        for name, pid, measurements in processes:
+            pids = self.processes.setdefault(name, OrderedDict())
+            if pid not in pids:
+                pids[pid] = (SampleArray(1), SampleArray(len(PROCESS_MEASUREMENTS)))
+            sample_indexes, values = pids[pid]
+            sample_indexes.append(index)
+            values.append(measurements)
+
+    def to_frame(self):
+        """Converts the samples into a :py:class:`MemoryFrame` for the report"""
+        dates = [datetime.fromtimestamp(timestamp) for timestamp in self.times.values[:, 0]]
+        processes = OrderedDict()
+        for name, pids in self.processes.items():
+            processes[name] = OrderedDict()
+            for pid, (sample_indexes, values) in pids.items():
+                processes[name][pid] = ProcessSeries(
+                    [dates[index] for index in sample_indexes.values[:, 0].astype(int)],
+                    values.values.copy())
+        return MemoryFrame(dates, self.appliance.values.copy(), processes)
+
+
+class ProcessSeries(object):
+    """Measurements of one process, a row of :py:data:`PROCESS_MEASUREMENTS` per sample"""
+    __slots__ = ['dates', 'values']
+
+    def __init__(self, dates, values):
+        self.dates = dates
+        self.values = values
+
+    def __getitem__(self, measurement):
+        return self.values[:, PROCESS_MEASUREMENTS.index(measurement)]
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def start(self):
+        return self.dates[0]
+
+    @property
+    def end(self):
+        return self.dates[-1]
+
+    def first(self, measurement):
+        return self.values[0, PROCESS_MEASUREMENTS.index(measurement)].item()
+
+    def last(self, measurement):
+        return self.values[-1, PROCESS_MEASUREMENTS.index(measurement)].item()
+
+    def at(self, date):
+        """The row of measurements at ``date``, None if the process was not seen then"""
+        index = bisect.bisect_left(self.dates, date)
+        if index < len(self.dates) and self.dates[index] == date:
+            return self.values[index]
+
+
+class MemoryFrame(object):
+    """The results of a monitoring run, indexed by time and stored column-wise.
+
+    Built once when monitoring stops. The summaries, CSVs and graphs of the report are all
+    derived from it.
+
+    Attributes:
+        dates: The datetimes of the appliance samples.
+        appliance: Array with a row of :py:data:`APPLIANCE_MEASUREMENTS` per sample.
+        processes: ``processes[name][pid]`` is the :py:class:`ProcessSeries` of that process.
+    """
+
+    def __init__(self, dates, appliance, processes):
+        self.dates = dates
+        self.appliance = appliance
+        self.processes = processes
+
+    @classmethod
+    def from_results(cls, appliance_results, process_results):
+        """Builds the frame from the ``appliance_results`` and ``process_results`` dicts"""
+        dates = list(appliance_results)
+        appliance = numpy.array(
+            [[appliance_results[ts][measurement] for measurement in APPLIANCE_MEASUREMENTS]
+             for ts in dates]).reshape(-1, len(APPLIANCE_MEASUREMENTS))
+        processes = OrderedDict()
+        for name, pids in process_results.items():
+            processes[name] = OrderedDict()
+            for pid, samples in pids.items():
+                processes[name][pid] = ProcessSeries(list(samples), numpy.array(
+                    [[samples[ts][measurement] for measurement in PROCESS_MEASUREMENTS]
+                     for ts in samples]).reshape(-1, len(PROCESS_MEASUREMENTS)))
+        return cls(dates, appliance, processes)
+
+    def __getitem__(self, measurement):
+        """The appliance measurement over time"""
+        return self.appliance[:, APPLIANCE_MEASUREMENTS.index(measurement)]
+
+    @property
+    def start(self):
+        return self.dates[0]
+
+    @property
+    def end(self):
+        return self.dates[-1]
+
+    def first(self, measurement):
+        return self.appliance[0, APPLIANCE_MEASUREMENTS.index(measurement)].item()
+
+    def last(self, measurement):
+        return self.appliance[-1, APPLIANCE_MEASUREMENTS.index(measurement)].item()
+
+    @property
+    def process_count(self):
+        return sum(len(pids) for pids in self.processes.values())
+
 
 class SmemMemoryMonitor(Thread):
-    def __init__(self, ssh_client, scenario_data):
+    """Samples the appliance memory until :py:attr:`signal` is cleared, the report is created
+    by :py:meth:`join` in the thread calling it.
+
+    By default every sample runs the meminfo, miq_workers and smem commands over SSH. With
+    ``batched`` set, a collector script is uploaded to the appliance instead, which streams all
+    the measurements over a single long-lived channel every ``sample_interval`` seconds and the
+    samples are kept in compact arrays (:py:class:`MemorySamples`). That allows much shorter
+    intervals, down to how long smem itself takes on the appliance.
+
+    Unless passed, ``batched`` and ``sample_interval`` are read from the ``batched`` and
+    ``sample_interval`` keys of ``cfme_performance['tools']['smem']``.
+    """
+    def __init__(self, ssh_client, scenario_data, batched=None, sample_interval=None):
         super(SmemMemoryMonitor, self).__init__()
+        smem_config = cfme_performance.get('tools', {}).get('smem', {})
         self.ssh_client = ssh_client
         self.scenario_data = scenario_data
+        self.batched = smem_config.get('batched', False) if batched is None else batched
+        self.sample_interval = (smem_config.get('sample_interval', SAMPLE_INTERVAL)
+                                if sample_interval is None else sample_interval)
         self.grafana_urls = {}
         self.miq_server_id = ''
         self.use_slab = False
         self.signal = True
+        self._report_frame = None
+
+    def join(self, *args, **kwargs):
+        """Waits for the sampling to end and creates the report.
+
+        The graphs are rendered in worker processes, forking them from the monitor thread while
+        the SSH transport and logging threads run could deadlock them.
+        """
+        super(SmemMemoryMonitor, self).join(*args, **kwargs)
+        if self.is_alive() or self._report_frame is None:
+            return
+        frame, self._report_frame = self._report_frame, None
+        try:
+            create_report(self.scenario_data, frame, self.use_slab, self.grafana_urls)
+        except Exception as e:
+            logger.error('Error creating the memory report: {}'.format(e))
+            logger.error('{}'.format(traceback.format_exc()))
 
     def create_process_result(self, process_results, starttime, process_pid, process_name,
             memory_by_pid):
@@ -172,44 +431,31 @@ class SmemMemoryMonitor(Thread):
         else:
             logger.warn('Process {} PID, not found: {}'.format(process_name, process_pid))
 
-    def get_appliance_memory(self, appliance_results, plottime):
-        # 5.5/5.6 - RHEL 7 / Centos 7
-        # Application Memory Used : MemTotal - (MemFree + Slab + Cached)
-        # 5.4 - RHEL 6 / Centos 6
-        # Application Memory Used : MemTotal - (MemFree + Buffers + Cached)
-        # Available memory could potentially be better metric
-        appliance_results[plottime] = {}
-
-        exit_status, meminfo_raw = self.ssh_client.run_command('cat /proc/meminfo')
+    def get_appliance_memory(self, appliance_results, plottime, meminfo_result=None):
+        if meminfo_result is None:
+            meminfo_result = self.ssh_client.run_command(MEMINFO_COMMAND)
+        exit_status, meminfo_raw = meminfo_result
         if exit_status:
             logger.error('Exit_status nonzero in get_appliance_memory: {}, {}'.format(exit_status,
                 meminfo_raw))
-            del appliance_results[plottime]
         else:
             meminfo_raw = meminfo_raw.replace('kB', '').strip()
-            meminfo = OrderedDict((k.strip(), v.strip()) for k, v in
+            meminfo = OrderedDict((k.strip(), float(v.strip())) for k, v in
                 (value.strip().split(':') for value in meminfo_raw.split('\n')))
-            appliance_results[plottime]['total'] = float(meminfo['MemTotal']) / 1024
-            appliance_results[plottime]['free'] = float(meminfo['MemFree']) / 1024
-            if 'MemAvailable' in meminfo:  # 5.5, RHEL 7/Centos 7
+            if 'MemAvailable' in meminfo:
                 self.use_slab = True
-                mem_used = (float(meminfo['MemTotal']) - (float(meminfo['MemFree']) + float(
-                    meminfo['Slab']) + float(meminfo['Cached']))) / 1024
-            else:  # 5.4, RHEL 6/Centos 6
-                mem_used = (float(meminfo['MemTotal']) - (float(meminfo['MemFree']) + float(
-                    meminfo['Buffers']) + float(meminfo['Cached']))) / 1024
-            appliance_results[plottime]['used'] = mem_used
-            appliance_results[plottime]['buffers'] = float(meminfo['Buffers']) / 1024
-            appliance_results[plottime]['cached'] = float(meminfo['Cached']) / 1024
-            appliance_results[plottime]['slab'] = float(meminfo['Slab']) / 1024
-            appliance_results[plottime]['swap_total'] = float(meminfo['SwapTotal']) / 1024
-            appliance_results[plottime]['swap_free'] = float(meminfo['SwapFree']) / 1024
-
-    def get_evm_workers(self):
-        exit_status, worker_types = self.ssh_client.run_command(
-            'psql -t -q -d vmdb_production -c '
+            appliance_results[plottime] = appliance_memory(meminfo)
+
+    @property
+    def evm_workers_command(self):
+        return ('psql -t -q -d vmdb_production -c '
             '\"select pid,type from miq_workers where miq_server_id = \'{}\'\"'.format(
                 self.miq_server_id))
+
+    def get_evm_workers(self, worker_types_result=None):
+        if worker_types_result is None:
+            worker_types_result = self.ssh_client.run_command(self.evm_workers_command)
+        exit_status, worker_types = worker_types_result
         if worker_types.strip():
             workers = {}
             for worker in worker_types.strip().split('\n'):
@@ -249,9 +495,10 @@ class SmemMemoryMonitor(Thread):
         logger.info('Obtained miq_server_id: {}'.format(miq_server_id.strip()))
         self.miq_server_id = miq_server_id.strip()
 
-    def get_pids_memory(self):
-        exit_status, smem_out = self.ssh_client.run_command(
-            'smem -c \'pid rss pss uss vss swap name command\' | sed 1d')
+    def get_pids_memory(self, smem_result=None):
+        if smem_result is None:
+            smem_result = self.ssh_client.run_command(SMEM_COMMAND)
+        exit_status, smem_out = smem_result
         pids_memory = smem_out.strip().split('\n')
         memory_by_pid = {}
         for line in pids_memory:
@@ -293,6 +540,8 @@ class SmemMemoryMonitor(Thread):
         process_results[name][pid][timestamp]['vss'] = value
         process_results[name][pid][timestamp]['swap'] = value
         """
+        if self.batched:
+            return self._batched_run()
         appliance_results = OrderedDict()
         process_results = OrderedDict()
         install_smem(self.ssh_client)
@@ -302,60 +551,82 @@ class SmemMemoryMonitor(Thread):
             starttime = time.time()
             plottime = datetime.now()
 
-            self.get_appliance_memory(appliance_results, plottime)
-            workers = self.get_evm_workers()
-            memory_by_pid = self.get_pids_memory()
+            # All three measurements go out at once, each over its own channel
+            meminfo_result, worker_types_result, smem_result = \
+                self.ssh_client.run_commands_parallel(
+                    [MEMINFO_COMMAND, self.evm_workers_command, SMEM_COMMAND])
+            self.get_appliance_memory(appliance_results, plottime, meminfo_result)
+            workers = self.get_evm_workers(worker_types_result)
+            memory_by_pid = self.get_pids_memory(smem_result)
 
             for worker_pid in workers:
                 self.create_process_result(process_results, plottime, worker_pid,
                     workers[worker_pid], memory_by_pid)
 
             for pid in sorted(memory_by_pid.keys()):
-                if memory_by_pid[pid]['name'] == 'httpd':
-                    self.create_process_result(process_results, plottime, pid, 'httpd',
-                        memory_by_pid)
-                elif memory_by_pid[pid]['name'] == 'postgres':
-                    self.create_process_result(process_results, plottime, pid, 'postgres',
-                        memory_by_pid)
-                elif memory_by_pid[pid]['name'] == 'postmaster':
-                    self.create_process_result(process_results, plottime, pid, 'postgres',
-                        memory_by_pid)
-                elif memory_by_pid[pid]['name'] == 'memcached':
-                    self.create_process_result(process_results, plottime, pid, 'memcached',
-                        memory_by_pid)
-                elif memory_by_pid[pid]['name'] == 'collectd':
-                    self.create_process_result(process_results, plottime, pid, 'collectd',
+                name = process_name(memory_by_pid[pid]['name'], memory_by_pid[pid]['cmd'])
+                if name:
+                    self.create_process_result(process_results, plottime, pid, name,
                         memory_by_pid)
                 elif memory_by_pid[pid]['name'] == 'ruby':
-                    if 'evm_server.rb' in memory_by_pid[pid]['cmd']:
-                        self.create_process_result(process_results, plottime, pid,
-                            'MIQ Server (evm_server.rb)', memory_by_pid)
-                    elif 'MIQ Server' in memory_by_pid[pid]['cmd']:
-                        self.create_process_result(process_results, plottime, pid,
-                            'MIQ Server (evm_server.rb)', memory_by_pid)
-                    elif 'evm_watchdog.rb' in memory_by_pid[pid]['cmd']:
-                        self.create_process_result(process_results, plottime, pid,
-                            'evm_watchdog.rb', memory_by_pid)
-                    elif 'appliance_console.rb' in memory_by_pid[pid]['cmd']:
-                        self.create_process_result(process_results, plottime, pid,
-                            'appliance_console.rb', memory_by_pid)
-                    elif 'evm:dbsync:replicate' in memory_by_pid[pid]['cmd']:
-                        self.create_process_result(process_results, plottime, pid,
-                            'evm:dbsync:replicate', memory_by_pid)
-                    else:
-                        logger.debug('Unaccounted for ruby pid: {}'.format(pid))
+                    logger.debug('Unaccounted for ruby pid: {}'.format(pid))
 
             timediff = time.time() - starttime
             logger.debug('Monitoring sampled in {}s'.format(round(timediff, 4)))
 
             # Sleep Monitoring interval
             # Roughly 10s samples, accounts for collection of memory measurements
-            time_to_sleep = abs(SAMPLE_INTERVAL - timediff)
+            time_to_sleep = abs(self.sample_interval - timediff)
             time.sleep(time_to_sleep)
         logger.info('Monitoring CFME Memory Terminating')
 
-        create_report(self.scenario_data, appliance_results, process_results, self.use_slab,
-            self.grafana_urls)
+        self._report_frame = MemoryFrame.from_results(appliance_results, process_results)
+
+    def add_collector_sample(self, samples, timestamp, sample):
+        """Stores a sample of the collector script in a :py:class:`MemorySamples`"""
+        if 'MemAvailable' in sample['mem']:
+            self.use_slab = True
+        memory_by_pid = {str(proc[0]): proc for proc in sample['procs']}
+        processes = []
+        for worker_pid, worker_type in sample['workers'].items():
+            proc = memory_by_pid.pop(worker_pid, None)
+            if proc is None:
+                logger.warn('Process {} PID, not found: {}'.format(worker_type, worker_pid))
+            else:
+                processes.append((worker_type, worker_pid, [v / 1024 for v in proc[1:6]]))
+        for pid in sorted(memory_by_pid):
+            proc = memory_by_pid[pid]
+            name = process_name(proc[6], proc[7])
+            if name:
+                processes.append((name, pid, [v / 1024 for v in proc[1:6]]))
+        samples.add_sample(timestamp, appliance_memory(sample['mem']), processes)
+
+    def _batched_run(self):
+        samples = MemorySamples()
+        install_smem(self.ssh_client)
+        self.get_miq_server_id()
+        self.ssh_client.put_file(COLLECTOR_SCRIPT.strpath, COLLECTOR_REMOTE_PATH)
+        logger.info('Starting Monitoring Thread, sampling every {}s.'.format(self.sample_interval))
+        lines = self.ssh_client.stream_command('python {} {} {}'.format(
+            COLLECTOR_REMOTE_PATH, self.sample_interval, self.miq_server_id))
+        try:
+            for line in lines:
+                try:
+                    sample = json.loads(line)
+                except ValueError:
+                    logger.error('Unexpected memory collector output: {}'.format(line))
+                else:
+                    self.add_collector_sample(samples, time.time(), sample)
+                if not self.signal:
+                    break
+            else:
+                logger.error('Memory collector stopped on its own')
+        finally:
+            # Closing the channel stops the collector
+            lines.close()
+        logger.info('Monitoring CFME Memory Terminating, {} samples'.format(len(samples)))
+
+        self._report_frame = samples.to_frame()
 
     def run(self):
         try:
@@ -377,7 +648,11 @@ def install_smem(ssh_client):
     ssh_client.run_command('sed -i s/\.27s/\.200s/g /usr/bin/smem')
 
 
-def create_report(scenario_data, appliance_results, process_results, use_slab, grafana_urls):
+def create_report(scenario_data, frame, use_slab, grafana_urls, graph_processes=None):
+    """Writes the summaries, CSVs and graphs of a :py:class:`MemoryFrame`.
+
+    The graphs are rendered by ``graph_processes`` worker processes, one per CPU by default.
+    """
     logger.info('Creating Memory Monitoring Report.')
     ver = current_version()
 
@@ -405,118 +680,90 @@ def create_report(scenario_data, appliance_results, process_results, use_slab, g
     if not os.path.exists(str(mem_rawdata_path)):
         os.mkdir(str(mem_rawdata_path))
 
-    graph_appliance_measurements(mem_graphs_path, ver, appliance_results, use_slab, provider_names)
-    graph_individual_process_measurements(mem_graphs_path, process_results, provider_names)
-    graph_same_miq_workers(mem_graphs_path, process_results, provider_names)
-    graph_all_miq_workers(mem_graphs_path, process_results, provider_names)
+    graphs = graph_appliance_measurements(mem_graphs_path, ver, frame, use_slab, provider_names)
+    graphs.extend(graph_individual_process_measurements(mem_graphs_path, frame, provider_names))
+    graphs.extend(graph_same_miq_workers(mem_graphs_path, frame, provider_names))
+    graphs.extend(graph_all_miq_workers(mem_graphs_path, frame, provider_names))
+    render_graphs(graphs, graph_processes)
 
     # Dump scenario Yaml:
     with open(str(scenario_path.join('scenario.yml')), 'w') as scenario_file:
         yaml.dump(dict(scenario_data['scenario']), scenario_file, default_flow_style=False)
 
-    generate_summary_csv(scenario_path.join('{}-summary.csv'.format(ver)), appliance_results,
-        process_results, provider_names, ver)
-    generate_raw_data_csv(mem_rawdata_path, appliance_results, process_results)
-    generate_summary_html(scenario_path, ver, appliance_results, process_results, scenario_data,
-        provider_names, grafana_urls)
+    generate_summary_csv(scenario_path.join('{}-summary.csv'.format(ver)), frame, provider_names,
+        ver)
+    generate_raw_data_csv(mem_rawdata_path, frame)
+    generate_summary_html(scenario_path, ver, frame, scenario_data, provider_names, grafana_urls)
     generate_workload_html(scenario_path, ver, scenario_data, provider_names, grafana_urls)
 
     logger.info('Finished Creating Report')
 
 
-def compile_per_process_results(procs_to_compile, process_results, ts_end):
+def compile_per_process_results(procs_to_compile, frame):
+    """Counts the processes alive at the end and recycled, and totals their end measurements
+
+    Returns:
+        A tuple ``(alive_pids, recycled_pids, totals)``, ``totals`` being the summed end
+        measurements of the alive processes, in the order of :py:data:`PROCESS_MEASUREMENTS`.
+    """
     alive_pids = 0
     recycled_pids = 0
-    total_running_rss = 0
-    total_running_pss = 0
-    total_running_uss = 0
-    total_running_vss = 0
-    total_running_swap = 0
+    totals = [0] * len(PROCESS_MEASUREMENTS)
     for process in procs_to_compile:
-        if process in process_results:
-            for pid in process_results[process]:
-                if ts_end in process_results[process][pid]:
-                    alive_pids += 1
-                    total_running_rss += process_results[process][pid][ts_end]['rss']
-                    total_running_pss += process_results[process][pid][ts_end]['pss']
-                    total_running_uss += process_results[process][pid][ts_end]['uss']
-                    total_running_vss += process_results[process][pid][ts_end]['vss']
-                    total_running_swap += process_results[process][pid][ts_end]['swap']
-                else:
-                    recycled_pids += 1
-    return alive_pids, recycled_pids, total_running_rss, total_running_pss, total_running_uss, \
-        total_running_vss, total_running_swap
+        for series in frame.processes.get(process, {}).values():
+            end_values = series.at(frame.end)
+            if end_values is not None:
+                alive_pids += 1
+                totals = [total + value for total, value in zip(totals, end_values.tolist())]
+            else:
+                recycled_pids += 1
+    return alive_pids, recycled_pids, totals
 
 
-def generate_raw_data_csv(directory, appliance_results, process_results):
+def generate_raw_data_csv(directory, frame):
     starttime = time.time()
     file_name = str(directory.join('appliance.csv'))
     with open(file_name, 'w') as csv_file:
         csv_file.write('TimeStamp,Total,Free,Used,Buffers,Cached,Slab,Swap_Total,Swap_Free\n')
-        for ts in appliance_results:
-            csv_file.write('{},{},{},{},{},{},{},{},{}\n'.format(ts,
-                appliance_results[ts]['total'], appliance_results[ts]['free'],
-                appliance_results[ts]['used'], appliance_results[ts]['buffers'],
-                appliance_results[ts]['cached'], appliance_results[ts]['slab'],
-                appliance_results[ts]['swap_total'], appliance_results[ts]['swap_free']))
-    for process_name in process_results:
-        for process_pid in process_results[process_name]:
+        for ts, row in zip(frame.dates, frame.appliance.tolist()):
+            csv_file.write('{},{},{},{},{},{},{},{},{}\n'.format(ts, *row))
+    for process_name in frame.processes:
+        for process_pid, series in frame.processes[process_name].items():
             file_name = str(directory.join('{}-{}.csv'.format(process_pid, process_name)))
             with open(file_name, 'w') as csv_file:
                 csv_file.write('TimeStamp,RSS,PSS,USS,VSS,SWAP\n')
-                for ts in process_results[process_name][process_pid]:
-                    csv_file.write('{},{},{},{},{},{}\n'.format(ts,
-                        process_results[process_name][process_pid][ts]['rss'],
-                        process_results[process_name][process_pid][ts]['pss'],
-                        process_results[process_name][process_pid][ts]['uss'],
-                        process_results[process_name][process_pid][ts]['vss'],
-                        process_results[process_name][process_pid][ts]['swap']))
+                for ts, row in zip(series.dates, series.values.tolist()):
+                    csv_file.write('{},{},{},{},{},{}\n'.format(ts, *row))
     timediff = time.time() - starttime
     logger.info('Generated Raw Data CSVs in: {}'.format(timediff))
 
 
-def generate_summary_csv(file_name, appliance_results, process_results, provider_names,
-        version_string):
+def generate_summary_csv(file_name, frame, provider_names, version_string):
     starttime = time.time()
     with open(str(file_name), 'w') as csv_file:
         csv_file.write('Version: {}, Provider(s): {}\n'.format(version_string, provider_names))
         csv_file.write('Measurement,Start of test,End of test\n')
-        start = appliance_results.keys()[0]
-        end = appliance_results.keys()[-1]
-        csv_file.write('Appliance Total Memory,{},{}\n'.format(
-            round(appliance_results[start]['total'], 2), round(appliance_results[end]['total'], 2)))
-        csv_file.write('Appliance Free Memory,{},{}\n'.format(
-            round(appliance_results[start]['free'], 2), round(appliance_results[end]['free'], 2)))
-        csv_file.write('Appliance Used Memory,{},{}\n'.format(
-            round(appliance_results[start]['used'], 2), round(appliance_results[end]['used'], 2)))
-        csv_file.write('Appliance Buffers,{},{}\n'.format(
-            round(appliance_results[start]['buffers'], 2),
-            round(appliance_results[end]['buffers'], 2)))
-        csv_file.write('Appliance Cached,{},{}\n'.format(
-            round(appliance_results[start]['cached'], 2),
-            round(appliance_results[end]['cached'], 2)))
-        csv_file.write('Appliance Slab,{},{}\n'.format(
-            round(appliance_results[start]['slab'], 2),
-            round(appliance_results[end]['slab'], 2)))
-        csv_file.write('Appliance Total Swap,{},{}\n'.format(
-            round(appliance_results[start]['swap_total'], 2),
-            round(appliance_results[end]['swap_total'], 2)))
-        csv_file.write('Appliance Free Swap,{},{}\n'.format(
-            round(appliance_results[start]['swap_free'], 2),
-            round(appliance_results[end]['swap_free'], 2)))
-
-        summary_csv_measurement_dump(csv_file, process_results, 'rss')
-        summary_csv_measurement_dump(csv_file, process_results, 'pss')
-        summary_csv_measurement_dump(csv_file, process_results, 'uss')
-        summary_csv_measurement_dump(csv_file, process_results, 'vss')
-        summary_csv_measurement_dump(csv_file, process_results, 'swap')
+        for title, measurement in [
+                ('Appliance Total Memory', 'total'),
+                ('Appliance Free Memory', 'free'),
+                ('Appliance Used Memory', 'used'),
+                ('Appliance Buffers', 'buffers'),
+                ('Appliance Cached', 'cached'),
+                ('Appliance Slab', 'slab'),
+                ('Appliance Total Swap', 'swap_total'),
+                ('Appliance Free Swap', 'swap_free')]:
+            csv_file.write('{},{},{}\n'.format(title, round(frame.first(measurement), 2),
+                round(frame.last(measurement), 2)))
+
+        for measurement in PROCESS_MEASUREMENTS:
+            summary_csv_measurement_dump(csv_file, frame, measurement)
 
     timediff = time.time() - starttime
     logger.info('Generated Summary CSV in: {}'.format(timediff))
 
 
-def generate_summary_html(directory, version_string, appliance_results, process_results,
-        scenario_data, provider_names, grafana_urls):
+def generate_summary_html(directory, version_string, frame, scenario_data, provider_names,
+        grafana_urls):
     starttime = time.time()
     file_name = str(directory.join('index.html'))
     with open(file_name, 'w') as html_file:
@@ -542,17 +789,11 @@ def generate_summary_html(directory, version_string, appliance_results, process_
         html_file.write(' : <b><a href=\'workload.html\'>Workload Info</a></b>')
         html_file.write(' : <b><a href=\'graphs/\'>Graphs directory</a></b>\n')
         html_file.write(' : <b><a href=\'rawdata/\'>CSVs directory</a></b><br>\n')
-        start = appliance_results.keys()[0]
-        end = appliance_results.keys()[-1]
+        start = frame.start
+        end = frame.end
         timediff = end - start
-        total_proc_count = 0
-        for proc_name in process_results:
-            total_proc_count += len(process_results[proc_name].keys())
-        growth = appliance_results[end]['used'] - appliance_results[start]['used']
-        max_used_memory = 0
-        for ts in appliance_results:
-            if appliance_results[ts]['used'] > max_used_memory:
-                max_used_memory = appliance_results[ts]['used']
+        growth = frame.last('used') - frame.first('used')
+        max_used_memory = max(frame['used'].max().item(), 0)
         html_file.write('<table border="1">\n')
         html_file.write('<tr><td>\n')
         # Appliance Wide Results
@@ -574,12 +815,12 @@ def generate_summary_html(directory, version_string, appliance_results, process_
         html_file.write('<td>{}</td>\n'.format(start.replace(microsecond=0)))
         html_file.write('<td>{}</td>\n'.format(end.replace(microsecond=0)))
         html_file.write('<td>{}</td>\n'.format(unicode(timediff).partition('.')[0]))
-        html_file.write('<td>{}</td>\n'.format(round(appliance_results[end]['total'], 2)))
-        html_file.write('<td>{}</td>\n'.format(round(appliance_results[start]['used'], 2)))
-        html_file.write('<td>{}</td>\n'.format(round(appliance_results[end]['used'], 2)))
+        html_file.write('<td>{}</td>\n'.format(round(frame.last('total'), 2)))
+        html_file.write('<td>{}</td>\n'.format(round(frame.first('used'), 2)))
+        html_file.write('<td>{}</td>\n'.format(round(frame.last('used'), 2)))
         html_file.write('<td>{}</td>\n'.format(round(growth, 2)))
         html_file.write('<td>{}</td>\n'.format(round(max_used_memory, 2)))
-        html_file.write('<td>{}</td>\n'.format(total_proc_count))
+        html_file.write('<td>{}</td>\n'.format(frame.process_count))
         html_file.write('</table>\n')
 
         # CFME/Miq Worker Results
@@ -595,18 +836,14 @@ def generate_summary_html(directory, version_string, appliance_results, process_
         html_file.write('<td><b>End Total Worker SWAP</b></td>\n')
         html_file.write('</tr>\n')
 
-        a_pids, r_pids, t_rss, t_pss, t_uss, t_vss, t_swap = compile_per_process_results(
-            miq_workers, process_results, end)
+        a_pids, r_pids, totals = compile_per_process_results(miq_workers, frame)
 
         html_file.write('<tr>\n')
         html_file.write('<td>{}</td>\n'.format(a_pids + r_pids))
         html_file.write('<td>{}</td>\n'.format(a_pids))
         html_file.write('<td>{}</td>\n'.format(r_pids))
-        html_file.write('<td>{}</td>\n'.format(round(t_rss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_pss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_uss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_vss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_swap, 2)))
+        for total in totals:
+            html_file.write('<td>{}</td>\n'.format(round(total, 2)))
         html_file.write('</tr>\n')
         html_file.write('</table>\n')
 
@@ -624,125 +861,31 @@ def generate_summary_html(directory, version_string, appliance_results, process_
         html_file.write('<td><b>End Total Process SWAP</b></td>\n')
         html_file.write('</tr>\n')
 
-        a_pids, r_pids, t_rss, t_pss, t_uss, t_vss, t_swap = compile_per_process_results(
-            ruby_processes, process_results, end)
-        t_a_pids = a_pids
-        t_r_pids = r_pids
-        tt_rss = t_rss
-        tt_pss = t_pss
-        tt_uss = t_uss
-        tt_vss = t_vss
-        tt_swap = t_swap
-        html_file.write('<tr>\n')
-        html_file.write('<td>ruby</td>\n')
-        html_file.write('<td>{}</td>\n'.format(a_pids + r_pids))
-        html_file.write('<td>{}</td>\n'.format(a_pids))
-        html_file.write('<td>{}</td>\n'.format(r_pids))
-        html_file.write('<td>{}</td>\n'.format(round(t_rss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_pss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_uss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_vss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_swap, 2)))
-        html_file.write('</tr>\n')
-
-        # memcached Summary
-        a_pids, r_pids, t_rss, t_pss, t_uss, t_vss, t_swap = compile_per_process_results(
-            ['memcached'], process_results, end)
-        t_a_pids += a_pids
-        t_r_pids += r_pids
-        tt_rss += t_rss
-        tt_pss += t_pss
-        tt_uss += t_uss
-        tt_vss += t_vss
-        tt_swap += t_swap
-        html_file.write('<tr>\n')
-        html_file.write('<td>memcached</td>\n')
-        html_file.write('<td>{}</td>\n'.format(a_pids + r_pids))
-        html_file.write('<td>{}</td>\n'.format(a_pids))
-        html_file.write('<td>{}</td>\n'.format(r_pids))
-        html_file.write('<td>{}</td>\n'.format(round(t_rss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_pss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_uss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_vss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_swap, 2)))
-        html_file.write('</tr>\n')
-
-        # Postgres Summary
-        a_pids, r_pids, t_rss, t_pss, t_uss, t_vss, t_swap = compile_per_process_results(
-            ['postgres'], process_results, end)
-        t_a_pids += a_pids
-        t_r_pids += r_pids
-        tt_rss += t_rss
-        tt_pss += t_pss
-        tt_uss += t_uss
-        tt_vss += t_vss
-        tt_swap += t_swap
-        html_file.write('<tr>\n')
-        html_file.write('<td>postgres</td>\n')
-        html_file.write('<td>{}</td>\n'.format(a_pids + r_pids))
-        html_file.write('<td>{}</td>\n'.format(a_pids))
-        html_file.write('<td>{}</td>\n'.format(r_pids))
-        html_file.write('<td>{}</td>\n'.format(round(t_rss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_pss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_uss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_vss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_swap, 2)))
-        html_file.write('</tr>\n')
-
-        # httpd Summary
-        a_pids, r_pids, t_rss, t_pss, t_uss, t_vss, t_swap = compile_per_process_results(['httpd'],
-            process_results, end)
-        t_a_pids += a_pids
-        t_r_pids += r_pids
-        tt_rss += t_rss
-        tt_pss += t_pss
-        tt_uss += t_uss
-        tt_vss += t_vss
-        tt_swap += t_swap
-        html_file.write('<tr>\n')
-        html_file.write('<td>httpd</td>\n')
-        html_file.write('<td>{}</td>\n'.format(a_pids + r_pids))
-        html_file.write('<td>{}</td>\n'.format(a_pids))
-        html_file.write('<td>{}</td>\n'.format(r_pids))
-        html_file.write('<td>{}</td>\n'.format(round(t_rss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_pss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_uss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_vss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_swap, 2)))
-        html_file.write('</tr>\n')
-
-        # collectd Summary
-        a_pids, r_pids, t_rss, t_pss, t_uss, t_vss, t_swap = compile_per_process_results(
-            ['collectd'], process_results, end)
-        t_a_pids += a_pids
-        t_r_pids += r_pids
-        tt_rss += t_rss
-        tt_pss += t_pss
-        tt_uss += t_uss
-        tt_vss += t_vss
-        tt_swap += t_swap
-        html_file.write('<tr>\n')
-        html_file.write('<td>collectd</td>\n')
-        html_file.write('<td>{}</td>\n'.format(a_pids + r_pids))
-        html_file.write('<td>{}</td>\n'.format(a_pids))
-        html_file.write('<td>{}</td>\n'.format(r_pids))
-        html_file.write('<td>{}</td>\n'.format(round(t_rss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_pss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_uss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_vss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(t_swap, 2)))
-        html_file.write('</tr>\n')
+        t_a_pids = 0
+        t_r_pids = 0
+        t_totals = [0] * len(PROCESS_MEASUREMENTS)
+        for group, procs in [('ruby', ruby_processes), ('memcached', ['memcached']),
+                ('postgres', ['postgres']), ('httpd', ['httpd']), ('collectd', ['collectd'])]:
+            a_pids, r_pids, totals = compile_per_process_results(procs, frame)
+            t_a_pids += a_pids
+            t_r_pids += r_pids
+            t_totals = [t_total + total for t_total, total in zip(t_totals, totals)]
+            html_file.write('<tr>\n')
+            html_file.write('<td>{}</td>\n'.format(group))
+            html_file.write('<td>{}</td>\n'.format(a_pids + r_pids))
+            html_file.write('<td>{}</td>\n'.format(a_pids))
+            html_file.write('<td>{}</td>\n'.format(r_pids))
+            for total in totals:
+                html_file.write('<td>{}</td>\n'.format(round(total, 2)))
+            html_file.write('</tr>\n')
 
         html_file.write('<tr>\n')
         html_file.write('<td>total</td>\n')
         html_file.write('<td>{}</td>\n'.format(t_a_pids + t_r_pids))
         html_file.write('<td>{}</td>\n'.format(t_a_pids))
         html_file.write('<td>{}</td>\n'.format(t_r_pids))
-        html_file.write('<td>{}</td>\n'.format(round(tt_rss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(tt_pss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(tt_uss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(tt_vss, 2)))
-        html_file.write('<td>{}</td>\n'.format(round(tt_swap, 2)))
+        for total in t_totals:
+            html_file.write('<td>{}</td>\n'.format(round(total, 2)))
         html_file.write('</tr>\n')
         html_file.write('</table>\n')
 
@@ -752,11 +895,7 @@ def generate_summary_html(directory, version_string, appliance_results, process_
         html_file.write('<img src=\'graphs/{}\'>\n'.format(file_name))
         file_name = '{}-appliance_swap.png'.format(version_string)
         # Check for swap usage through out time frame:
-        max_swap_used = 0
-        for ts in appliance_results:
-            swap_used = appliance_results[ts]['swap_total'] - appliance_results[ts]['swap_free']
-            if swap_used > max_swap_used:
-                max_swap_used = swap_used
+        max_swap_used = max((frame['swap_total'] - frame['swap_free']).max().item(), 0)
         if max_swap_used < 10:  # Less than 10MiB Max, then hide graph
             html_file.write('<br><a href=\'graphs/{}\'>Swap Graph '.format(file_name))
             html_file.write('(Hidden, max_swap_used < 10 MiB)</a>\n')
@@ -780,13 +919,12 @@ def generate_summary_html(directory, version_string, appliance_results, process_
         html_file.write('</tr>\n')
         # By Worker Type Memory Used
         for ordered_name in process_order:
-            if ordered_name in process_results:
-                for pid in process_results[ordered_name]:
-                    start = process_results[ordered_name][pid].keys()[0]
-                    end = process_results[ordered_name][pid].keys()[-1]
-                    timediff = end - start
+            if ordered_name in frame.processes:
+                pids = frame.processes[ordered_name]
+                for pid, series in pids.items():
+                    timediff = series.end - series.start
                     html_file.write('<tr>\n')
-                    if len(process_results[ordered_name]) > 1:
+                    if len(pids) > 1:
                         html_file.write('<td><a href=\'#{}\'>{}</a></td>\n'.format(ordered_name,
                             ordered_name))
                         html_file.write('<td><a href=\'graphs/{}-{}.png\'>{}</a></td>\n'.format(
@@ -795,23 +933,16 @@ def generate_summary_html(directory, version_string, appliance_results, process_
                         html_file.write('<td>{}</td>\n'.format(ordered_name))
                         html_file.write('<td><a href=\'#{}-{}.png\'>{}</a></td>\n'.format(
                             ordered_name, pid, pid))
-                    html_file.write('<td>{}</td>\n'.format(start.replace(microsecond=0)))
-                    html_file.write('<td>{}</td>\n'.format(end.replace(microsecond=0)))
+                    html_file.write('<td>{}</td>\n'.format(series.start.replace(microsecond=0)))
+                    html_file.write('<td>{}</td>\n'.format(series.end.replace(microsecond=0)))
                     html_file.write('<td>{}</td>\n'.format(unicode(timediff).partition('.')[0]))
-                    rss_change = process_results[ordered_name][pid][end]['rss'] - \
-                        process_results[ordered_name][pid][start]['rss']
-                    html_file.write('<td>{}</td>\n'.format(
-                        round(process_results[ordered_name][pid][start]['rss'], 2)))
-                    html_file.write('<td>{}</td>\n'.format(
-                        round(process_results[ordered_name][pid][end]['rss'], 2)))
-                    html_file.write('<td>{}</td>\n'.format(round(rss_change, 2)))
-                    pss_change = process_results[ordered_name][pid][end]['pss'] - \
-                        process_results[ordered_name][pid][start]['pss']
-                    html_file.write('<td>{}</td>\n'.format(
-                        round(process_results[ordered_name][pid][start]['pss'], 2)))
-                    html_file.write('<td>{}</td>\n'.format(
-                        round(process_results[ordered_name][pid][end]['pss'], 2)))
-                    html_file.write('<td>{}</td>\n'.format(round(pss_change, 2)))
+                    for measurement in ['rss', 'pss']:
+                        change = series.last(measurement) - series.first(measurement)
+                        html_file.write('<td>{}</td>\n'.format(
+                            round(series.first(measurement), 2)))
+                        html_file.write('<td>{}</td>\n'.format(
+                            round(series.last(measurement), 2)))
+                        html_file.write('<td>{}</td>\n'.format(round(change, 2)))
                     html_file.write('<td><a href=\'rawdata/{}-{}.csv\'>csv</a></td>\n'.format(
                         pid, ordered_name))
                     html_file.write('</tr>\n')
@@ -822,16 +953,16 @@ def generate_summary_html(directory, version_string, appliance_results, process_
 
         # Worker Graphs
         for ordered_name in process_order:
-            if ordered_name in process_results:
+            if ordered_name in frame.processes:
                 html_file.write('<tr><td>\n')
                 html_file.write('<div id=\'{}\'>Process name: {}</div><br>\n'.format(
                     ordered_name, ordered_name))
-                if len(process_results[ordered_name]) > 1:
+                if len(frame.processes[ordered_name]) > 1:
                     file_name = '{}-all.png'.format(ordered_name)
                     html_file.write('<img id=\'{}\' src=\'graphs/{}\'><br>\n'.format(file_name,
                         file_name))
                 else:
-                    for pid in sorted(process_results[ordered_name]):
+                    for pid in sorted(frame.processes[ordered_name]):
                         file_name = '{}-{}.png'.format(ordered_name, pid)
                         html_file.write('<img id=\'{}\' src=\'graphs/{}\'><br>\n'.format(
                             file_name, file_name))
@@ -992,66 +1123,59 @@ def create_dict(attr_dict):
     return main_dict
 
 
-def graph_appliance_measurements(graphs_path, ver, appliance_results, use_slab, provider_names):
+def render_graphs(graphs, processes=None):
+    """Renders graphs in a pool of ``processes`` worker processes (one per CPU by default).
+
+    The pool is only forked from the main thread, other threads render the graphs themselves.
+
+    Args:
+        graphs: List of ``(function, args)`` tuples, as returned by the ``graph_*`` functions.
+    """
     starttime = time.time()
+    processes = min(processes or multiprocessing.cpu_count(), len(graphs))
+    if processes > 1 and isinstance(current_thread(), _MainThread):
+        pool = multiprocessing.Pool(processes)
+        try:
+            pool.map(_render_graph, graphs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for graph in graphs:
+            _render_graph(graph)
+    timediff = time.time() - starttime
+    logger.info('Rendered {} graphs in: {}'.format(len(graphs), timediff))
+
+
+def _render_graph(graph):
+    function, args = graph
+    function(*args)
 
-    dates = appliance_results.keys()
-    total_memory_list = list(appliance_results[ts]['total'] for ts in appliance_results.keys())
-    free_memory_list = list(appliance_results[ts]['free'] for ts in appliance_results.keys())
-    used_memory_list = list(appliance_results[ts]['used'] for ts in appliance_results.keys())
-    buffers_memory_list = list(
-        appliance_results[ts]['buffers'] for ts in appliance_results.keys())
-    cache_memory_list = list(appliance_results[ts]['cached'] for ts in appliance_results.keys())
-    slab_memory_list = list(appliance_results[ts]['slab'] for ts in appliance_results.keys())
-    swap_total_list = list(appliance_results[ts]['swap_total'] for ts in
-        appliance_results.keys())
-    swap_free_list = list(appliance_results[ts]['swap_free'] for ts in appliance_results.keys())
-
-    # Stack Plot Memory Usage
-    file_name = graphs_path.join('{}-appliance_memory.png'.format(ver))
+
+def _annotate_ends(ax, dates, samples, offset=None):
+    """Annotates the first and the last value of a line, stacked on ``offset`` if given"""
+    if len(samples):
+        positions = samples if offset is None else samples + offset
+        ax.annotate(str(round(float(samples[0]), 2)), xy=(dates[0], positions[0]),
+            xytext=(4, 4), textcoords='offset points')
+        ax.annotate(str(round(float(samples[-1]), 2)), xy=(dates[-1], positions[-1]),
+            xytext=(4, -4), textcoords='offset points')
+
+
+def plot_appliance_memory(file_name, provider_names, dates, used, middle, cached, free, total,
+        use_slab):
+    """Stack plot of the appliance memory, ``middle`` being the slab or the buffers"""
     mpl.rcParams['axes.prop_cycle'] = cycler('color', ['firebrick', 'coral', 'steelblue',
         'forestgreen'])
     fig, ax = plt.subplots()
     plt.title('Provider(s): {}\nAppliance Memory'.format(provider_names))
     plt.xlabel('Date / Time')
     plt.ylabel('Memory (MiB)')
-    if use_slab:
-        y = [used_memory_list, slab_memory_list, cache_memory_list, free_memory_list]
-    else:
-        y = [used_memory_list, buffers_memory_list, cache_memory_list, free_memory_list]
-    plt.stackplot(dates, *y, baseline='zero')
-    ax.annotate(str(round(total_memory_list[0], 2)), xy=(dates[0], total_memory_list[0]),
-                xytext=(4, 4), textcoords='offset points')
-    ax.annotate(str(round(total_memory_list[-1], 2)), xy=(dates[-1], total_memory_list[-1]),
-                xytext=(4, -4), textcoords='offset points')
-    if use_slab:
-        ax.annotate(str(round(slab_memory_list[0], 2)), xy=(dates[0], used_memory_list[0] +
-                    slab_memory_list[0]), xytext=(4, 4), textcoords='offset points')
-        ax.annotate(str(round(slab_memory_list[-1], 2)), xy=(dates[-1], used_memory_list[-1] +
-                    slab_memory_list[-1]), xytext=(4, -4), textcoords='offset points')
-        ax.annotate(str(round(cache_memory_list[0], 2)), xy=(dates[0], used_memory_list[0] +
-                    slab_memory_list[0] + cache_memory_list[0]), xytext=(4, 4),
-                    textcoords='offset points')
-        ax.annotate(str(round(cache_memory_list[-1], 2)), xy=(
-            dates[-1], used_memory_list[-1] + slab_memory_list[-1] + cache_memory_list[-1]),
-            xytext=(4, -4), textcoords='offset points')
-    else:
-        ax.annotate(str(round(buffers_memory_list[0], 2)), xy=(
-            dates[0], used_memory_list[0] + buffers_memory_list[0]), xytext=(4, 4),
-            textcoords='offset points')
-        ax.annotate(str(round(buffers_memory_list[-1], 2)), xy=(dates[-1],
-                    used_memory_list[-1] + buffers_memory_list[-1]), xytext=(4, -4),
-                    textcoords='offset points')
-        ax.annotate(str(round(cache_memory_list[0], 2)), xy=(dates[0], used_memory_list[0] +
-                    buffers_memory_list[0] + cache_memory_list[0]), xytext=(4, 4),
-                    textcoords='offset points')
-        ax.annotate(str(round(cache_memory_list[-1], 2)), xy=(
-            dates[-1], used_memory_list[-1] + buffers_memory_list[-1] + cache_memory_list[-1]),
-            xytext=(4, -4), textcoords='offset points')
-    ax.annotate(str(round(used_memory_list[0], 2)), xy=(dates[0], used_memory_list[0]),
-        xytext=(4, 4), textcoords='offset points')
-    ax.annotate(str(round(used_memory_list[-1], 2)), xy=(dates[-1], used_memory_list[-1]),
-        xytext=(4, -4), textcoords='offset points')
+    plt.stackplot(dates, used, middle, cached, free, baseline='zero')
+    _annotate_ends(ax, dates, total)
+    _annotate_ends(ax, dates, middle, offset=used)
+    _annotate_ends(ax, dates, cached, offset=used + middle)
+    _annotate_ends(ax, dates, used)
     datefmt = mdates.DateFormatter('%m-%d %H-%M')
     ax.xaxis.set_major_formatter(datefmt)
     ax.grid(True)
@@ -1059,35 +1183,26 @@ def graph_appliance_measurements(graphs_path, ver, appliance_results, use_slab,
     p2 = plt.Rectangle((0, 0), 1, 1, fc='coral')
     p3 = plt.Rectangle((0, 0), 1, 1, fc='steelblue')
     p4 = plt.Rectangle((0, 0), 1, 1, fc='forestgreen')
-    if use_slab:
-        ax.legend([p1, p2, p3, p4], ['Used', 'Slab', 'Cached', 'Free'],
-            bbox_to_anchor=(1.45, 0.22), fancybox=True)
-    else:
-        ax.legend([p1, p2, p3, p4], ['Used', 'Buffers', 'Cached', 'Free'],
-            bbox_to_anchor=(1.45, 0.22), fancybox=True)
+    ax.legend([p1, p2, p3, p4], ['Used', 'Slab' if use_slab else 'Buffers', 'Cached', 'Free'],
+        bbox_to_anchor=(1.45, 0.22), fancybox=True)
     fig.autofmt_xdate()
     plt.savefig(str(file_name), bbox_inches='tight')
     plt.close()
+    # Reset Colors
+    mpl.rcdefaults()
 
-    # Stack Plot Swap usage
+
+def plot_appliance_swap(file_name, provider_names, dates, swap_total, swap_free):
+    """Stack plot of the appliance swap usage"""
     mpl.rcParams['axes.prop_cycle'] = cycler('color', ['firebrick', 'forestgreen'])
-    file_name = graphs_path.join('{}-appliance_swap.png'.format(ver))
     fig, ax = plt.subplots()
     plt.title('Provider(s): {}\nAppliance Swap'.format(provider_names))
     plt.xlabel('Date / Time')
     plt.ylabel('Swap (MiB)')
-
-    swap_used_list = [t - f for f, t in zip(swap_free_list, swap_total_list)]
-    y = [swap_used_list, swap_free_list]
-    plt.stackplot(dates, *y, baseline='zero')
-    ax.annotate(str(round(swap_total_list[0], 2)), xy=(dates[0], swap_total_list[0]),
-        xytext=(4, 4), textcoords='offset points')
-    ax.annotate(str(round(swap_total_list[-1], 2)), xy=(dates[-1], swap_total_list[-1]),
-        xytext=(4, -4), textcoords='offset points')
-    ax.annotate(str(round(swap_used_list[0], 2)), xy=(dates[0], swap_used_list[0]),
-        xytext=(4, 4), textcoords='offset points')
-    ax.annotate(str(round(swap_used_list[-1], 2)), xy=(dates[-1], swap_used_list[-1]),
-        xytext=(4, -4), textcoords='offset points')
+    swap_used = swap_total - swap_free
+    plt.stackplot(dates, swap_used, swap_free, baseline='zero')
+    _annotate_ends(ax, dates, swap_total)
+    _annotate_ends(ax, dates, swap_used)
     datefmt = mdates.DateFormatter('%m-%d %H-%M')
     ax.xaxis.set_major_formatter(datefmt)
     ax.grid(True)
@@ -1097,36 +1212,25 @@ def graph_appliance_measurements(graphs_path, ver, appliance_results, use_slab,
     fig.autofmt_xdate()
     plt.savefig(str(file_name), bbox_inches='tight')
     plt.close()
-
     # Reset Colors
     mpl.rcdefaults()
 
-    timediff = time.time() - starttime
-    logger.info('Plotted Appliance Memory in: {}'.format(timediff))
-
 
-def graph_all_miq_workers(graph_file_path, process_results, provider_names):
-    starttime = time.time()
-    file_name = graph_file_path.join('all-processes.png')
+def plot_lines(file_name, title, lines):
+    """Line graph of memory over time.
 
+    Args:
+        lines: List of ``(dates, samples, label, annotate)``, ``annotate`` tells whether to
+            annotate the first and the last value.
+    """
     fig, ax = plt.subplots()
-    plt.title('Provider(s): {}\nAll Workers/Monitored Processes'.format(provider_names))
+    plt.title(title)
     plt.xlabel('Date / Time')
     plt.ylabel('Memory (MiB)')
-    for process_name in process_results:
-        if 'Worker' in process_name or 'Handler' in process_name or 'Catcher' in process_name:
-            for process_pid in process_results[process_name]:
-                dates = process_results[process_name][process_pid].keys()
-
-                rss_samples = list(process_results[process_name][process_pid][ts]['rss']
-                        for ts in process_results[process_name][process_pid].keys())
-                vss_samples = list(process_results[process_name][process_pid][ts]['vss']
-                        for ts in process_results[process_name][process_pid].keys())
-                plt.plot(dates, rss_samples, linewidth=1, label='{} {} RSS'.format(process_pid,
-                    process_name))
-                plt.plot(dates, vss_samples, linewidth=1, label='{} {} VSS'.format(
-                    process_pid, process_name))
-
+    for dates, samples, label, annotate in lines:
+        plt.plot(dates, samples, linewidth=1, label=label)
+        if annotate:
+            _annotate_ends(ax, dates, samples)
     datefmt = mdates.DateFormatter('%m-%d %H-%M')
     ax.xaxis.set_major_formatter(datefmt)
     ax.grid(True)
@@ -1135,162 +1239,76 @@ def graph_all_miq_workers(graph_file_path, process_results, provider_names):
     plt.savefig(str(file_name), bbox_inches='tight')
     plt.close()
 
-    timediff = time.time() - starttime
-    logger.info('Plotted All Type/Process Memory in: {}'.format(timediff))
-
 
-def graph_individual_process_measurements(graph_file_path, process_results, provider_names):
-    starttime = time.time()
-    for process_name in process_results:
-        for process_pid in process_results[process_name]:
-
-            file_name = graph_file_path.join('{}-{}.png'.format(process_name, process_pid))
-
-            dates = process_results[process_name][process_pid].keys()
-            rss_samples = list(process_results[process_name][process_pid][ts]['rss']
-                    for ts in process_results[process_name][process_pid].keys())
-            pss_samples = list(process_results[process_name][process_pid][ts]['pss']
-                    for ts in process_results[process_name][process_pid].keys())
-            uss_samples = list(process_results[process_name][process_pid][ts]['uss']
-                    for ts in process_results[process_name][process_pid].keys())
-            vss_samples = list(process_results[process_name][process_pid][ts]['vss']
-                    for ts in process_results[process_name][process_pid].keys())
-            swap_samples = list(process_results[process_name][process_pid][ts]['swap']
-                    for ts in process_results[process_name][process_pid].keys())
-
-            fig, ax = plt.subplots()
-            plt.title('Provider(s)/Size: {}\nProcess/Worker: {}\nPID: {}'.format(provider_names,
-                process_name, process_pid))
-            plt.xlabel('Date / Time')
-            plt.ylabel('Memory (MiB)')
-            plt.plot(dates, rss_samples, linewidth=1, label='RSS')
-            plt.plot(dates, pss_samples, linewidth=1, label='PSS')
-            plt.plot(dates, uss_samples, linewidth=1, label='USS')
-            plt.plot(dates, vss_samples, linewidth=1, label='VSS')
-            plt.plot(dates, swap_samples, linewidth=1, label='Swap')
-
-            if rss_samples:
-                ax.annotate(str(round(rss_samples[0], 2)), xy=(dates[0], rss_samples[0]),
-                    xytext=(4, 4), textcoords='offset points')
-                ax.annotate(str(round(rss_samples[-1], 2)), xy=(dates[-1], rss_samples[-1]),
-                    xytext=(4, -4), textcoords='offset points')
-            if pss_samples:
-                ax.annotate(str(round(pss_samples[0], 2)), xy=(dates[0], pss_samples[0]),
-                    xytext=(4, 4), textcoords='offset points')
-                ax.annotate(str(round(pss_samples[-1], 2)), xy=(dates[-1], pss_samples[-1]),
-                    xytext=(4, -4), textcoords='offset points')
-            if uss_samples:
-                ax.annotate(str(round(uss_samples[0], 2)), xy=(dates[0], uss_samples[0]),
-                    xytext=(4, 4), textcoords='offset points')
-                ax.annotate(str(round(uss_samples[-1], 2)), xy=(dates[-1], uss_samples[-1]),
-                    xytext=(4, -4), textcoords='offset points')
-            if vss_samples:
-                ax.annotate(str(round(vss_samples[0], 2)), xy=(dates[0], vss_samples[0]),
-                    xytext=(4, 4), textcoords='offset points')
-                ax.annotate(str(round(vss_samples[-1], 2)), xy=(dates[-1], vss_samples[-1]),
-                    xytext=(4, -4), textcoords='offset points')
-            if swap_samples:
-                ax.annotate(str(round(swap_samples[0], 2)), xy=(dates[0], swap_samples[0]),
-                    xytext=(4, 4), textcoords='offset points')
-                ax.annotate(str(round(swap_samples[-1], 2)), xy=(dates[-1], swap_samples[-1]),
-                    xytext=(4, -4), textcoords='offset points')
-
-            datefmt = mdates.DateFormatter('%m-%d %H-%M')
-            ax.xaxis.set_major_formatter(datefmt)
-            ax.grid(True)
-            plt.legend(loc='upper center', bbox_to_anchor=(1.2, 0.1), fancybox=True)
-            fig.autofmt_xdate()
-            plt.savefig(str(file_name), bbox_inches='tight')
-            plt.close()
+def graph_appliance_measurements(graphs_path, ver, frame, use_slab, provider_names):
+    return [
+        (plot_appliance_memory, (graphs_path.join('{}-appliance_memory.png'.format(ver)).strpath,
+            provider_names, frame.dates, frame['used'], frame['slab' if use_slab else 'buffers'],
+            frame['cached'], frame['free'], frame['total'], use_slab)),
+        (plot_appliance_swap, (graphs_path.join('{}-appliance_swap.png'.format(ver)).strpath,
+            provider_names, frame.dates, frame['swap_total'], frame['swap_free'])),
+    ]
 
-    timediff = time.time() - starttime
-    logger.info('Plotted Individual Process Memory in: {}'.format(timediff))
 
-
-def graph_same_miq_workers(graph_file_path, process_results, provider_names):
-    starttime = time.time()
-    for process_name in process_results:
-        if len(process_results[process_name]) > 1:
+def graph_all_miq_workers(graph_file_path, frame, provider_names):
+    lines = []
+    for process_name in frame.processes:
+        if 'Worker' in process_name or 'Handler' in process_name or 'Catcher' in process_name:
+            for process_pid, series in frame.processes[process_name].items():
+                lines.append((series.dates, series['rss'],
+                    '{} {} RSS'.format(process_pid, process_name), False))
+                lines.append((series.dates, series['vss'],
+                    '{} {} VSS'.format(process_pid, process_name), False))
+    return [(plot_lines, (graph_file_path.join('all-processes.png').strpath,
+        'Provider(s): {}\nAll Workers/Monitored Processes'.format(provider_names), lines))]
+
+
+def graph_individual_process_measurements(graph_file_path, frame, provider_names):
+    graphs = []
+    for process_name in frame.processes:
+        for process_pid, series in frame.processes[process_name].items():
+            lines = [(series.dates, series[measurement], label, True) for measurement, label in
+                zip(PROCESS_MEASUREMENTS, ['RSS', 'PSS', 'USS', 'VSS', 'Swap'])]
+            graphs.append((plot_lines, (
+                graph_file_path.join('{}-{}.png'.format(process_name, process_pid)).strpath,
+                'Provider(s)/Size: {}\nProcess/Worker: {}\nPID: {}'.format(provider_names,
+                    process_name, process_pid),
+                lines)))
+    return graphs
+
+
+def graph_same_miq_workers(graph_file_path, frame, provider_names):
+    graphs = []
+    for process_name in frame.processes:
+        if len(frame.processes[process_name]) > 1:
             logger.debug('Plotting {} {} processes on single graph.'.format(
-                len(process_results[process_name]), process_name))
-            file_name = graph_file_path.join('{}-all.png'.format(process_name))
-
-            fig, ax = plt.subplots()
+                len(frame.processes[process_name]), process_name))
             pids = 'PIDs: '
-            for i, pid in enumerate(process_results[process_name], 1):
+            for i, pid in enumerate(frame.processes[process_name], 1):
                 pids = '{}{}'.format(pids, '{},{}'.format(pid, [' ', '\n'][i % 6 == 0]))
             pids = pids[0:-2]
-            plt.title('Provider: {}\nProcess/Worker: {}\n{}'.format(provider_names,
-                process_name, pids))
-            plt.xlabel('Date / Time')
-            plt.ylabel('Memory (MiB)')
-
-            for process_pid in process_results[process_name]:
-                dates = process_results[process_name][process_pid].keys()
-
-                rss_samples = list(process_results[process_name][process_pid][ts]['rss']
-                        for ts in process_results[process_name][process_pid].keys())
-                pss_samples = list(process_results[process_name][process_pid][ts]['pss']
-                        for ts in process_results[process_name][process_pid].keys())
-                uss_samples = list(process_results[process_name][process_pid][ts]['uss']
-                        for ts in process_results[process_name][process_pid].keys())
-                vss_samples = list(process_results[process_name][process_pid][ts]['vss']
-                        for ts in process_results[process_name][process_pid].keys())
-                swap_samples = list(process_results[process_name][process_pid][ts]['swap']
-                        for ts in process_results[process_name][process_pid].keys())
-                plt.plot(dates, rss_samples, linewidth=1, label='{} RSS'.format(process_pid))
-                plt.plot(dates, pss_samples, linewidth=1, label='{} PSS'.format(process_pid))
-                plt.plot(dates, uss_samples, linewidth=1, label='{} USS'.format(process_pid))
-                plt.plot(dates, vss_samples, linewidth=1, label='{} VSS'.format(process_pid))
-                plt.plot(dates, swap_samples, linewidth=1, label='{} SWAP'.format(process_pid))
-                if rss_samples:
-                    ax.annotate(str(round(rss_samples[0], 2)), xy=(dates[0], rss_samples[0]),
-                        xytext=(4, 4), textcoords='offset points')
-                    ax.annotate(str(round(rss_samples[-1], 2)), xy=(dates[-1],
-                        rss_samples[-1]), xytext=(4, -4), textcoords='offset points')
-                if pss_samples:
-                    ax.annotate(str(round(pss_samples[0], 2)), xy=(dates[0],
-                        pss_samples[0]), xytext=(4, 4), textcoords='offset points')
-                    ax.annotate(str(round(pss_samples[-1], 2)), xy=(dates[-1],
-                        pss_samples[-1]), xytext=(4, -4), textcoords='offset points')
-                if uss_samples:
-                    ax.annotate(str(round(uss_samples[0], 2)), xy=(dates[0],
-                        uss_samples[0]), xytext=(4, 4), textcoords='offset points')
-                    ax.annotate(str(round(uss_samples[-1], 2)), xy=(dates[-1],
-                        uss_samples[-1]), xytext=(4, -4), textcoords='offset points')
-                if vss_samples:
-                    ax.annotate(str(round(vss_samples[0], 2)), xy=(dates[0],
-                        vss_samples[0]), xytext=(4, 4), textcoords='offset points')
-                    ax.annotate(str(round(vss_samples[-1], 2)), xy=(dates[-1],
-                        vss_samples[-1]), xytext=(4, -4), textcoords='offset points')
-                if swap_samples:
-                    ax.annotate(str(round(swap_samples[0], 2)), xy=(dates[0],
-                        swap_samples[0]), xytext=(4, 4), textcoords='offset points')
-                    ax.annotate(str(round(swap_samples[-1], 2)), xy=(dates[-1],
-                        swap_samples[-1]), xytext=(4, -4), textcoords='offset points')
-
-            datefmt = mdates.DateFormatter('%m-%d %H-%M')
-            ax.xaxis.set_major_formatter(datefmt)
-            ax.grid(True)
-            plt.legend(loc='upper center', bbox_to_anchor=(1.2, 0.1), fancybox=True)
-            fig.autofmt_xdate()
-            plt.savefig(str(file_name), bbox_inches='tight')
-            plt.close()
 
-    timediff = time.time() - starttime
-    logger.info('Plotted Same Type/Process Memory in: {}'.format(timediff))
+            lines = []
+            for process_pid, series in frame.processes[process_name].items():
+                lines.extend((series.dates, series[measurement],
+                    '{} {}'.format(process_pid, measurement.upper()), True)
+                    for measurement in PROCESS_MEASUREMENTS)
+            graphs.append((plot_lines, (
+                graph_file_path.join('{}-all.png'.format(process_name)).strpath,
+                'Provider: {}\nProcess/Worker: {}\n{}'.format(provider_names, process_name,
+                    pids),
+                lines)))
+    return graphs
 
 
-def summary_csv_measurement_dump(csv_file, process_results, measurement):
+def summary_csv_measurement_dump(csv_file, frame, measurement):
     csv_file.write('---------------------------------------------\n')
     csv_file.write('Per Process {} Memory Usage\n'.format(measurement.upper()))
     csv_file.write('---------------------------------------------\n')
     csv_file.write('Process/Worker Type,PID,Start of test,End of test\n')
     for ordered_name in process_order:
-        if ordered_name in process_results:
-            for process_pid in sorted(process_results[ordered_name]):
-                start = process_results[ordered_name][process_pid].keys()[0]
-                end = process_results[ordered_name][process_pid].keys()[-1]
+        if ordered_name in frame.processes:
+            for process_pid in sorted(frame.processes[ordered_name]):
+                series = frame.processes[ordered_name][process_pid]
                 csv_file.write('{},{},{},{}\n'.format(ordered_name, process_pid,
-                    round(process_results[ordered_name][process_pid][start][measurement], 2),
-                    round(process_results[ordered_name][process_pid][end][measurement], 2)))
+                    round(series.first(measurement), 2), round(series.last(measurement), 2)))
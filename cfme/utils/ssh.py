@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
+import select
 import socket
 import sys
-from collections import namedtuple
+import threading
+import weakref
+from collections import Counter, OrderedDict, namedtuple
+from concurrent import futures
 from subprocess import check_call
 
 import diaper
@@ -25,6 +29,10 @@ from fixtures.pytest_store import store
 # Default blocking time before giving up on an ssh command execution,
 # in seconds (float)
 RUNCMD_TIMEOUT = 1200.0
+# How many bytes are read from a channel at once
+READ_CHUNK_SIZE = 32768
+# Upper bound of a single wait for channel activity, in seconds
+SELECT_INTERVAL = 1.0
 
 
 class SSHResult(namedtuple("SSHResult", ["rc", "output"])):
@@ -119,6 +127,8 @@ class SSHClient(paramiko.SSHClient):
         self.oc_password = connect_kwargs.pop('oc_password', False)
         self.f_stdout = connect_kwargs.pop('stdout', sys.stdout)
         self.f_stderr = connect_kwargs.pop('stderr', sys.stderr)
+        # Guards (re)connecting, as several threads can share the transport of one client
+        self._connect_lock = threading.RLock()
 
         # load the defaults for ssh
         default_connect_kwargs = {
@@ -207,17 +217,18 @@ class SSHClient(paramiko.SSHClient):
         if self.is_dev:
             raise Exception('SSH is not allowed using a dev appliance!')
         """See paramiko.SSHClient.connect"""
-        if hostname and hostname != self._connect_kwargs['hostname']:
-            self._connect_kwargs['hostname'] = hostname
-            self.close()
-
-        if not self.connected:
-            self._connect_kwargs.update(kwargs)
-            self._check_port()
-            # Only install ssh keys if they aren't installed (or currently being installed)
-            conn = super(SSHClient, self).connect(**self._connect_kwargs)
-        else:
-            conn = None
+        with self._connect_lock:
+            if hostname and hostname != self._connect_kwargs['hostname']:
+                self._connect_kwargs['hostname'] = hostname
+                self.close()
+
+            if not self.connected:
+                self._connect_kwargs.update(kwargs)
+                self._check_port()
+                # Only install ssh keys if they aren't installed (or currently being installed)
+                conn = super(SSHClient, self).connect(**self._connect_kwargs)
+            else:
+                conn = None
 
         self._after_connect()
         return conn
@@ -253,22 +264,65 @@ class SSHClient(paramiko.SSHClient):
             self.connect()
         return super(SSHClient, self).get_transport(*args, **kwargs)
 
-    def run_command(
-            self, command, timeout=RUNCMD_TIMEOUT, reraise=False, ensure_host=False,
-            ensure_user=False, container=None):
-        """Run a command over SSH.
+    def _open_session(self):
+        """Opens a new channel on the shared transport, reconnecting once if the transport died"""
+        try:
+            return self.get_transport().open_session()
+        except (paramiko.SSHException, EOFError, socket.error):
+            if self.connected:
+                raise
+            logger.warning('SSH transport to %r died, reconnecting',
+                           self._connect_kwargs.get('hostname'))
+            with self._connect_lock:
+                if not self.connected:
+                    super(SSHClient, self).close()
+            return self.get_transport().open_session()
+
+    def _read_session(self, session, write_output):
+        """Collects stdout and stderr of a running session until the command exits.
+
+        Instead of polling the channel in a tight loop, this waits on the channel's file
+        descriptor (which paramiko signals for both stdout and stderr data and on close) and
+        then reads all the data that is available in large chunks.
 
         Args:
-            command: The command. Supports taking dicts as version picking.
-            timeout: Timeout after which the command execution fails.
-            reraise: Does not muffle the paramiko exceptions in the log.
-            ensure_host: Ensure that the command is run on the machine with the IP given, not any
-                container or such that we might be using by default.
-            ensure_user: Ensure that the command is run as the user we logged in, so in case we are
-                not root, setting this to True will prevent from running sudo.
-            container: allows to temporarily override default container
+            session: The :py:class:`paramiko.Channel` the command was executed on.
+            write_output: Callable receiving ``(data, file)`` for every chunk read.
+        """
+        fileno = session.fileno()
+        while True:
+            got_data = False
+            while session.recv_ready():
+                write_output(session.recv(READ_CHUNK_SIZE), self.f_stdout)
+                got_data = True
+            while session.recv_stderr_ready():
+                write_output(session.recv_stderr(READ_CHUNK_SIZE), self.f_stderr)
+                got_data = True
+            if got_data:
+                continue
+            elif session.exit_status_ready() or session.eof_received:
+                break
+            else:
+                # The remote side holds on to its output or the exit status, so sleep until
+                # paramiko signals new data. The interval caps the wait as the exit status
+                # itself does not wake the descriptor up.
+                select.select([fileno], [], [], SELECT_INTERVAL)
+
+        # When the program finishes, we need to grab the rest of the output that is left.
+        # Since the command is finished, any pending data will arrive shortly and reading
+        # until EOF won't block for long.
+        for read, file in ((session.recv, self.f_stdout), (session.recv_stderr, self.f_stderr)):
+            while True:
+                data = read(READ_CHUNK_SIZE)
+                if not data:
+                    break
+                write_output(data, file)
+
+    def _prepare_command(self, command, ensure_host=False, ensure_user=False, container=None):
+        """Wraps the command for the container, pod or sudo it has to run in.
+
         Returns:
-            A :py:class:`SSHResult` instance.
+            A tuple ``(command, uses_sudo)``, ``uses_sudo`` tells the channel needs a pty.
         """
         if isinstance(command, dict):
             command = version.pick(command, active_version=self.vmdb_version)
@@ -294,11 +348,30 @@ class SSHClient(paramiko.SSHClient):
 
         if command != original_command:
             logger.info("> Actually running command %r", command)
-        command += '\n'
+        return command + '\n', uses_sudo
+
+    def run_command(
+            self, command, timeout=RUNCMD_TIMEOUT, reraise=False, ensure_host=False,
+            ensure_user=False, container=None):
+        """Run a command over SSH.
+
+        Args:
+            command: The command. Supports taking dicts as version picking.
+            timeout: Timeout after which the command execution fails.
+            reraise: Does not muffle the paramiko exceptions in the log.
+            ensure_host: Ensure that the command is run on the machine with the IP given, not any
+                container or such that we might be using by default.
+            ensure_user: Ensure that the command is run as the user we logged in, so in case we are
+                not root, setting this to True will prevent from running sudo.
+            container: allows to temporarily override default container
+        Returns:
+            A :py:class:`SSHResult` instance.
+        """
+        command, uses_sudo = self._prepare_command(command, ensure_host, ensure_user, container)
 
         output = []
         try:
-            session = self.get_transport().open_session()
+            session = self._open_session()
             if uses_sudo:
                 # We need a pseudo-tty for sudo
                 session.get_pty()
@@ -306,47 +379,13 @@ class SSHClient(paramiko.SSHClient):
                 session.settimeout(float(timeout))
 
             session.exec_command(command)
-            stdout = session.makefile()
-            stderr = session.makefile_stderr()
 
-            def write_output(line, file):
-                output.append(line)
+            def write_output(data, file):
+                output.append(data)
                 if self._streaming:
-                    file.write(line)
-
-            while True:
-                if session.exit_status_ready():
-                    break
+                    file.write(data)
 
-                # While the program is running loop through collecting line by line so that we don't
-                # fill the buffers up without a newline.   Also, note that for long running programs if
-                # we try to read output when there is none (and in the case of stderr may never be any)
-                # we run the risk of blocking so long that the write buffer on the remote side will fill
-                # and the remote program will block on a write.   The blocking on our side occurs in
-                # paramiko's buffered_pipe.py's read() call, which will block if its internal buffer is
-                # is empty.
-                if session.recv_ready():
-                    try:
-                        line = stdout.next()
-                        write_output(line, self.f_stdout)
-                    except StopIteration:
-                        pass
-
-                if session.recv_stderr_ready():
-                    try:
-                        line = stderr.next()
-                        write_output(line, self.f_stderr)
-                    except StopIteration:
-                        pass
-
-            # When the program finishes, we need to grab the rest of the output that is left.
-            # Also, we don't have the issue of blocking reads because since the command is
-            # finished, any pending reads of SSH encrypted data will finish shortly and put in
-            # the buffer or for an empty file EOF will be reached as it will be closed.
-            for line in stdout:
-                write_output(line, self.f_stdout)
-            for line in stderr:
-                write_output(line, self.f_stderr)
+            self._read_session(session, write_output)
 
             exit_status = session.recv_exit_status()
             if exit_status != 0:
@@ -368,6 +407,63 @@ class SSHClient(paramiko.SSHClient):
         # Return whatever we have in the output
         return SSHResult(1, ''.join(output))
 
+    def run_commands_parallel(self, commands, max_workers=None, **kwargs):
+        """Run several commands at once, each on its own channel of the shared transport.
+
+        Args:
+            commands: An iterable of commands as accepted by :py:meth:`run_command`.
+            max_workers: Maximum number of commands running at the same time, all of them
+                by default.
+            **kwargs: Passed to every :py:meth:`run_command` call.
+        Returns:
+            A list of :py:class:`SSHResult` instances in the order of ``commands``.
+        """
+        commands = list(commands)
+        if not commands:
+            return []
+        # Connect up front so the workers don't race for the transport
+        self.get_transport()
+        with futures.ThreadPoolExecutor(max_workers=max_workers or len(commands)) as executor:
+            return list(executor.map(lambda command: self.run_command(command, **kwargs),
+                                     commands))
+
+    def stream_command(self, command, **kwargs):
+        """Runs a long-lived command and yields its standard output line by line as it arrives.
+
+        The command keeps running on its channel until it exits on its own or until the
+        generator is closed, which closes the channel.
+
+        Args:
+            command: The command. Supports taking dicts as version picking.
+            **kwargs: ``ensure_host``, ``ensure_user`` and ``container`` as for
+                :py:meth:`run_command`.
+        """
+        command, uses_sudo = self._prepare_command(command, **kwargs)
+        session = self._open_session()
+        try:
+            if uses_sudo:
+                # We need a pseudo-tty for sudo
+                session.get_pty()
+            session.exec_command(command)
+            partial_line = ''
+            while True:
+                # Blocks until there is data, an empty read means the command closed its output
+                data = session.recv(READ_CHUNK_SIZE)
+                if not data:
+                    break
+                lines = (partial_line + data).split('\n')
+                partial_line = lines.pop()
+                for line in lines:
+                    yield line.rstrip('\r')
+            if partial_line:
+                yield partial_line
+            exit_status = session.recv_exit_status()
+            if exit_status != 0:
+                logger.warning('Streamed command %r exited with %d: %r', command, exit_status,
+                               session.recv_stderr(READ_CHUNK_SIZE))
+        finally:
+            session.close()
+
     def cpu_spike(self, seconds=60, cpus=2, **kwargs):
         """Creates a CPU spike of specific length and processes.
 
@@ -660,50 +756,276 @@ class SSHClient(paramiko.SSHClient):
         return {"servers": servers, "workers": workers}
 
 
+class RemoteFileSource(object):
+    """Follows a single remote file over one persistent SFTP session.
+
+    Sources are shared between all :py:class:`SSHTail` instances tailing the same file on the
+    same host, see :py:func:`get_tail_source`. The source does not keep any read position, each
+    tail keeps its own ``(inode, offset)`` and asks the source for everything written after it.
+
+    Rotation is detected by the inode of the path changing. The handle of the rotated file is
+    kept open until every tail read the rest of it, so what was written to it between two reads
+    is still returned. Truncation is detected by the file getting smaller than the requested
+    offset.
+    """
+    # How many handles of files no tail reads any more are kept around
+    MAX_OPEN_FILES = 2
+
+    def __init__(self, ssh_client, remote_filename):
+        self.ssh_client = ssh_client
+        self.remote_filename = remote_filename
+        self.users = 0
+        self._lock = threading.RLock()
+        self._sftp = None
+        self._files = OrderedDict()
+        # {inode: number of tails positioned in that file}
+        self._readers = Counter()
+
+    def _reset(self):
+        for remote_file in self._files.values():
+            with diaper:
+                remote_file.close()
+        self._files.clear()
+        if self._sftp is not None:
+            with diaper:
+                self._sftp.close()
+        self._sftp = None
+
+    @property
+    def sftp(self):
+        if self._sftp is None:
+            self._sftp = self.ssh_client.open_sftp()
+        return self._sftp
+
+    def _remote_stat(self):
+        """Returns ``(inode, size)`` of the remote path, inode is ``None`` if it can't be read"""
+        session = self.ssh_client.get_transport().open_session()
+        try:
+            session.exec_command("stat -L -c '%i %s' {}".format(quote(self.remote_filename)))
+            output = session.makefile().read()
+            if session.recv_exit_status() == 0:
+                inode, size = output.split()
+                return int(inode), int(size)
+        except ValueError:
+            pass
+        finally:
+            session.close()
+        return None, self.sftp.stat(self.remote_filename).st_size
+
+    def _file(self, inode):
+        if inode in self._files:
+            return self._files[inode]
+        remote_file = self.sftp.open(self.remote_filename, 'r')
+        self._files[inode] = remote_file
+        unread = [key for key in self._files if not self._readers[key] and key != inode]
+        for key in unread[:max(0, len(self._files) - self.MAX_OPEN_FILES)]:
+            with diaper:
+                self._files.pop(key).close()
+        return remote_file
+
+    def _move(self, old_inode, new_inode):
+        """Moves a tail from one file to another, the old one is closed once no tail reads it"""
+        if old_inode == new_inode:
+            return
+        if new_inode is not None:
+            self._readers[new_inode] += 1
+        if old_inode is not None:
+            self._readers[old_inode] -= 1
+            if self._readers[old_inode] <= 0:
+                del self._readers[old_inode]
+                if old_inode in self._files:
+                    with diaper:
+                        self._files.pop(old_inode).close()
+
+    @staticmethod
+    def _read_range(remote_file, start, end):
+        if end <= start:
+            return ''
+        remote_file.seek(start)
+        # pipeline the SFTP read requests instead of waiting for every 32k block
+        remote_file.prefetch(end)
+        return remote_file.read(end - start)
+
+    def stat(self):
+        """Returns the current ``(inode, size)`` of the remote file"""
+        with self._lock:
+            try:
+                return self._remote_stat()
+            except (paramiko.SSHException, EOFError, IOError, socket.error):
+                self._reset()
+                return self._remote_stat()
+
+    def start(self, previous_inode=None):
+        """Positions a tail at the current end of the file.
+
+        Args:
+            previous_inode: the file the tail read before, if any
+
+        Returns:
+            The current ``(inode, size)`` of the remote file
+        """
+        with self._lock:
+            inode, size = self.stat()
+            self._move(previous_inode, inode)
+            if inode is not None:
+                # Opened now, so that the rest of it can be read when it gets rotated
+                with diaper:
+                    self._file(inode)
+            return inode, size
+
+    def follow(self, inode):
+        """Adds a tail positioned in the file ``inode``"""
+        with self._lock:
+            self._move(None, inode)
+
+    def stop(self, inode):
+        """Drops a tail positioned in the file ``inode``"""
+        with self._lock:
+            self._move(inode, None)
+
+    def read_from(self, inode, offset):
+        """Reads everything written after ``offset`` of the file identified by ``inode``.
+
+        Returns:
+            A tuple ``(data, inode, offset)`` with the position to continue reading from.
+        """
+        with self._lock:
+            try:
+                return self._read_from(inode, offset)
+            except (paramiko.SSHException, EOFError, IOError, socket.error):
+                # stale session, e.g. the client got closed in between, reopen everything
+                self._reset()
+                return self._read_from(inode, offset)
+
+    def _read_from(self, inode, offset):
+        data = []
+        current_inode, size = self._remote_stat()
+        if inode != current_inode:
+            if inode in self._files:
+                # the file got rotated, finish the old one first
+                old_file = self._files[inode]
+                data.append(self._read_range(old_file, offset, old_file.stat().st_size))
+            if inode is not None:
+                offset = 0
+        if size < offset:
+            logger.info('%r got truncated, reading it from the start', self.remote_filename)
+            offset = 0
+        remote_file = self._file(current_inode)
+        data.append(self._read_range(remote_file, offset, size))
+        # Only now the tail moved on, the old file stays for the tails that did not yet
+        self._move(inode, current_inode)
+        return ''.join(data), current_inode, size
+
+    def close(self):
+        with self._lock:
+            self._reset()
+            self.ssh_client.close()
+
+
+# Tails keep their sources alive, a source no tail uses any more is dropped even if the tail was
+# not closed
+_tail_sources = weakref.WeakValueDictionary()
+_tail_sources_lock = threading.Lock()
+
+
+def get_tail_source(remote_filename, connect_kwargs):
+    """Returns the shared :py:class:`RemoteFileSource` for a file, creating it if needed"""
+    key = (connect_kwargs.get('hostname'), connect_kwargs.get('port'),
+           connect_kwargs.get('username'), remote_filename)
+    with _tail_sources_lock:
+        source = _tail_sources.get(key)
+        if source is None:
+            source = _tail_sources[key] = RemoteFileSource(
+                SSHClient(stream_output=False, **connect_kwargs), remote_filename)
+        source.users += 1
+        return source
+
+
+def release_tail_source(source, inode=None):
+    """Drops one user of the source positioned in the file ``inode``, closing the source when it
+    was the last one"""
+    source.stop(inode)
+    with _tail_sources_lock:
+        source.users -= 1
+        if source.users > 0:
+            return
+        for key, value in list(_tail_sources.items()):
+            if value is source:
+                del _tail_sources[key]
+    source.close()
+
+
 class SSHTail(SSHClient):
+    """Tails a remote file.
+
+    Every iteration yields the lines written to the file since the previous one. The remote
+    file is followed by a :py:class:`RemoteFileSource` which is shared by all tails of the same
+    file on the same host, each tail keeps its own position. A trailing line without a newline
+    is held back until it is complete.
+    """
 
     def __init__(self, remote_filename, **connect_kwargs):
         super(SSHTail, self).__init__(stream_output=False, **connect_kwargs)
         self._remote_filename = remote_filename
-        self._sftp_client = None
+        self._source = None
+        self._remote_inode = None
         self._remote_file_size = None
+        self._partial_line = ''
 
     def __iter__(self):
         for line in self.raw_lines():
             yield line.rstrip()
 
+    @property
+    def source(self):
+        if self._source is None:
+            self._source = get_tail_source(self._remote_filename, self._connect_kwargs)
+            if self._remote_inode is not None:
+                # Reopened after close, the tail goes on where it stopped
+                self._source.follow(self._remote_inode)
+        return self._source
+
     def raw_lines(self):
-        with self as sshtail:
-            fstat = sshtail._sftp_client.stat(self._remote_filename)
-            if self._remote_file_size is not None:
-                if self._remote_file_size < fstat.st_size:
-                    remote_file = self._sftp_client.open(self._remote_filename, 'r')
-                    remote_file.seek(self._remote_file_size, 0)
-                    while (remote_file.tell() < fstat.st_size):
-                        line = remote_file.readline()  # Note the  missing rstrip() here!
-                        yield line
-            self._remote_file_size = fstat.st_size
+        if self._remote_file_size is None:
+            # Nothing to report on the first call, only remember where the file ends now
+            self.set_initial_file_end()
+            return
+        data, self._remote_inode, self._remote_file_size = self.source.read_from(
+            self._remote_inode, self._remote_file_size)
+        if not data:
+            return
+        lines = (self._partial_line + data).splitlines(True)
+        if lines[-1].endswith('\n'):
+            self._partial_line = ''
+        else:
+            self._partial_line = lines.pop()
+        for line in lines:
+            yield line  # Note the  missing rstrip() here!
 
     def raw_string(self):
         return ''.join(self)
 
     def __enter__(self):
-        self.connect(**self._connect_kwargs)
-        self._sftp_client = self.open_sftp()
         return self
 
     def __exit__(self, *args, **kwargs):
-        self._sftp_client.close()
+        self.close()
 
     def set_initial_file_end(self):
-        with self as sshtail:
-            fstat = sshtail._sftp_client.stat(self._remote_filename)
-            self._remote_file_size = fstat.st_size  # Seed initial size of file
+        # Seed initial position of the file
+        self._remote_inode, self._remote_file_size = self.source.start(self._remote_inode)
+        self._partial_line = ''
 
     def lines_as_list(self):
         """Return lines as list"""
         return list(self)
 
+    def close(self):
+        if getattr(self, '_source', None) is not None:
+            source, self._source = self._source, None
+            release_tail_source(source, self._remote_inode)
+        super(SSHTail, self).close()
+
 
 def keygen():
     """Generate temporary ssh keypair for appliance SSH auth
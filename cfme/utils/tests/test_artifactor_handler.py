@@ -0,0 +1,58 @@
+import logging
+
+import pytest
+
+from cfme.utils.log import ArtifactorHandler
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+class RecordingClient(object):
+    def __init__(self):
+        self.calls = []
+
+    def fire_hook(self, hook, **kwargs):
+        self.calls.append((hook, kwargs))
+
+    def __nonzero__(self):
+        return True
+
+
+def make_record(msg, *args):
+    return logging.LogRecord('cfme', logging.INFO, __file__, 1, msg, args, None)
+
+
+@pytest.fixture
+def handler():
+    handler = ArtifactorHandler()
+    handler.artifactor = RecordingClient()
+    yield handler
+    handler.close()
+
+
+def test_unbuffered_fires_per_record(handler):
+    handler.emit(make_record('one'))
+    handler.emit(make_record('two'))
+    assert [hook for hook, _ in handler.artifactor.calls] == ['log_message', 'log_message']
+
+
+def test_buffered_flush_batches_records(handler):
+    # a long interval so that only the explicit flush ships the records
+    handler.set_buffered(batch_size=2, flush_interval=60)
+    for i in range(3):
+        handler.emit(make_record('message %s', i))
+    handler.flush()
+    calls = handler.artifactor.calls
+    assert [hook for hook, _ in calls] == ['log_messages', 'log_messages']
+    messages = [record['msg'] for _, kwargs in calls for record in kwargs['log_records']]
+    assert messages == ['message 0', 'message 1', 'message 2']
+
+
+def test_buffered_close_loses_nothing(handler):
+    handler.set_buffered(batch_size=1000, flush_interval=60)
+    handler.emit(make_record('last words'))
+    handler.close()
+    assert handler.artifactor.calls[0][1]['log_records'][0]['msg'] == 'last words'
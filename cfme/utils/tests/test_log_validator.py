@@ -0,0 +1,55 @@
+import pytest
+
+from cfme.utils.log_validator import LogValidator, PatternMatcher, _required_literal
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+LINES = [
+    '[----] I, [2018-01-01T00:00:00] INFO -- : MIQ(MiqServer) sso_enabled to true',
+    '[----] E, [2018-01-01T00:00:01] ERROR -- : known harmless error',
+    '[----] E, [2018-01-01T00:00:02] ERROR -- : something broke',
+    '[----] I, [2018-01-01T00:00:03] INFO -- : MIQ(MiqServer) sso_enabled to true',
+]
+
+
+@pytest.mark.parametrize(('pattern', 'literal'), [
+    ('.*ERROR.*', 'ERROR'),
+    ('.*sso_enabled to true.*', 'sso_enabled to true'),
+    ('x(abc)?yz', 'yz'),
+    ('foo|bar', None),
+    ('(?i).*error.*', None),
+])
+def test_required_literal(pattern, literal):
+    assert _required_literal(pattern) == literal
+
+
+def test_pattern_matcher_counts_and_first_line():
+    matcher = PatternMatcher(['.*ERROR.*', '.*sso_enabled.*', '.*never.*'])
+    for line in LINES:
+        matcher.all_matches(line)
+    assert matcher.counts == {'.*ERROR.*': 2, '.*sso_enabled.*': 2, '.*never.*': 0}
+    assert matcher.first_lines['.*ERROR.*'] == LINES[1]
+    assert matcher.matched == ['.*ERROR.*', '.*sso_enabled.*']
+
+
+def test_pattern_matcher_with_groups():
+    # groups disable the combined alternation, matching must not change
+    matcher = PatternMatcher([r'.*(ERROR|WARN).*', r'(\w+) \1'])
+    assert matcher.first_match('an ERROR here') == r'.*(ERROR|WARN).*'
+    assert matcher.first_match('again again') == r'(\w+) \1'
+    assert matcher.first_match('nothing') is None
+
+
+def test_validator_skips_before_failing():
+    validator = LogValidator('/var/www/miq/vmdb/log/evm.log', hostname='localhost',
+                             skip_patterns=['.*harmless.*'],
+                             failure_patterns=['.*ERROR.*'],
+                             matched_patterns=['.*sso_enabled to true.*'])
+    with pytest.raises(pytest.fail.Exception) as excinfo:
+        validator.validate_lines(LINES)
+    assert 'matched 1 times, first on line {}'.format(LINES[2]) in str(excinfo.value)
+    assert validator.matches == {'.*sso_enabled to true.*': 2}
+    assert validator.report()['skip']['.*harmless.*']['count'] == 1
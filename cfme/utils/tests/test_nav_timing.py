@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from cfme.utils.nav_timing import NavigationProfiler
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+def navigate(profiler, destination, duration, prerequisites=()):
+    timing = profiler.start(destination, 'Vm')
+    for prerequisite in prerequisites:
+        navigate(profiler, *prerequisite)
+    profiler.finish(timing, duration)
+
+
+def test_nav_timing_chains():
+    profiler = NavigationProfiler()
+    profiler.enabled = True
+    profiler.test = 'test_a'
+    navigate(profiler, 'Details', 5.0, [('All', 3.0)])
+    navigate(profiler, 'Details', 1.0)
+    profiler.test = 'test_b'
+    navigate(profiler, 'Details', 4.0, [('All', 2.0)])
+
+    assert [chain.chain for chain in profiler.chains] == [
+        ['Vm/All', 'Vm/Details'], ['Vm/Details'], ['Vm/All', 'Vm/Details']]
+    assert profiler.slowest_chains() == [
+        ('Vm/All > Vm/Details', 2, 9.0, 5.0), ('Vm/Details', 1, 1.0, 1.0)]
+    assert profiler.tests() == [('test_a', (2, 6.0)), ('test_b', (1, 4.0))]
+
+    merged = NavigationProfiler()
+    merged.merge(json.loads(json.dumps(profiler.to_dict())))
+    assert merged.slowest_chains() == profiler.slowest_chains()
+
+
+def test_nav_timing_disabled():
+    profiler = NavigationProfiler()
+    navigate(profiler, 'Details', 5.0, [('All', 3.0)])
+    assert profiler.chains == []
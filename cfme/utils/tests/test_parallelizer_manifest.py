@@ -0,0 +1,23 @@
+import pytest
+
+from fixtures.parallelizer.manifest import build_manifest, collection_hash, module_of
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+def test_collection_manifest():
+    collection = [
+        'cfme/tests/test_a.py::test_one[rhevm]',
+        'cfme/tests/test_a.py::test_one[vsphere6]',
+        'cfme/tests/test_b.py::TestClass::()::test_two',
+    ]
+    manifest = build_manifest(collection)
+    assert manifest['hash'] == collection_hash(reversed(collection))
+    assert list(manifest['modules']) == ['cfme/tests/test_a.py', 'cfme/tests/test_b.py']
+    module = manifest['modules'][module_of(collection[0])]
+    assert module['node_ids'] == collection[:2]
+    assert module['hash'] == collection_hash(collection[1::-1])
+    assert module['hash'] != collection_hash(collection[:1])
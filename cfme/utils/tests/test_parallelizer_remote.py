@@ -0,0 +1,38 @@
+import pytest
+
+from fixtures.parallelizer.remote import collect_module
+from fixtures.pytest_store import store
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+@pytest.mark.meta(collected_by='slave')
+def test_with_meta(meta):
+    assert meta.collected_by == 'slave'
+
+
+@pytest.mark.uncollect(reason='Collected by test_collect_module only')
+def test_uncollected():
+    pass
+
+
+@pytest.mark.manual
+def test_manual():
+    pass
+
+
+def test_collect_module(request, monkeypatch):
+    monkeypatch.setattr(store, 'parallelizer_role', 'slave')
+    session_items = list(request.session.items)
+    items = collect_module(request.session, request.fspath)
+    by_name = {item.name: item for item in items}
+    # Filtered by the uncollect and manual hooks
+    assert 'test_uncollected' not in by_name
+    assert 'test_manual' not in by_name
+    # The metadata the meta plugins and the meta fixture read
+    assert by_name['test_with_meta']._metadata.collected_by == 'slave'
+    assert all(hasattr(item, '_metadata') for item in items)
+    assert request.session.items == session_items
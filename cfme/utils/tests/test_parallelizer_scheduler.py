@@ -0,0 +1,102 @@
+from collections import namedtuple
+
+import pytest
+
+from fixtures.parallelizer.scheduler import (
+    DurationStore, ProviderScheduler, TestGroup, balance_groups, modscope_groups,
+    provider_of_tests, simulate)
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+PROVIDERS = ['vsphere65', 'vsphere6', 'rhevm']
+
+
+def make_groups(durations):
+    collection = [
+        'test_a.py::test_one[vsphere65]',
+        'test_a.py::test_one[vsphere6]',
+        'test_a.py::test_two[vsphere65]',
+        'test_a.py::test_one[rhevm]',
+        'test_b.py::test_plain',
+        'test_c.py::test_one[vsphere6]',
+        'test_c.py::test_one[rhevm]',
+    ]
+    return [TestGroup(tests, provider_of_tests(tests, PROVIDERS), durations.cost(tests))
+            for tests in modscope_groups(collection)]
+
+
+def test_modscope_groups():
+    groups = make_groups(DurationStore())
+    assert [group.tests for group in groups] == [
+        ['test_a.py::test_one[vsphere65]', 'test_a.py::test_two[vsphere65]'],
+        ['test_a.py::test_one[vsphere6]'],
+        ['test_a.py::test_one[rhevm]'],
+        ['test_b.py::test_plain'],
+        ['test_c.py::test_one[vsphere6]'],
+        ['test_c.py::test_one[rhevm]'],
+    ]
+    assert [group.provider for group in groups] == [
+        'vsphere65', 'vsphere6', 'rhevm', None, 'vsphere6', 'rhevm']
+
+
+def test_scheduler_keeps_slaves_on_their_provider():
+    durations = DurationStore({'test_a.py::test_one[rhevm]': 600.0,
+        'test_b.py::test_plain': 10.0, 'test_c.py::test_one[rhevm]': 10.0})
+    scheduler = ProviderScheduler(make_groups(durations))
+    assert len(scheduler) == 6
+
+    # fresh slaves claim the providers with the most work first
+    group, provider = scheduler.next_group('slave00')
+    assert provider == 'rhevm'
+    group, provider = scheduler.next_group('slave01')
+    assert provider == 'vsphere65'
+    # slaves on a provider stay there while it has work, then take the generic tests
+    assert scheduler.next_group('slave00', 'rhevm')[1] == 'rhevm'
+    group, provider = scheduler.next_group('slave00', 'rhevm')
+    assert (group.tests, provider) == (['test_b.py::test_plain'], 'rhevm')
+    assert scheduler.next_group('slave01', 'vsphere65')[1] == 'vsphere6'
+    assert scheduler.next_group('slave01', 'vsphere6')[1] == 'vsphere6'
+    assert scheduler.next_group('slave00', 'rhevm') == (None, 'rhevm')
+    assert len(scheduler) == 0
+
+
+def test_simulate_provider_switches():
+    durations = DurationStore()
+    makespan, switches = simulate(
+        ProviderScheduler(make_groups(durations)), 3, durations, switch_cost=300.0)
+    assert switches == 0
+    assert makespan == 180.0
+
+
+Report = namedtuple('Report', ['nodeid', 'when', 'duration'])
+
+
+def test_duration_store_record():
+    durations = DurationStore({'test_a.py::test_one': 10.0})
+    for when, duration in (('setup', 1.0), ('call', 2.0), ('teardown', 1.0)):
+        durations.record(Report('test_a.py::test_new', when, duration))
+        durations.record(Report('test_a.py::test_one', when, duration * 5))
+    assert durations.estimate('test_a.py::test_new') == 4.0
+    assert durations.estimate('test_a.py::test_one') == 15.0
+    assert durations.estimate('test_a.py::test_unknown') == 10.0
+
+
+def test_balance_groups():
+    durations = DurationStore(dict.fromkeys(
+        ['test_a.py::test_{}[rhevm]'.format(i) for i in range(5)], 300.0))
+    durations.durations['test_b.py::test_quick[rhevm]'] = 1.0
+    groups = [
+        TestGroup(['test_a.py::test_{}[rhevm]'.format(i) for i in range(5)], 'rhevm', 1500.0),
+        TestGroup(['test_b.py::test_quick[rhevm]'], 'rhevm', 1.0),
+        TestGroup(['test_c.py::test_plain'], None, 300.0),
+        TestGroup(['test_d.py::test_plain'], None, 300.0),
+    ]
+    balanced = list(balance_groups(groups, durations, target=600.0))
+    assert [(len(group.tests), group.provider, group.cost) for group in balanced] == [
+        (2, 'rhevm', 600.0), (2, 'rhevm', 600.0), (2, 'rhevm', 301.0), (2, None, 600.0)]
+    # longest groups go first
+    scheduler = ProviderScheduler(balanced)
+    assert scheduler.next_group('slave00')[0].cost == 600.0
@@ -0,0 +1,81 @@
+import re
+
+import pytest
+
+from cfme.utils.perf_message_stats import (
+    evm_to_message_columns, evm_to_messages, messages_to_hourly_buckets, split_file_at_lines)
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+EVM_LOG = """\
+[----] I, [2018-01-01T10:00:00.000001 #100:a1]  INFO -- : MIQ(MiqServer.start) starting
+[----] I, [2018-01-01T10:00:01.000001 #101:a1]  INFO -- : MIQ(MiqQueue.put) Message id: [1], \
+Command: [Metric::Rollup.rollup], Args: ["2018-01-01T10:00:00Z", "hourly"]
+[----] I, [2018-01-01T10:00:02.000001 #101:a1]  INFO -- : MIQ(MiqQueue.put) Message id: [2], \
+Command: [EmsRefresh.refresh], Args: []
+some line which is not interesting
+[----] I, [2018-01-01T10:00:03.000001 #102:a1]  INFO -- : MIQ(MiqQueue.get_via_drb) \
+Message id: [1], Dequeued in: [1.5] seconds
+[----] I, [2018-01-01T10:00:04.000001 #102:a1]  INFO -- : MIQ(MiqQueue.delivered) \
+Message id: [1], Delivered in [2.25] seconds
+[----] I, [2018-01-01T11:00:05.000001 #102:a1]  INFO -- : MIQ(MiqQueue.get_via_drb) \
+Message id: [3], Dequeued in: [1.0] seconds
+"""
+
+FILTERS = {'-hourly': re.compile(r'\"[0-9\-]*T[0-9\:]*Z\",\s\"hourly\"')}
+
+
+@pytest.fixture
+def evm_log(tmpdir):
+    log_file = tmpdir.join('evm.log')
+    log_file.write(EVM_LOG * 3)
+    return log_file.strpath
+
+
+def test_split_file_at_lines(evm_log):
+    chunks = split_file_at_lines(evm_log, chunk_size=100)
+    with open(evm_log) as f:
+        data = f.read()
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == len(data)
+    for (start, end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert end == next_start
+        assert data[end - 1] == '\n'
+
+
+@pytest.mark.parametrize('processes', [1, 3])
+def test_evm_to_messages(evm_log, processes):
+    messages, msg_cmds, test_start, test_end, line_count = evm_to_messages(
+        evm_log, FILTERS, processes=processes)
+    assert line_count == 21
+    assert test_start == '2018-01-01 10:00:00.000001'
+    assert test_end == '2018-01-01 10:00:04.000001'
+    assert sorted(messages) == ['1', '2']
+    assert messages['1'].msg_cmd == 'Metric::Rollup.rollup-hourly'
+    assert messages['1'].total_time == 3.75
+    assert messages['2'].gettime == ''
+    assert msg_cmds['Metric::Rollup.rollup-hourly'] == {
+        'total': [3.75], 'queue': [1.5], 'execute': [2.25]}
+    assert msg_cmds['EmsRefresh.refresh'] == {'total': [], 'queue': [], 'execute': []}
+
+
+def test_messages_to_hourly_buckets(evm_log):
+    columns, msg_cmds, test_start, test_end, _ = evm_to_message_columns(
+        evm_log, FILTERS, processes=1)
+    assert len(columns) == 2
+    hr_bkt = messages_to_hourly_buckets(columns, test_start, test_end)
+    assert sorted(hr_bkt) == sorted(msg_cmds)
+
+    rollup = hr_bkt['Metric::Rollup.rollup-hourly']['2018-01-01']['10']
+    assert (rollup.total_put, rollup.total_get) == (1, 1)
+    assert (rollup.min_deq, rollup.max_deq, rollup.avg_deq) == (1.5, 1.5, 1.5)
+    assert (rollup.min_del, rollup.max_del, rollup.avg_del) == (2.25, 2.25, 2.25)
+
+    # never picked up, so it is only put in its hour and the rest goes to the empty bucket
+    refresh = hr_bkt['EmsRefresh.refresh']
+    assert refresh['2018-01-01']['10'].total_put == 1
+    assert refresh['2018-01-01']['10'].total_get == 0
+    assert refresh[''][''].total_get == 1
@@ -0,0 +1,71 @@
+import pytest
+
+from cfme.utils.rest_load import RestActionLoad
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+class Action(object):
+    def __init__(self, calls, key=None):
+        self.calls = calls
+        self.key = key
+
+    def reload(self, *resources):
+        self.calls.append(resources or self.key)
+
+
+class Resource(object):
+    def __init__(self, calls, key):
+        self.action = Action(calls, key)
+
+
+class Clock(object):
+    """Time that passes only by sleeping"""
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Session(object):
+    def mount(self, prefix, adapter):
+        pass
+
+
+class RestApi(object):
+    def __init__(self):
+        self.calls = []
+        self._session = Session()
+        self.collections = type('Collections', (object,), {
+            'vms': type('Collection', (object,), {'action': Action(self.calls)})})
+
+
+def test_rest_load_bulk():
+    rest_api = RestApi()
+    with RestActionLoad(rest_api, bulk_size=2) as load:
+        assert load.run('vms', 'reload', range(5)) == 0
+    assert sorted(rest_api.calls) == [(0, 1), (2, 3), (4,)]
+    assert len(load.latencies) == 3
+
+
+def test_rest_load_rate(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('cfme.utils.rest_load.time', clock)
+    rest_api = RestApi()
+    calls = []
+    with RestActionLoad(rest_api, rate=50, workers=1) as load:
+        load.run('vms', 'reload', [Resource(calls, i) for i in range(6)])
+    assert calls == list(range(6))
+    # 6 requests at 50 per second, the first one starts right away
+    assert clock.sleeps == [pytest.approx(0.02)] * 5
+    assert load.max_lag == pytest.approx(0)
+    assert sum(load.histogram().values()) == 6
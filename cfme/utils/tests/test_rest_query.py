@@ -0,0 +1,53 @@
+import pytest
+
+from cfme.utils import rest
+from cfme.utils.rest import index_resources, query_collection
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+class Collection(object):
+    _href = 'https://appliance/api/vms'
+
+
+class RestApi(object):
+    """Serves ``count`` VMs the way the API pages expanded collections"""
+    def __init__(self, count):
+        self.collections = type('Collections', (object,), {'vms': Collection()})
+        self.vms = [{'id': str(i), 'name': 'vm{}'.format(i % 3)} for i in range(count)]
+        self.requests = []
+
+    def get(self, url, **params):
+        self.requests.append(params)
+        offset, limit = params['offset'], params['limit']
+        return {'resources': self.vms[offset:offset + limit]}
+
+
+@pytest.fixture
+def rest_api(monkeypatch):
+    monkeypatch.setattr(rest, 'QUERY_PAGE_SIZE', 2)
+    monkeypatch.setattr(rest, '_query_cache', {})
+    return RestApi(5)
+
+
+def test_query_collection_pages(rest_api):
+    assert query_collection(rest_api, 'vms', ['name']) == rest_api.vms
+    assert [params['offset'] for params in rest_api.requests] == [0, 2, 4]
+    assert all(params['expand'] == 'resources' and params['attributes'] == 'name'
+               for params in rest_api.requests)
+
+
+def test_query_collection_cache(rest_api):
+    query_collection(rest_api, 'vms', ['name'])
+    query_collection(rest_api, 'vms', ['name'])
+    assert len(rest_api.requests) == 3
+    query_collection(rest_api, 'vms', ['name'], refresh=True)
+    assert len(rest_api.requests) == 6
+
+
+def test_index_resources(rest_api):
+    index = index_resources(query_collection(rest_api, 'vms', ['name']), 'name')
+    assert {name: vm['id'] for name, vm in index.items()} == {'vm0': '0', 'vm1': '1', 'vm2': '2'}
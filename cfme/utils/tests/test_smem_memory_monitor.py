@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from datetime import datetime
+from threading import Thread
+
+import pytest
+
+from cfme.utils import smem_memory_monitor
+from cfme.utils.smem_memory_monitor import (
+    APPLIANCE_MEASUREMENTS, PROCESS_MEASUREMENTS, MemoryFrame, MemorySamples, SmemMemoryMonitor,
+    compile_per_process_results, process_name, render_graphs)
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+MEMINFO = {'MemTotal': 8192.0, 'MemFree': 1024.0, 'MemAvailable': 4096.0, 'Buffers': 512.0,
+    'Cached': 2048.0, 'Slab': 1024.0, 'SwapTotal': 2048.0, 'SwapFree': 2048.0}
+
+
+def collector_sample(worker_rss):
+    return {
+        'mem': MEMINFO,
+        'workers': {'100': 'MiqGenericWorker', '102': 'MiqUiWorker'},
+        'procs': [
+            ['100', worker_rss, 1024.0, 1024.0, 4096.0, 0.0, 'ruby', 'MIQ: MiqGenericWorker'],
+            ['101', 1024.0, 1024.0, 1024.0, 4096.0, 0.0, 'ruby', 'MIQ Server'],
+            ['200', 1024.0, 1024.0, 1024.0, 4096.0, 0.0, 'postmaster', ''],
+            ['300', 1024.0, 1024.0, 1024.0, 4096.0, 0.0, 'sshd', ''],
+        ],
+    }
+
+
+@pytest.mark.parametrize(('name', 'cmd', 'expected'), [
+    ('postmaster', '', 'postgres'),
+    ('ruby', 'MIQ Server', 'MIQ Server (evm_server.rb)'),
+    ('ruby', 'irb', None),
+    ('sshd', '', None),
+])
+def test_process_name(name, cmd, expected):
+    assert process_name(name, cmd) == expected
+
+
+def test_collector_samples_to_frame():
+    monitor = SmemMemoryMonitor(None, {}, batched=True, sample_interval=0.5)
+    samples = MemorySamples(capacity=1)
+    monitor.add_collector_sample(samples, 1500000000.0, collector_sample(2048.0))
+    monitor.add_collector_sample(samples, 1500000000.5, collector_sample(4096.0))
+    assert len(samples) == 2
+    assert monitor.use_slab
+
+    frame = samples.to_frame()
+    assert len(frame.dates) == 2
+    assert frame.appliance.shape == (2, len(APPLIANCE_MEASUREMENTS))
+    assert frame.first('used') == 4.0
+
+    assert list(frame.processes) == ['MiqGenericWorker', 'MIQ Server (evm_server.rb)',
+        'postgres']
+    worker = frame.processes['MiqGenericWorker']['100']
+    assert worker.dates == frame.dates
+    assert worker['rss'].tolist() == [2.0, 4.0]
+    assert (worker.first('rss'), worker.last('rss')) == (2.0, 4.0)
+
+
+def test_frame_from_results():
+    start, end = datetime(2018, 1, 1, 10), datetime(2018, 1, 1, 11)
+    appliance_results = OrderedDict(
+        (ts, dict.fromkeys(APPLIANCE_MEASUREMENTS, 1.0)) for ts in (start, end))
+    process_results = OrderedDict([('MiqGenericWorker', OrderedDict([
+        ('100', OrderedDict([(start, dict.fromkeys(PROCESS_MEASUREMENTS, 1.0))])),
+        ('101', OrderedDict((ts, dict.fromkeys(PROCESS_MEASUREMENTS, 2.0))
+                            for ts in (start, end))),
+    ]))])
+    frame = MemoryFrame.from_results(appliance_results, process_results)
+    assert frame.dates == [start, end]
+    assert frame.process_count == 2
+    assert frame.processes['MiqGenericWorker']['101'].at(end).tolist() == [2.0] * 5
+    assert frame.processes['MiqGenericWorker']['100'].at(end) is None
+
+    alive, recycled, totals = compile_per_process_results(['MiqGenericWorker', 'httpd'], frame)
+    assert (alive, recycled) == (1, 1)
+    assert totals == [2.0] * len(PROCESS_MEASUREMENTS)
+
+
+def test_monitor_config(monkeypatch):
+    monkeypatch.setattr(smem_memory_monitor, 'cfme_performance',
+        {'tools': {'smem': {'batched': True, 'sample_interval': 2}}})
+    monitor = SmemMemoryMonitor(None, {})
+    assert (monitor.batched, monitor.sample_interval) == (True, 2)
+    monitor = SmemMemoryMonitor(None, {}, batched=False)
+    assert not monitor.batched
+    monkeypatch.setattr(smem_memory_monitor, 'cfme_performance', {})
+    monitor = SmemMemoryMonitor(None, {})
+    assert not monitor.batched
+    assert monitor.sample_interval == smem_memory_monitor.SAMPLE_INTERVAL
+
+
+def test_render_graphs_in_thread(monkeypatch):
+    def no_pool(processes):
+        raise AssertionError('Forked from a thread')
+
+    monkeypatch.setattr(smem_memory_monitor.multiprocessing, 'Pool', no_pool)
+    rendered = []
+    thread = Thread(target=render_graphs, args=([(rendered.append, (i,)) for i in range(3)], 2))
+    thread.start()
+    thread.join()
+    assert rendered == [0, 1, 2]
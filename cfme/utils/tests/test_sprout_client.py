@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from cfme.test_framework.sprout.client import SproutClient, SproutException
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+class Response(object):
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class Session(object):
+    """Answers the queued statuses first, then the calls like Sprout would"""
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.posts = []
+
+    def respond(self, call):
+        if call['method'] == 'fail':
+            return {'status': 'exception', 'result': {'class': 'Exception', 'message': 'failed'}}
+        return {'status': 'success', 'result': call['args']}
+
+    def post(self, url, data):
+        data = json.loads(data)
+        self.posts.append(data)
+        if self.statuses:
+            return Response(self.statuses.pop(0))
+        if isinstance(data, list):
+            return Response(200, [self.respond(call) for call in data])
+        return Response(200, self.respond(data))
+
+
+def test_sprout_client_batch():
+    session = Session()
+    client = SproutClient(session=session)
+    with client.batch():
+        first = client.call_method('check', 1)
+        failed = client.call_method('fail')
+        second = client.check(2)
+        assert not first.done
+    assert len(session.posts) == 1
+    assert first.result == [1]
+    assert second.result == [2]
+    with pytest.raises(SproutException):
+        failed.result
+    assert client.call_method('check', 3) == [3]
+
+
+def test_sprout_client_retry(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr('time.sleep', sleeps.append)
+    client = SproutClient(session=Session([503, 502, 503]))
+    assert client.call_method('check', 1) == [1]
+    # Random delays, each limited by a bound that doubles
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= SproutClient.RETRY_DELAY * 2 ** i for i, delay in enumerate(sleeps))
@@ -0,0 +1,65 @@
+import pytest
+from widgetastic.widget import View
+
+from widgetastic_manageiq import SummaryForm, SummaryTable, Table
+
+
+class SummaryPage(View):
+    basic_information = SummaryForm('Basic Information')
+    properties = SummaryTable('Properties')
+    smart_management = SummaryTable('Smart Management')
+    vms = Table('//table[@id="list"]')
+    vms_by_name = Table('//table[@id="list"]', assoc_column='Name')
+
+
+@pytest.fixture(scope='module')
+def view(browser, datafile, appliance):
+    selenium = appliance.browser.widgetastic.selenium
+    test_page_html = datafile('/utils/test_widget_bulk_read/summary.html').read()
+    selenium.get('data:text/html;base64,{}'.format(test_page_html.encode('base64')))
+    return appliance.browser.widgetastic.create_view(SummaryPage)
+
+
+@pytest.fixture
+def round_trips(appliance, monkeypatch):
+    """Counts the commands sent to the selenium server"""
+    selenium = appliance.browser.widgetastic.selenium
+    counter = {'count': 0}
+    execute = selenium.execute
+
+    def counting_execute(*args, **kwargs):
+        counter['count'] += 1
+        return execute(*args, **kwargs)
+
+    monkeypatch.setattr(selenium, 'execute', counting_execute)
+    return counter
+
+
+@pytest.mark.parametrize('widget', ['basic_information', 'properties', 'smart_management'])
+def test_summary_bulk_read(view, widget, round_trips):
+    widget = getattr(view, widget)
+    by_elements = widget._read_elements()
+    element_round_trips = round_trips['count']
+    round_trips['count'] = 0
+    assert widget.read() == by_elements
+    assert round_trips['count'] < element_round_trips
+
+
+def test_summary_form_bulk_read_values(view):
+    assert view.basic_information.read() == {
+        'Name': 'test_vm',
+        'Description': 'A test virtual machine',
+        'Tags': ['Department: Engineering', 'Environment: Test'],
+    }
+
+
+@pytest.mark.parametrize('widget', ['vms', 'vms_by_name'])
+def test_table_bulk_read(view, widget, round_trips):
+    widget = getattr(view, widget)
+    # Populates the cached headers for both reads alike
+    widget.headers
+    by_rows = widget._read_elements()
+    row_round_trips = round_trips['count']
+    round_trips['count'] = 0
+    assert widget.read() == by_rows
+    assert round_trips['count'] < row_round_trips
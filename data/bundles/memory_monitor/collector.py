@@ -0,0 +1,73 @@
+"""Samples the memory of a CFME/Miq appliance and its processes, one JSON line per interval.
+
+Uploaded to and run on the appliance by ``cfme.utils.smem_memory_monitor``, so it has to stick to
+the standard library of whichever python the appliance ships.
+
+Usage: collector.py <interval in seconds> <miq_server_id>
+
+Every line is an object with:
+    mem: the /proc/meminfo values the monitor uses, in kB
+    workers: {pid: worker type} of the server's miq_workers
+    procs: [[pid, rss, pss, uss, vss, swap, name, cmd], ...] from smem (memory in kB, cmd is only
+        sent for ruby processes as it is only needed to tell those apart)
+"""
+import json
+import subprocess
+import sys
+import time
+
+SMEM_COMMAND = ['smem', '-c', 'pid rss pss uss vss swap name command']
+MEMINFO_KEYS = {'MemTotal', 'MemFree', 'MemAvailable', 'Buffers', 'Cached', 'Slab', 'SwapTotal',
+    'SwapFree'}
+
+
+def meminfo():
+    values = {}
+    with open('/proc/meminfo') as f:
+        for line in f:
+            key, value = line.split(':', 1)
+            if key in MEMINFO_KEYS:
+                values[key] = float(value.split()[0])
+    return values
+
+
+def workers(miq_server_id):
+    output = subprocess.Popen(
+        ['psql', '-t', '-q', '-d', 'vmdb_production', '-c',
+         "select pid,type from miq_workers where miq_server_id = '{}'".format(miq_server_id)],
+        stdout=subprocess.PIPE).communicate()[0]
+    result = {}
+    for line in output.decode('utf-8', 'replace').splitlines():
+        pid_worker = [value.strip() for value in line.split('|')]
+        if len(pid_worker) == 2 and pid_worker[0]:
+            result[pid_worker[0]] = pid_worker[1]
+    return result
+
+
+def processes():
+    output = subprocess.Popen(SMEM_COMMAND, stdout=subprocess.PIPE).communicate()[0]
+    result = []
+    for line in output.decode('utf-8', 'replace').splitlines()[1:]:
+        values = line.split()
+        if len(values) < 7 or not values[0].isdigit():
+            continue
+        cmd = ' '.join(values[7:]) if values[6] == 'ruby' else ''
+        result.append([values[0]] + [float(value) for value in values[1:6]] + [values[6], cmd])
+    return result
+
+
+def main(interval, miq_server_id):
+    while True:
+        start = time.time()
+        sample = {'mem': meminfo(), 'workers': workers(miq_server_id), 'procs': processes()}
+        sys.stdout.write(json.dumps(sample, separators=(',', ':')) + '\n')
+        # Fails once the monitor closes the channel, which ends the collector
+        sys.stdout.flush()
+        time.sleep(max(0, interval - (time.time() - start)))
+
+
+if __name__ == '__main__':
+    try:
+        main(float(sys.argv[1]), sys.argv[2])
+    except (IOError, KeyboardInterrupt):
+        pass
@@ -9,6 +9,8 @@
         server_address: 127.0.0.1
         server_port: 21212
         server_enabled: True
+        log_batch_size: 500
+        log_flush_interval: 1.0
         plugins:
 
 ``log_dir`` is the destination for all artifacts
@@ -18,6 +20,11 @@
 ``reuse_dir`` if this is False and Artifactor comes across a dir that has
 already been used, it will die
 
+``log_batch_size`` if set, log records of the ``cfme`` logger are queued and sent to the
+artifactor in batches of this size by a background thread instead of one hook call per record
+
+``log_flush_interval`` the maximum number of seconds a queued log record waits before it is sent,
+only used together with ``log_batch_size``
 
 """
 import atexit
@@ -135,6 +142,11 @@ def pytest_configure(config):
     artifactor_handler.artifactor = art_client
     if store.slave_manager:
         artifactor_handler.slaveid = store.slaveid
+    art_config = env.get('artifactor', {})
+    if art_client and art_config.get('log_batch_size'):
+        artifactor_handler.set_buffered(
+            batch_size=art_config['log_batch_size'],
+            flush_interval=art_config.get('log_flush_interval'))
     config._art_client = art_client
 
 
@@ -153,6 +165,10 @@ def fire_art_hook(config, hook, **hook_args):
 
 def fire_art_test_hook(node, hook, **hook_args):
     name, location = get_test_idents(node)
+    if hook in ('start_test', 'finish_test'):
+        # queued log records have to reach the logger plugin before the test boundary moves
+        from cfme.utils.log import artifactor_handler
+        artifactor_handler.flush()
     fire_art_hook(
         node.config, hook,
         test_name=name,
@@ -288,6 +304,8 @@ def pytest_runtest_logreport(report):
 @pytest.mark.hookwrapper
 def pytest_unconfigure(config):
     yield
+    from cfme.utils.log import artifactor_handler
+    artifactor_handler.close()
     shutdown(config)
 
 
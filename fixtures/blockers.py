@@ -65,7 +65,7 @@ def pytest_addoption(parser):
 
 @pytest.mark.trylast
 def pytest_collection_modifyitems(session, config, items):
-    if not config.getvalue("list_blockers"):
+    if not config.getvalue("list_blockers") or store.parallelizer_role == 'slave':
         return
     store.terminalreporter.write("Loading blockers ...\n", bold=True)
     blocking = set([])
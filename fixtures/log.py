@@ -24,6 +24,9 @@ def pytest_runtest_setup(item):
 
 
 def pytest_collection_modifyitems(session, config, items):
+    if pytest.store.parallelizer_role == 'slave':
+        # Slaves collect module by module while running the tests
+        return
     logger().info(log.format_marker('Starting new test run', mark="="))
     expression = config.getvalue('keyword') or False
     expr_string = ', will filter with "{}"'.format(expression) if expression else ''
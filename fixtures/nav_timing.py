@@ -0,0 +1,73 @@
+"""Navigation timing report and destination URL shortcuts
+
+``py.test --nav-timing`` records how long every UI navigation step took, see
+:py:mod:`cfme.utils.nav_timing`. At the end of the run the slowest navigation chains and the tests
+spending most time navigating are shown, all records are written to ``log/nav_timing.json``.
+Parallelizer slaves write ``log/nav_timing-<slaveid>.json``, which the master merges into the
+report.
+
+``py.test --nav-shortcuts`` lets navigations open the URL a destination was found at before
+instead of navigating through its prerequisites, as long as the destination view validates there.
+"""
+import json
+
+import pytest
+
+from cfme.utils.nav_timing import profiler
+from cfme.utils.path import log_path
+from fixtures.pytest_store import store
+
+REPORT_FILE = 'nav_timing.json'
+SLAVE_REPORT_FILES = 'nav_timing-*.json'
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('cfme')
+    group.addoption('--nav-timing', action='store_true', default=False, dest='nav_timing',
+        help='Report the slowest UI navigation chains at the end of the run')
+    group.addoption('--nav-timing-count', type=int, default=10, dest='nav_timing_count',
+        help='Number of chains and tests shown in the navigation timing report')
+    group.addoption('--nav-shortcuts', action='store_true', default=False, dest='nav_shortcuts',
+        help='Open the remembered URL of a navigation destination instead of navigating to it')
+
+
+def pytest_configure(config):
+    profiler.enabled = config.getoption('nav_timing')
+    if config.getoption('nav_shortcuts'):
+        from cfme.utils.appliance.implementations.ui import destination_cache
+        destination_cache.enabled = True
+    if profiler.enabled and store.parallelizer_role != 'slave':
+        # Clean out the records of the previous run
+        for path in log_path.listdir(SLAVE_REPORT_FILES) + [log_path.join(REPORT_FILE)]:
+            path.remove(ignore_errors=True)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    profiler.test = item.nodeid
+    yield
+    profiler.test = None
+
+
+# Before the slave manager tells the master it is done
+@pytest.hookimpl(tryfirst=True)
+def pytest_sessionfinish(session, exitstatus):
+    if not profiler.enabled:
+        return
+    if store.parallelizer_role == 'slave':
+        report_file = log_path.join('nav_timing-{}.json'.format(store.slaveid))
+    else:
+        for path in log_path.listdir(SLAVE_REPORT_FILES):
+            with path.open() as f:
+                profiler.merge(json.load(f))
+        report_file = log_path.join(REPORT_FILE)
+    with report_file.open('w') as f:
+        json.dump(profiler.to_dict(), f)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not profiler.enabled or store.parallelizer_role == 'slave':
+        return
+    terminalreporter.write_sep('-', 'navigation timing')
+    for line in profiler.report(terminalreporter.config.getoption('nav_timing_count')):
+        terminalreporter.write_line(line)
@@ -23,6 +23,10 @@ def get_meta(obj):
 
 
 def pytest_collection_modifyitems(items):
+    from fixtures.pytest_store import store
+    if store.parallelizer_role == 'slave':
+        # The master writes the docs data of the whole collection
+        return
     output = {}
     for item in items:
         item_class = item.location[0]
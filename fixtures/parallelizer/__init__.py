@@ -7,11 +7,11 @@ The Workflow
 - py.test config.option.appliances and the related --appliance cmdline flag are used to count
   the number of needed slaves
 - Slaves are started
-- Master runs collection, blocks until slaves report their collections
-- Slaves each run collection and submit them to the master, then block inside their runtest loop,
-  waiting for tests to run
-- Master diffs slave collections against its own; the test ids are verified to match
-  across all nodes
+- Master runs collection and writes it to a collection manifest, grouped by test module
+- Slaves skip the upfront collection, report the hash of the manifest they read to the master,
+  then block inside their runtest loop, waiting for tests to run
+- Slaves collect a test module when they first receive tests from it, and verify it against the
+  manifest's hash for that module; the master diffs the module only if the hashes don't match
 - Master enters main runtest loop, uses a generator to build lists of test groups which are then
   sent to slaves, one group at a time
 - For each phase of each test, the slave serializes test reports, which are then unserialized on
@@ -26,15 +26,11 @@ The Workflow
   shut down
 
 """
-from itertools import groupby
-
-
 import difflib
-import json
 import os
 import signal
 import subprocess
-from collections import defaultdict, deque, namedtuple
+from collections import deque, namedtuple
 from datetime import datetime
 from itertools import count
 
@@ -48,7 +44,11 @@ import zmq
 from _pytest import runner
 
 from fixtures import terminalreporter
-from fixtures.parallelizer import remote
+from fixtures.parallelizer import protocol, remote
+from fixtures.parallelizer.manifest import write_manifest
+from fixtures.parallelizer.scheduler import (
+    DurationStore, ProviderScheduler, TestGroup, balance_groups, modscope_groups,
+    provider_of_tests)
 from fixtures.pytest_store import store
 from cfme.utils import at_exit, conf
 from cfme.utils.log import create_sublogger
@@ -112,10 +112,15 @@ class SlaveDetail(object):
     process = attr.ib(default=None, repr=False)
 
     provider_allocation = attr.ib(default=attr.Factory(list), repr=False)
+    # sequence number of the last event received from the slave process
+    seq = attr.ib(default=-1, init=False, repr=False)
+    # retiring slaves get no more tests, they shut down after their current group
+    retiring = attr.ib(default=False, init=False)
 
     def start(self):
         if self.forbid_restart:
             return
+        self.seq = -1
         devnull = open(os.devnull, 'w')
         # worker output redirected to null; useful info comes via messages and logs
         self.process = subprocess.Popen(
@@ -145,15 +150,21 @@ class ParallelSession(object):
         self.slaves = {}
         self.test_groups = self._test_item_generator()
 
-        self._pool = []
+        self.scheduler = None
+        self.durations = DurationStore.load(config.cache)
         from cfme.utils.conf import cfme_data
         self.provs = sorted(set(cfme_data['management_systems'].keys()),
                             key=len, reverse=True)
-        self.used_prov = set()
 
         self.failed_slave_test_groups = deque()
         self.slave_spawn_count = 0
-        self.appliances = appliances
+        self.appliances = list(appliances)
+        # set by plugins in pytest_parallel_configured to replace the appliances of dead slaves
+        self.replacement_policy = None
+
+        self.manifest = None
+        self.manifest_path = config.cache.makedir('parallelize').join(
+            'manifest-{}.json'.format(os.getpid()))
 
         # set up the ipc socket
 
@@ -163,6 +174,12 @@ class ParallelSession(object):
         self.sock = ctx.socket(zmq.ROUTER)
         self.sock.bind(zmq_endpoint)
 
+        # and the control socket, to add and retire appliances while the tests run
+        self.control_endpoint = 'ipc://{}'.format(
+            config.cache.makedir('parallelize').join('{}-control'.format(os.getpid())))
+        self.control_sock = ctx.socket(zmq.REP)
+        self.control_sock.bind(self.control_endpoint)
+
         # clean out old slave config if it exists
         slave_config = conf_path.join('slave_config.yaml')
         slave_config.check() and slave_config.remove()
@@ -175,6 +192,7 @@ class ParallelSession(object):
                 use_sprout=False,   # Slaves don't use sprout
             ),
             'zmq_endpoint': zmq_endpoint,
+            'collection_manifest': self.manifest_path.strpath,
         }
         if hasattr(self, "slave_appliances_data"):
             conf.runtime['slave_config']["appliance_data"] = self.slave_appliances_data
@@ -189,9 +207,7 @@ class ParallelSession(object):
                 slave, green=True)
 
     def _slave_audit(self):
-        # XXX: There is currently no mechanism to add or remove slave_urls, short of
-        #      firing up the debugger and doing it manually. This is making room for
-        #      planned future abilities to dynamically add and remove slaves via automation
+        # slaves can be added and retired through the control socket, see handle_control
 
         # check for unexpected slave shutdowns and redistribute tests
         for slave in self.slaves.values():
@@ -219,6 +235,11 @@ class ParallelSession(object):
                     self.config.hook.pytest_miq_node_shutdown(
                         config=self.config, nodeinfo=slave.appliance.url)
                     del self.slaves[slave.id]
+                    if self.scheduler is not None:
+                        # let another slave pick up the provider it was working on
+                        self.scheduler.release(slave.id)
+                    if self.replacement_policy is not None and self.tests_left:
+                        self.replacement_policy.slave_died(slave)
                 else:
                     # no hook call here, a future audit will handle the fallout
                     self.print_message(
@@ -229,29 +250,114 @@ class ParallelSession(object):
                     slave.start()
                     self.slave_spawn_count += 1
 
+        if self.replacement_policy is not None:
+            replacements = self.replacement_policy.poll()
+            if replacements:
+                self.add_appliances(replacements)
+
+    @property
+    def tests_left(self):
+        """Whether there are tests which haven't been sent to a slave yet"""
+        return bool(self.failed_slave_test_groups or self.scheduler is None or self.scheduler)
+
+    def add_appliances(self, appliances_args):
+        """Start slaves on more appliances, given like the ``--appliance`` parameters
+
+        Returns:
+            list of the new :py:class:`SlaveDetail`
+        """
+        from cfme.test_framework.appliance import appliances_from_cli
+        slaves = []
+        for appliance in appliances_from_cli(appliances_args):
+            slave = SlaveDetail(appliance=appliance)
+            self.slaves[slave.id] = slave
+            self.appliances.append(appliance)
+            self.print_message("using appliance {}".format(appliance.url), slave, green=True)
+            slave.start()
+            slaves.append(slave)
+        return slaves
+
+    def retire(self, slave):
+        """Let a slave finish its current tests, then shut it down and release its appliance"""
+        slave.retiring = True
+        if self.scheduler is not None:
+            self.scheduler.release(slave.id)
+        self.print_message('retiring after the current tests', slave, yellow=True)
+
+    def handle_control(self):
+        """Answer a request on the control socket, if there is one
+
+        Requests are JSON objects with a ``command``:
+
+        - ``add``: start a slave on the appliance at ``url``
+        - ``retire``: drain and shut down the ``slave``, given by its id or appliance url
+        - ``status``: list the slaves and what's left to do
+
+        """
+        if not self.control_sock.poll(0):
+            return
+        request = self.control_sock.recv_json()
+        try:
+            reply = self._control(request)
+        except Exception as e:
+            self.log.exception('control request {!r} failed'.format(request))
+            reply = {'error': str(e)}
+        self.control_sock.send_json(reply)
+
+    def _control(self, request):
+        command = request.get('command')
+        if command == 'add':
+            slaves = self.add_appliances([{'hostname': request['url']}])
+            return {'slaves': [slave.id for slave in slaves]}
+        elif command == 'retire':
+            slaves = [slave for slave in self.slaves.values()
+                      if request['slave'] in (slave.id, slave.appliance.url)]
+            if not slaves:
+                return {'error': 'no slave {}'.format(request['slave'])}
+            for slave in slaves:
+                self.retire(slave)
+            return {'slaves': [slave.id for slave in slaves]}
+        elif command == 'status':
+            return {
+                'slaves': [{
+                    'id': slave.id,
+                    'url': slave.appliance.url,
+                    'provider': slave.provider_allocation[0] if slave.provider_allocation else None,
+                    'tests': len(slave.tests),
+                    'retiring': slave.retiring,
+                } for slave in sorted(self.slaves.values(), key=lambda slave: slave.id)],
+                'groups_left': len(self.scheduler) if self.scheduler is not None else None,
+                'redistributed_groups': len(self.failed_slave_test_groups),
+                'pending_replacements': getattr(self.replacement_policy, 'pending', 0),
+            }
+        return {'error': 'unknown command {!r}'.format(command)}
+
     def send(self, slave, event_data):
         """Send data to slave.
 
         ``event_data`` will be serialized as JSON, and so must be JSON serializable
 
         """
-        event_json = json.dumps(event_data)
-        self.sock.send_multipart([slave.id, '', event_json])
+        protocol.send_reply(self.sock, slave.id, event_data)
 
     def recv(self):
-        # poll the zmq socket, populate the recv queue deque with responses
-
-        events = zmq.zmq_poll([(self.sock, zmq.POLLIN)], 50)
-        if not events:
-            return None, None, None
-        slaveid, _, event_json = self.sock.recv_multipart(flags=zmq.NOBLOCK)
-        event_data = json.loads(event_json)
-        event_name = event_data.pop('_event_name')
-        if slaveid not in self.slaves:
-            self.log.error("message from terminated worker %s %s %s",
-                           slaveid, event_name, event_data)
-            return None, None, None
-        return self.slaves[slaveid], event_data, event_name
+        """Receive all pending slave events, waiting a moment for the first one
+
+        Yields:
+            ``(slave, event_data, event_name)`` for every event of a running slave
+
+        """
+        for slaveid, event_name, seq, event_data in protocol.recv_events(self.sock):
+            if slaveid not in self.slaves:
+                self.log.error("message from terminated worker %s %s %s",
+                               slaveid, event_name, event_data)
+                continue
+            slave = self.slaves[slaveid]
+            if seq != slave.seq + 1:
+                self.log.warning("%s event %s arrived as #%s, expected #%s",
+                                 slaveid, event_name, seq, slave.seq + 1)
+            slave.seq = seq
+            yield slave, event_data, event_name
 
     def print_message(self, message, prefix='master', **markup):
         """Print a message from a node to the py.test console
@@ -342,10 +448,13 @@ class ParallelSession(object):
 
     def send_tests(self, slave):
         """Send a slave a group of tests"""
-        try:
-            tests = list(self.failed_slave_test_groups.popleft())
-        except IndexError:
-            tests = self.get(slave)
+        if slave.retiring:
+            tests = []
+        else:
+            try:
+                tests = list(self.failed_slave_test_groups.popleft())
+            except IndexError:
+                tests = self.get(slave)
         self.send(slave, tests)
         slave.tests.update(tests)
         collect_len = len(self.collection)
@@ -375,6 +484,59 @@ class ParallelSession(object):
         self.config.pluginmanager.register(self.trdist, "terminaldistreporter")
         self.session = session
 
+    def handle_event(self, slave, event_data, event_name):
+        """Handle an event sent by a slave
+
+        Only ``need_tests`` and ``shutdown`` are requests the slave waits on, everything else is
+        fire-and-forget and must not be replied to.
+
+        """
+        if event_name == 'message':
+            message = event_data.pop('message')
+            markup = event_data.pop('markup')
+            self.print_message(message, slave, **markup)
+        elif event_name == 'collectionfinish':
+            # slaves collect lazily, they only confirm they got the current manifest
+            if event_data['manifest_hash'] != self.manifest['hash']:
+                self.print_message(
+                    'collection manifest differs, respawning', slave.id, purple=True)
+                self.kill(slave)
+                slave.start()
+        elif event_name == 'collectiondiff':
+            # the slave waits for a reply that never comes, it is killed instead
+            module = event_data['module']
+            diff_err = report_collection_diff(
+                slave.id, self.manifest['modules'][module]['node_ids'], event_data['node_ids'])
+            self.print_message(
+                'collection of {} differs, respawning'.format(module), slave.id, purple=True)
+            self.print_message(diff_err, purple=True)
+            self.log.error('{}'.format(diff_err))
+            self.kill(slave)
+            slave.start()
+        elif event_name == 'need_tests':
+            self.send_tests(slave)
+            self.log.info('starting master test distribution')
+        elif event_name == 'runtest_logstart':
+            self.trdist.runtest_logstart(
+                slave.id,
+                event_data['nodeid'],
+                event_data['location'])
+        elif event_name == 'runtest_logreport':
+            report = unserialize_report(event_data['report'])
+            if report.when in ('call', 'teardown'):
+                slave.tests.discard(report.nodeid)
+            self.durations.record(report)
+            self.trdist.runtest_logreport(slave.id, report)
+        elif event_name == 'internalerror':
+            self.print_message(event_data['message'], slave, purple=True)
+            self.kill(slave)
+        elif event_name == 'shutdown':
+            self.config.hook.pytest_miq_node_shutdown(
+                config=self.config, nodeinfo=slave.appliance.url)
+            self.ack(slave, event_name)
+            del self.slaves[slave.id]
+            self.monitor_shutdown(slave)
+
     def pytest_runtestloop(self):
         """pytest runtest loop
 
@@ -388,6 +550,7 @@ class ParallelSession(object):
         """
         # Build master collection for slave diffing and distribution
         self.collection = [item.nodeid for item in self.session.items]
+        self.manifest = write_manifest(self.manifest_path, self.collection)
 
         # Fire up the workers after master collection is complete
         # master and the first slave share an appliance, this is a workaround to prevent a slave
@@ -396,8 +559,10 @@ class ParallelSession(object):
             slave.start()
 
         try:
-            self.print_message("Waiting for {} slave collections".format(len(self.slaves)),
+            self.print_message(
+                "Waiting for {} slaves to read the collection manifest".format(len(self.slaves)),
                 red=True)
+            self.print_message("Control socket at {}".format(self.control_endpoint))
 
             # Turn off the terminal reporter to suppress the builtin logstart printing
             terminalreporter.disable()
@@ -405,8 +570,10 @@ class ParallelSession(object):
             while True:
                 # spawn/kill/replace slaves if needed
                 self._slave_audit()
+                self.handle_control()
 
-                if not self.slaves:
+                replacing = self.replacement_policy is not None and self.replacement_policy.pending
+                if not self.slaves and not (replacing and self.tests_left):
                     # All slaves are killed or errored, we're done with tests
                     self.print_message('all slaves have exited', yellow=True)
                     self.session_finished = True
@@ -414,54 +581,8 @@ class ParallelSession(object):
                 if self.session_finished:
                     break
 
-                slave, event_data, event_name = self.recv()
-                if event_name == 'message':
-                    message = event_data.pop('message')
-                    markup = event_data.pop('markup')
-                    # messages are special, handle them immediately
-                    self.print_message(message, slave, **markup)
-                    self.ack(slave, event_name)
-                elif event_name == 'collectionfinish':
-                    slave_collection = event_data['node_ids']
-                    # compare slave collection to the master, all test ids must be the same
-                    self.log.debug('diffing {} collection'.format(slave.id))
-                    diff_err = report_collection_diff(
-                        slave.id, self.collection, slave_collection)
-                    if diff_err:
-                        self.print_message(
-                            'collection differs, respawning', slave.id,
-                            purple=True)
-                        self.print_message(diff_err, purple=True)
-                        self.log.error('{}'.format(diff_err))
-                        self.kill(slave)
-                        slave.start()
-                    else:
-                        self.ack(slave, event_name)
-                elif event_name == 'need_tests':
-                    self.send_tests(slave)
-                    self.log.info('starting master test distribution')
-                elif event_name == 'runtest_logstart':
-                    self.ack(slave, event_name)
-                    self.trdist.runtest_logstart(
-                        slave.id,
-                        event_data['nodeid'],
-                        event_data['location'])
-                elif event_name == 'runtest_logreport':
-                    self.ack(slave, event_name)
-                    report = unserialize_report(event_data['report'])
-                    if report.when in ('call', 'teardown'):
-                        slave.tests.discard(report.nodeid)
-                    self.trdist.runtest_logreport(slave.id, report)
-                elif event_name == 'internalerror':
-                    self.ack(slave, event_name)
-                    self.print_message(event_data['message'], slave, purple=True)
-                    self.kill(slave)
-                elif event_name == 'shutdown':
-                    self.config.hook.pytest_miq_node_shutdown(
-                        config=self.config, nodeinfo=slave.appliance.url)
-                    self.ack(slave, event_name)
-                    del self.slaves[slave.id]
-                    self.monitor_shutdown(slave)
+                for slave, event_data, event_name in self.recv():
+                    self.handle_event(slave, event_data, event_name)
 
                 # total slave spawn count * 3, to allow for each slave's initial spawn
                 # and then each slave (on average) can fail two times
@@ -477,6 +598,7 @@ class ParallelSession(object):
             raise
         finally:
             terminalreporter.enable()
+            self.durations.save(self.config.cache)
 
         # Suppress other runtestloop calls
         return True
@@ -491,97 +613,35 @@ class ParallelSession(object):
         sent_tests = 0
         collection_len = len(self.collection)
 
-        def get_fspart(nodeid):
-            return nodeid.split('::')[0]
-
-        for fspath, gen_moditems in groupby(self.collection, key=get_fspart):
-            for tests in self._modscope_id_splitter(gen_moditems):
-                sent_tests += len(tests)
-                self.log.info('{} tests remaining to send'.format(
-                    collection_len - sent_tests))
-                yield list(tests)
-
-    def _modscope_id_splitter(self, module_items):
-        # given a list of item ids from one test module, break up tests into groups with the same id
-        parametrized_ids = defaultdict(list)
-        for item in module_items:
-            if '[' in item:
-                # split on the leftmost bracket, then strip everything after the rightmight bracket
-                # so 'test_module.py::test_name[parametrized_id]' becomes 'parametrized_id'
-                parametrized_id = item.split('[')[1].rstrip(']')
-            else:
-                # splits failed, item has no parametrized id
-                parametrized_id = 'no params'
-            parametrized_ids[parametrized_id].append(item)
-
-        for id, tests in parametrized_ids.items():
-            if tests:
-                self.log.info('sent tests with param {} {!r}'.format(id, tests))
-                yield tests
+        for tests in modscope_groups(self.collection):
+            sent_tests += len(tests)
+            self.log.info('{} tests remaining to send'.format(
+                collection_len - sent_tests))
+            yield tests
 
     def get(self, slave):
-
-        def provs_of_tests(test_group):
-            found = set()
-            for test in test_group:
-                found.update(pv for pv in self.provs
-                             if '[' in test and pv in test)
-            return sorted(found)
-
-        if not self._pool:
-            for test_group in self.test_groups:
-                self._pool.append(test_group)
-                self.used_prov.update(provs_of_tests(test_group))
-            if self.used_prov:
-                self.ratio = float(len(self.slaves)) / len(self.used_prov)
-            else:
-                self.ratio = 0.0
-        if not self._pool:
+        """Get the next group of tests for a slave, ``[]`` if there are none left"""
+        if self.scheduler is None:
+            groups = (
+                TestGroup(tests, provider_of_tests(tests, self.provs), self.durations.cost(tests))
+                for tests in self.test_groups)
+            self.scheduler = ProviderScheduler(balance_groups(groups, self.durations))
+
+        current = slave.provider_allocation[0] if slave.provider_allocation else None
+        group, provider = self.scheduler.next_group(slave.id, current)
+        if group is None:
             return []
-        appliance_num_limit = 1
-        for idx, test_group in enumerate(self._pool):
-            provs = provs_of_tests(test_group)
-            if provs:
-                prov = provs[0]
-                if prov in slave.provider_allocation:
-                    # provider is already with the slave, so just return the tests
-                    self._pool.remove(test_group)
-                    return test_group
-                else:
-                    if len(slave.provider_allocation) >= appliance_num_limit:
-                        continue
-                    else:
-                        # Adding provider to slave since there are not too many
-                        slave.provider_allocation.append(prov)
-                        self._pool.remove(test_group)
-                        return test_group
-            else:
-                # No providers - ie, not a provider parametrized test
-                # or no params, so not parametrized at all
-                self._pool.remove(test_group)
-                return test_group
-
-        # Here means no tests were able to be sent
-        for test_group in self._pool:
-
-            provs = provs_of_tests(test_group)
-            if provs:
-                prov = provs[0]
-                # Already too many slaves with provider
-                app = slave.appliance
+        if provider != current:
+            if current is not None:
                 self.print_message(
-                    'cleansing appliance', slave, purple=True)
+                    'cleansing appliance for {}'.format(provider), slave, purple=True)
                 try:
-                    app.delete_all_providers()
+                    slave.appliance.delete_all_providers()
                 except Exception as e:
-                    self.print_message(
-                        'cloud not cleanse', slave, red=True)
-                    self.print_message('error:', e, red=True)
-            slave.provider_allocation = [prov]
-            self._pool.remove(test_group)
-            return test_group
-        assert not self._pool, self._pool
-        return []
+                    self.print_message('could not cleanse', slave, red=True)
+                    self.print_message('error: {}'.format(e), slave, red=True)
+            slave.provider_allocation = [provider]
+        return group.tests
 
 
 def report_collection_diff(slaveid, from_collection, to_collection):
@@ -0,0 +1,45 @@
+"""Collection manifest the parallelizer master shares with its slaves
+
+The master writes its collection to the manifest once, grouped by test module, before starting
+the slaves. Slaves then skip the upfront collection and collect a module only once they are sent
+tests from it, checking the module against the manifest by its hash. The hash of the whole
+collection is what slaves report back to prove they work from the same manifest.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+
+
+def module_of(nodeid):
+    """The test module part of a node id, which is what slaves collect on demand"""
+    return nodeid.split('::')[0]
+
+
+def collection_hash(node_ids):
+    """Order independent hash of a list of node ids"""
+    return hashlib.sha1(json.dumps(sorted(node_ids)).encode('ascii')).hexdigest()
+
+
+def build_manifest(collection):
+    modules = OrderedDict()
+    for nodeid in collection:
+        modules.setdefault(module_of(nodeid), []).append(nodeid)
+    return {
+        'hash': collection_hash(collection),
+        'modules': OrderedDict(
+            (module, {'hash': collection_hash(node_ids), 'node_ids': node_ids})
+            for module, node_ids in modules.items()),
+    }
+
+
+def write_manifest(path, collection):
+    """Writes the manifest of the master collection to ``path`` and returns it"""
+    manifest = build_manifest(collection)
+    with open(str(path), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def read_manifest(path):
+    with open(str(path)) as f:
+        return json.load(f)
@@ -0,0 +1,60 @@
+"""Messaging between the parallelizer master and its slaves
+
+The master binds a ROUTER socket, every slave connects a DEALER socket with its slave id as the
+identity. Frames are ``['', json]`` as seen from the slave, the master additionally gets the slave
+id in front.
+
+Slave events carry a per-slave sequence number in ``_seq`` and are fire-and-forget, so a slave
+never waits on the master's bookkeeping to carry on with its tests. Only requests (asking for the
+next tests, announcing the shutdown) block until the master replies. Since events are delivered
+in order, a reply also means that all events sent before the request have been received.
+"""
+import json
+
+import zmq
+
+#: How long the master waits for the first event of a loop iteration, in ms
+POLL_TIMEOUT = 50
+
+
+def slave_socket(endpoint, slaveid, context=None):
+    """Connects a slave's DEALER socket to the master"""
+    context = context or zmq.Context.instance()
+    sock = context.socket(zmq.DEALER)
+    sock.setsockopt_string(zmq.IDENTITY, u'{}'.format(slaveid))
+    sock.connect(endpoint)
+    return sock
+
+
+def send_event(sock, seq, name, data):
+    """Sends an event from a slave, ``data`` gets the event name and sequence number added"""
+    data['_event_name'] = name
+    data['_seq'] = seq
+    sock.send_multipart([b'', json.dumps(data).encode('utf-8')])
+
+
+def recv_reply(sock):
+    """Waits for the master's reply to a request"""
+    return json.loads(sock.recv_multipart()[-1])
+
+
+def send_reply(sock, slaveid, data):
+    """Sends a JSON serializable reply from the master to a slave"""
+    sock.send_multipart([slaveid, b'', json.dumps(data).encode('utf-8')])
+
+
+def recv_events(sock, timeout=POLL_TIMEOUT):
+    """Receives everything the slaves have sent, waiting ``timeout`` ms for the first event
+
+    Yields:
+        ``(slaveid, event_name, seq, event_data)`` until no more events are pending
+    """
+    if not sock.poll(timeout):
+        return
+    while True:
+        try:
+            slaveid, _, event_json = sock.recv_multipart(flags=zmq.NOBLOCK)
+        except zmq.Again:
+            return
+        event_data = json.loads(event_json)
+        yield slaveid, event_data.pop('_event_name'), event_data.pop('_seq'), event_data
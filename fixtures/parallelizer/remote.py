@@ -1,44 +1,49 @@
 import json
 import signal
+from itertools import count
 
-import zmq
 from py.path import local
 
 import cfme.utils
 from cfme.utils import log
 from cfme.utils.appliance import get_or_create_current_appliance
 from fixtures.log import _test_status, _format_nodeid
+from fixtures.parallelizer import protocol
+from fixtures.parallelizer.manifest import collection_hash, module_of, read_manifest
 
 SLAVEID = None
 
 
 class SlaveManager(object):
     """SlaveManager which coordinates with the master process for parallel testing"""
-    def __init__(self, config, slaveid, appliance_config, zmq_endpoint):
+    def __init__(self, config, slaveid, appliance_config, zmq_endpoint, manifest_path):
         self.config = config
         self.session = None
         self.collection = None
+        self.manifest_path = manifest_path
+        self.manifest = None
         self.slaveid = conf.runtime['env']['slaveid'] = slaveid
         self.appliance_config = conf.runtime['env']['appliances'][0] = appliance_config
         self.log = cfme.utils.log.logger
         conf.clear()
         # Override the logger in utils.log
 
-        ctx = zmq.Context.instance()
-        self.sock = ctx.socket(zmq.REQ)
-        self.sock.set_hwm(1)
-        self.sock.setsockopt_string(zmq.IDENTITY, u'{}'.format(self.slaveid))
-        self.sock.connect(zmq_endpoint)
+        self.sock = protocol.slave_socket(zmq_endpoint, self.slaveid)
+        self.seq = count()
 
         self.messages = {}
 
         self.quit_signaled = False
 
     def send_event(self, name, **kwargs):
-        kwargs['_event_name'] = name
+        """Send an event to the master without waiting for it to be handled"""
         self.log.trace("sending {} {!r}".format(name, kwargs))
-        self.sock.send_json(kwargs)
-        recv = self.sock.recv_json()
+        protocol.send_event(self.sock, next(self.seq), name, kwargs)
+
+    def request(self, name, **kwargs):
+        """Send an event to the master and wait for the reply"""
+        self.send_event(name, **kwargs)
+        recv = protocol.recv_reply(self.sock)
         if recv == 'die':
             self.log.info('Slave instructed to die by master; shutting down')
             raise SystemExit()
@@ -51,17 +56,39 @@ class SlaveManager(object):
         """Send a message to the master, which should get printed to the console"""
         self.send_event('message', message=message, markup=kwargs)  # message!
 
-    def pytest_collection_finish(self, session):
+    def pytest_collection(self, session):
         """pytest collection hook
 
-        - Sends collected tests to the master for comparison
+        - Skips the upfront collection, test modules are collected once tests from them are
+          received from the master
+        - Sends the hash of the master's collection manifest back to the master, so it can
+          check the slave works from the current one
 
         """
-        self.log.debug('collection finished')
         self.session = session
-        self.collection = {item.nodeid: item for item in session.items}
+        session.items = []
+        self.collection = {}
+        self.manifest = read_manifest(self.manifest_path)
+        self.log.debug('collection deferred, {} modules in the manifest'.format(
+            len(self.manifest['modules'])))
         terminalreporter.disable()
-        self.send_event("collectionfinish", node_ids=self.collection.keys())
+        self.send_event("collectionfinish", manifest_hash=self.manifest['hash'])
+        return True
+
+    def _collect_module(self, module):
+        """Collects a test module and checks it against the master's collection manifest"""
+        expected = self.manifest['modules'][module]
+        items = collect_module(self.session, self.config.rootdir.join(module))
+        node_ids = [item.nodeid for item in items]
+        if collection_hash(node_ids) != expected['hash']:
+            # extra tests don't matter as long as all the master has are there, which can
+            # happen when the master was only asked for some tests of the module
+            missing = set(expected['node_ids']).difference(node_ids)
+            if missing:
+                self.log.error('collection of {} differs from the master'.format(module))
+                # the master kills the slave instead of replying
+                self.request('collectiondiff', module=module, node_ids=node_ids)
+        self.collection.update((item.nodeid, item) for item in items)
 
     def pytest_runtest_logstart(self, nodeid, location):
         """pytest runtest logstart hook
@@ -140,7 +167,8 @@ class SlaveManager(object):
 
     def shutdown(self):
         self.message('shutting down')
-        self.send_event('shutdown')
+        # waiting for the ack makes sure the master got every event before the slave exits
+        self.request('shutdown')
         self.quit_signaled = True
 
     def _test_generator(self):
@@ -154,14 +182,29 @@ class SlaveManager(object):
 
     def _iter_nodes(self):
         while True:
-            node_ids = self.send_event('need_tests')
+            node_ids = self.request('need_tests')
             if not node_ids:
                 break
             for nodeid in node_ids:
+                if nodeid not in self.collection:
+                    self._collect_module(module_of(nodeid))
                 # TODO: take non-unique node ids into account
                 yield self.collection[nodeid]
 
 
+def collect_module(session, path):
+    """Collects the items of a test module the way the session collection would
+
+    The modifyitems hooks run on the items of the module, but the session wide collection hooks
+    do not run again and the items of the session are kept.
+    """
+    collectors = session.gethookproxy(path).pytest_collect_file(path=path, parent=session)
+    items = [item for collector in collectors for item in session.genitems(collector)]
+    session.config.hook.pytest_collection_modifyitems(
+        session=session, config=session.config, items=items)
+    return items
+
+
 def serialize_report(rep):
     """
     Get a :py:class:`TestReport <pytest:_pytest.runner.TestReport>` ready to send to the master
@@ -245,7 +288,7 @@ if __name__ == '__main__':
         conf.runtime["cfme_data"]["basic_info"]["appliances_provider"] = provider_name
     config = _init_config(slave_options, slave_args)
     slave_manager = SlaveManager(config, args.slaveid, appliance_config,
-        conf.slave_config['zmq_endpoint'])
+        conf.slave_config['zmq_endpoint'], conf.slave_config['collection_manifest'])
     config.pluginmanager.register(slave_manager, 'slave_manager')
     config.hook.pytest_cmdline_main(config=config)
     signal.signal(signal.SIGQUIT, slave_manager.handle_quit)
@@ -0,0 +1,244 @@
+"""Test group scheduling for the parallelizer master
+
+Test groups are indexed by the provider they are parametrized with as soon as the collection is
+known, so handing a slave its next group doesn't need to search the whole pool. Switching a slave
+to another provider means cleansing its appliance and setting the new provider up from scratch,
+so the scheduler keeps every slave on one provider for as long as there is work for it, and
+weighs the remaining work by its historical duration when a slave has to move on.
+
+The master records how long every test took in the pytest cache. Those durations are also used to
+bring the groups to a similar size, splitting huge groups and merging tiny ones, so the last
+slaves aren't left waiting on one which got a hundred provisioning tests at once.
+"""
+import heapq
+from collections import OrderedDict, defaultdict, deque
+from itertools import groupby
+
+import attr
+
+#: pytest cache key of the per-nodeid test durations
+DURATIONS_CACHE_KEY = 'parallelize/durations'
+#: Seconds assumed for a test when there is no history at all
+DEFAULT_TEST_DURATION = 60.0
+#: Seconds of tests :py:func:`balance_groups` aims to put in a group
+TARGET_GROUP_DURATION = 600.0
+#: Weight of the latest run when updating the duration of a test
+DURATION_WEIGHT = 0.5
+
+
+class DurationStore(object):
+    """Historical test durations in seconds, by nodeid
+
+    Tests without a recorded duration are assumed to take the median of the known ones. A test's
+    duration covers its setup, call and teardown, and is averaged with the previous runs.
+    """
+    def __init__(self, durations=None, default=DEFAULT_TEST_DURATION):
+        self.durations = dict(durations or {})
+        if self.durations:
+            known = sorted(self.durations.values())
+            default = known[len(known) // 2]
+        self.default = default
+        self._running = defaultdict(float)
+
+    @classmethod
+    def load(cls, cache):
+        return cls(cache.get(DURATIONS_CACHE_KEY, {}))
+
+    def save(self, cache):
+        cache.set(DURATIONS_CACHE_KEY, self.durations)
+
+    def record(self, report):
+        """Adds the duration of a test phase from its report, the teardown completes the test"""
+        self._running[report.nodeid] += report.duration
+        if report.when == 'teardown':
+            duration = self._running.pop(report.nodeid)
+            if report.nodeid in self.durations:
+                duration = (DURATION_WEIGHT * duration +
+                            (1 - DURATION_WEIGHT) * self.durations[report.nodeid])
+            self.durations[report.nodeid] = duration
+
+    def estimate(self, nodeid):
+        return self.durations.get(nodeid, self.default)
+
+    def cost(self, tests):
+        return sum(self.estimate(nodeid) for nodeid in tests)
+
+
+@attr.s
+class TestGroup(object):
+    """A group of tests that is sent to a slave at once"""
+    __test__ = False
+
+    tests = attr.ib()
+    provider = attr.ib(default=None)
+    cost = attr.ib(default=0.0)
+
+
+def provider_of_tests(tests, providers):
+    """Returns the provider a test group is parametrized with, ``None`` if there is none
+
+    Args:
+        tests: nodeids of the group
+        providers: provider keys, longest first so that a key which is a prefix of another one
+            (``vsphere6`` and ``vsphere65``) doesn't match the longer one's tests
+    """
+    found = set()
+    for nodeid in tests:
+        if '[' in nodeid:
+            parametrized_id = nodeid.split('[', 1)[1]
+            for key in providers:
+                if key in parametrized_id:
+                    found.add(key)
+                    break
+    # the alphabetically first one wins if the tests of a group disagree
+    return min(found) if found else None
+
+
+def modscope_groups(collection):
+    """Breaks a collection up into groups of tests from one module with the same parametrized id
+
+    Yields:
+        lists of nodeids, in collection order
+    """
+    for fspath, nodeids in groupby(collection, key=lambda nodeid: nodeid.split('::')[0]):
+        parametrized_ids = OrderedDict()
+        for nodeid in nodeids:
+            if '[' in nodeid:
+                # 'test_module.py::test_name[parametrized_id]' becomes 'parametrized_id'
+                parametrized_id = nodeid.split('[')[1].rstrip(']')
+            else:
+                parametrized_id = 'no params'
+            parametrized_ids.setdefault(parametrized_id, []).append(nodeid)
+        for tests in parametrized_ids.values():
+            yield tests
+
+
+def balance_groups(groups, durations, target=TARGET_GROUP_DURATION):
+    """Splits and merges test groups so they take about ``target`` seconds each
+
+    Groups estimated to take longer are split into runs of consecutive tests, groups of the same
+    provider (or of no provider) which are shorter get merged, in collection order.
+
+    Args:
+        groups: iterable of :py:class:`TestGroup`
+        durations: :py:class:`DurationStore` to estimate the tests with
+
+    Yields:
+        :py:class:`TestGroup`
+    """
+    merging = OrderedDict()
+    for group in groups:
+        if group.cost > target:
+            chunk, cost = [], 0.0
+            for nodeid in group.tests:
+                estimate = durations.estimate(nodeid)
+                if chunk and cost + estimate > target:
+                    yield TestGroup(chunk, group.provider, cost)
+                    chunk, cost = [], 0.0
+                chunk.append(nodeid)
+                cost += estimate
+            group = TestGroup(chunk, group.provider, cost)
+        merged = merging.pop(group.provider, None)
+        if merged is not None:
+            if merged.cost + group.cost > target:
+                yield merged
+            else:
+                group = TestGroup(merged.tests + group.tests, group.provider,
+                                  merged.cost + group.cost)
+        merging[group.provider] = group
+    for group in merging.values():
+        yield group
+
+
+class ProviderScheduler(object):
+    """Hands test groups out to slaves, keeping each slave on a single provider
+
+    A slave first drains the queue of the provider its appliance is set up for. Once that runs
+    dry it claims the provider with the most work nobody is on yet, then takes the groups which
+    need no provider, and only when there's nothing else left does it switch to (steal from) the
+    provider with the most remaining work per slave. The queues are ordered longest group first.
+
+    Args:
+        groups: iterable of :py:class:`TestGroup`
+    """
+    def __init__(self, groups):
+        groups = sorted(groups, key=lambda group: group.cost, reverse=True)
+        self.queues = OrderedDict()
+        self.generic = deque()
+        self.remaining = defaultdict(float)
+        self.workers = defaultdict(set)
+        for group in groups:
+            if group.provider is None:
+                self.generic.append(group)
+            else:
+                self.queues.setdefault(group.provider, deque()).append(group)
+                self.remaining[group.provider] += group.cost
+
+    def __len__(self):
+        return len(self.generic) + sum(len(queue) for queue in self.queues.values())
+
+    def _pop(self, provider):
+        queue = self.queues[provider]
+        group = queue.popleft()
+        self.remaining[provider] -= group.cost
+        if not queue:
+            del self.queues[provider]
+            del self.remaining[provider]
+        return group
+
+    def release(self, slaveid):
+        """Forgets about a slave which is gone, so its provider can be claimed by another one"""
+        for slaves in self.workers.values():
+            slaves.discard(slaveid)
+
+    def next_group(self, slaveid, provider=None):
+        """Picks the next group for a slave whose appliance is set up for ``provider``
+
+        Returns:
+            ``(group, provider)`` with the provider the slave is set up for after running the
+            group, which differs from the one passed in when the slave has to switch;
+            ``(None, provider)`` when there is nothing left to run
+        """
+        if provider in self.queues:
+            self.workers[provider].add(slaveid)
+            return self._pop(provider), provider
+        self.workers[provider].discard(slaveid)
+
+        unclaimed = [key for key in self.queues if not self.workers[key]]
+        if unclaimed and (provider is None or not self.generic):
+            target = max(unclaimed, key=self.remaining.get)
+        elif self.generic:
+            return self.generic.popleft(), provider
+        elif self.queues:
+            target = max(
+                self.queues,
+                key=lambda key: self.remaining[key] / (len(self.workers[key]) + 1))
+        else:
+            return None, provider
+        self.workers[target].add(slaveid)
+        return self._pop(target), target
+
+
+def simulate(scheduler, slave_count, durations, switch_cost=0.0):
+    """Replays a scheduler against ``slave_count`` slaves that all start at the same time
+
+    Every group takes as long as its tests' ``durations`` estimates add up to, plus
+    ``switch_cost`` seconds whenever a slave has to be cleansed for another provider.
+
+    Returns:
+        ``(makespan, switches)``, in seconds and number of provider switches
+    """
+    slaves = [(0.0, 'slave{:02d}'.format(i), None) for i in range(slave_count)]
+    heapq.heapify(slaves)
+    makespan, switches = 0.0, 0
+    while slaves:
+        now, slaveid, provider = heapq.heappop(slaves)
+        group, next_provider = scheduler.next_group(slaveid, provider)
+        if group is None:
+            makespan = max(makespan, now)
+            continue
+        if provider is not None and next_provider != provider:
+            switches += 1
+            now += switch_cost
+        heapq.heappush(slaves, (now + durations.cost(group.tests), slaveid, next_provider))
+    return makespan, switches
@@ -0,0 +1,100 @@
+#!/usr/bin/env python2
+"""Compare the LogValidator pattern matching with naive per-pattern ``re.match`` calls
+
+Generates a synthetic evm.log (1M lines by default) in memory and runs it through
+:py:meth:`cfme.utils.log_validator.LogValidator.validate_lines` as well as through the plain
+loop of ``re.match`` calls for every skip, failure and expected pattern on every line.
+No appliance is needed.
+
+Example usage:
+
+    ``scripts/benchmark_log_validator.py --lines 1000000 --patterns 20``
+
+"""
+from __future__ import print_function
+import argparse
+import random
+import re
+import sys
+import time
+
+import pytest
+
+from cfme.utils.log_validator import LogValidator
+
+LINE_TEMPLATE = ('[----] {level}, [2018-01-01T00:00:{sec:02d}.{usec:06d} #{pid}:{tid}]  '
+                 '{levelname} -- : MIQ({cls}.{method}) {message}')
+LEVELS = [('I', 'INFO')] * 20 + [('D', 'DEBUG')] * 10 + [('W', 'WARN')] * 2 + [('E', 'ERROR')]
+CLASSES = ['MiqQueue', 'MiqServer', 'EmsRefresh', 'MiqGenericWorker', 'VmOrTemplate']
+METHODS = ['put', 'get', 'deliver', 'refresh', 'heartbeat', 'perf_capture']
+
+
+def synthetic_log(count, seed=0):
+    rnd = random.Random(seed)
+    lines = []
+    for i in range(count):
+        level, levelname = rnd.choice(LEVELS)
+        lines.append(LINE_TEMPLATE.format(
+            level=level, levelname=levelname, sec=i % 60, usec=i % 1000000,
+            pid=rnd.randint(1000, 9999), tid=rnd.randint(10000, 99999),
+            cls=rnd.choice(CLASSES), method=rnd.choice(METHODS),
+            message='Message id: [{}], Command: [{}]'.format(i, rnd.choice(METHODS))))
+    return lines
+
+
+def make_patterns(count):
+    skip = ['.*ERROR.*harmless_{}.*'.format(i) for i in range(count)]
+    failure = ['.*FATAL.*unexpected_{}.*'.format(i) for i in range(count)]
+    matched = ['.*MIQ\\(MiqServer\\.heartbeat\\).*', '.*Command: \\[refresh\\].*']
+    return skip, failure, matched
+
+
+def naive(lines, skip, failure, matched):
+    matches = {}
+    for line in lines:
+        if any(re.match(pattern, line) for pattern in skip):
+            continue
+        for pattern in failure:
+            if re.match(pattern, line):
+                raise AssertionError(pattern)
+        for pattern in matched:
+            if re.match(pattern, line):
+                matches[pattern] = True
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=1000000,
+                        help='Number of synthetic log lines')
+    parser.add_argument('--patterns', type=int, default=20,
+                        help='Number of skip and of failure patterns each')
+    args = parser.parse_args()
+
+    print('Generating {} lines...'.format(args.lines))
+    lines = synthetic_log(args.lines)
+    skip, failure, matched = make_patterns(args.patterns)
+
+    start = time.time()
+    naive(lines, skip, failure, matched)
+    naive_time = time.time() - start
+    print('naive re.match loop: {:.2f}s'.format(naive_time))
+
+    validator = LogValidator('/var/www/miq/vmdb/log/evm.log', hostname='localhost',
+                             skip_patterns=skip, failure_patterns=failure,
+                             matched_patterns=matched)
+    start = time.time()
+    try:
+        validator.validate_lines(lines)
+    except pytest.fail.Exception as e:
+        print('validation failed: {}'.format(e))
+    validator_time = time.time() - start
+    print('LogValidator: {:.2f}s ({:.1f}x)'.format(validator_time, naive_time / validator_time))
+    for pattern, data in validator.report()['matched'].items():
+        print('  {}: {} matches'.format(pattern, data['count']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python2
+"""Load test the parallelizer master/slave messaging with synthetic slaves
+
+Starts a number of slave threads which ask the master for tests and send the logstart and
+setup/call/teardown logreport events a real slave would for every test, then reports how many
+events per second the master got through and how long the slaves were kept waiting on it.
+
+Runs both the fire-and-forget DEALER protocol from :py:mod:`fixtures.parallelizer.protocol` and
+the previous one, where every event went through a REQ socket and waited for the master's ack
+while the master handled one message per poll. No appliance is needed.
+
+Example usage:
+
+    ``scripts/benchmark_parallelizer_protocol.py --slaves 16 --tests 200 --handle-ms 0.2``
+
+"""
+from __future__ import print_function
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from itertools import count
+
+import zmq
+
+from fixtures.parallelizer import protocol
+
+REPORT = {'nodeid': None, 'location': ['cfme/tests/test_synthetic.py', 10, 'test_synthetic'],
+          'keywords': dict.fromkeys(['test_synthetic', 'parametrize', 'tier', 'rhel'], 1),
+          'outcome': 'passed', 'longrepr': None, 'sections': [['Captured log', 'x' * 1024]],
+          'duration': 0.1, 'user_properties': []}
+
+
+class SyntheticSlave(threading.Thread):
+    def __init__(self, endpoint, slaveid, test_ms, legacy):
+        super(SyntheticSlave, self).__init__()
+        self.endpoint = endpoint
+        self.slaveid = slaveid
+        self.test_ms = test_ms
+        self.legacy = legacy
+        self.waited = 0.0
+
+    def run(self):
+        if self.legacy:
+            sock = zmq.Context.instance().socket(zmq.REQ)
+            sock.set_hwm(1)
+            sock.setsockopt_string(zmq.IDENTITY, u'{}'.format(self.slaveid))
+            sock.connect(self.endpoint)
+        else:
+            sock = protocol.slave_socket(self.endpoint, self.slaveid)
+        seq = count()
+
+        def event(name, request=False, **data):
+            start = time.time()
+            if self.legacy:
+                data['_event_name'] = name
+                sock.send_json(data)
+                reply = sock.recv_json()
+            else:
+                protocol.send_event(sock, next(seq), name, data)
+                reply = protocol.recv_reply(sock) if request else None
+            self.waited += time.time() - start
+            return reply
+
+        while True:
+            tests = event('need_tests', request=True)
+            if not tests:
+                break
+            for nodeid in tests:
+                event('runtest_logstart', nodeid=nodeid, location=REPORT['location'])
+                for when in ('setup', 'call', 'teardown'):
+                    event('runtest_logreport', report=dict(REPORT, nodeid=nodeid, when=when))
+                time.sleep(self.test_ms / 1000.)
+        event('shutdown', request=True)
+        sock.close()
+
+
+def master(sock, slave_count, tests, group, handle_ms, legacy):
+    """Hands out the tests and handles events until all slaves have shut down"""
+    pending = ['cfme/tests/test_synthetic.py::test_synthetic[{}]'.format(i) for i in range(tests)]
+    running, events = slave_count, 0
+    while running:
+        if legacy:
+            received = []
+            if zmq.zmq_poll([(sock, zmq.POLLIN)], 50):
+                slaveid, _, event_json = sock.recv_multipart(flags=zmq.NOBLOCK)
+                event_data = json.loads(event_json)
+                received.append((slaveid, event_data.pop('_event_name'), None, event_data))
+        else:
+            received = protocol.recv_events(sock)
+        for slaveid, event_name, seq, event_data in received:
+            events += 1
+            # stands in for the reporting hooks the master runs for every event
+            time.sleep(handle_ms / 1000.)
+            if event_name == 'need_tests':
+                reply, pending = pending[:group], pending[group:]
+            elif event_name == 'shutdown':
+                reply = 'ack'
+                running -= 1
+            elif legacy:
+                reply = 'ack {}'.format(event_name)
+            else:
+                continue
+            protocol.send_reply(sock, slaveid, reply)
+    return events
+
+
+def run(args, legacy):
+    endpoint = 'ipc://{}'.format(tempfile.mktemp(prefix='parallelizer-benchmark-'))
+    sock = zmq.Context.instance().socket(zmq.ROUTER)
+    sock.bind(endpoint)
+    slaves = [SyntheticSlave(endpoint, 'slave{:02d}'.format(i), args.test_ms, legacy)
+              for i in range(args.slaves)]
+    start = time.time()
+    for slave in slaves:
+        slave.start()
+    events = master(sock, args.slaves, args.tests, args.group, args.handle_ms, legacy)
+    elapsed = time.time() - start
+    for slave in slaves:
+        slave.join()
+    sock.close()
+    waited = sum(slave.waited for slave in slaves) / len(slaves)
+    return events, elapsed, waited
+
+
+def main():
+    parser = argparse.ArgumentParser(epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--slaves', type=int, default=16, help='Number of synthetic slaves')
+    parser.add_argument('--tests', type=int, default=200, help='Number of tests to hand out')
+    parser.add_argument('--group', type=int, default=5, help='Tests sent per need_tests')
+    parser.add_argument('--test-ms', type=float, default=1.0,
+                        help='Milliseconds every synthetic test takes on the slave')
+    parser.add_argument('--handle-ms', type=float, default=0.2,
+                        help='Milliseconds the master spends handling every event')
+    args = parser.parse_args()
+
+    print('{:<10} {:>8} {:>8} {:>10} {:>16}'.format(
+        'protocol', 'events', 'seconds', 'events/s', 'slave waits [s]'))
+    for name, legacy in (('req/ack', True), ('dealer', False)):
+        events, elapsed, waited = run(args, legacy)
+        print('{:<10} {:>8} {:>8.2f} {:>10.0f} {:>16.2f}'.format(
+            name, events, elapsed, events / elapsed, waited))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python2
+"""Measure the local CPU time spent while waiting for a long running SSH command
+
+Runs a command which produces no output for a long time (``sleep 30`` by default) and reports
+the wall clock time next to the user and system CPU time this process used meanwhile. A reader
+which waits for channel activity should use only a tiny fraction of the wall clock time, while a
+busy-waiting one burns roughly a whole core.
+
+By default, it will use the appliance named in conf.env, but can be explicitly aimed at another
+host if needed.
+
+Example usage:
+
+    ``scripts/benchmark_ssh_cpu.py 10.20.30.40 --command 'sleep 30' --rounds 3``
+
+"""
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+
+from cfme.utils.conf import credentials
+from cfme.utils.ssh import SSHClient
+
+
+def measure(ssh_client, command):
+    """Runs the command and returns a ``(wall, user, system)`` tuple of seconds"""
+    start_times = os.times()
+    start = time.time()
+    ssh_client.run_command(command)
+    wall = time.time() - start
+    end_times = os.times()
+    return wall, end_times[0] - start_times[0], end_times[1] - start_times[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('hostname', nargs='?', default=None,
+                        help='hostname or ip address of target appliance')
+    parser.add_argument('--username', default=credentials['ssh']['username'],
+                        help='SSH username for target appliance')
+    parser.add_argument('--password', default=credentials['ssh']['password'],
+                        help='SSH password for target appliance')
+    parser.add_argument('--command', default='sleep 30',
+                        help='Remote command to run, should be quiet and long running')
+    parser.add_argument('--rounds', type=int, default=1,
+                        help='How many times to run the command')
+
+    args = parser.parse_args()
+
+    ssh_kwargs = {
+        'username': args.username,
+        'password': args.password
+    }
+    if args.hostname is not None:
+        ssh_kwargs['hostname'] = args.hostname
+
+    with SSHClient(**ssh_kwargs) as ssh_client:
+        # open the transport outside of the measured part
+        ssh_client.run_command('true')
+        for round_number in range(1, args.rounds + 1):
+            wall, user, system = measure(ssh_client, args.command)
+            print('round {}: wall {:.2f}s, cpu user {:.2f}s, cpu system {:.2f}s ({:.1%})'.format(
+                round_number, wall, user, system, (user + system) / wall))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
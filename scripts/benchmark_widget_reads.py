@@ -0,0 +1,94 @@
+#!/usr/bin/env python2
+"""Compare reading summary widgets and tables with one script against reading them by elements
+
+Opens recorded pages (saved with ``browser.selenium.page_source`` or the browser's "Save page")
+in the browser configured in env.yaml and reads the given widgets from every page both with the
+read script and element by element, counting the commands sent to the selenium server. Both reads
+must return the same data. No appliance is needed.
+
+Example usage:
+
+    ``scripts/benchmark_widget_reads.py --summary-form 'Basic Information'
+    --summary-table Properties --table '//table[@id="list"]' vm_details.html vm_list.html``
+
+"""
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+
+from widgetastic.browser import Browser
+
+from cfme.utils.browser import manager
+from widgetastic_manageiq import SummaryForm, SummaryTable, Table
+
+
+class RoundTripCounter(object):
+    """Counts the commands a webdriver sends to the selenium server"""
+    def __init__(self, selenium):
+        self.count = 0
+        self._execute = selenium.execute
+        selenium.execute = self.execute
+
+    def execute(self, *args, **kwargs):
+        self.count += 1
+        return self._execute(*args, **kwargs)
+
+
+def measure(counter, read):
+    counter.count = 0
+    start = time.time()
+    result = read()
+    return result, counter.count, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages', nargs='+', help='Recorded HTML pages')
+    parser.add_argument('--summary-form', action='append', default=[],
+                        help='Title of a SummaryForm to read')
+    parser.add_argument('--summary-table', action='append', default=[],
+                        help='Title of a SummaryTable to read')
+    parser.add_argument('--table', action='append', default=[],
+                        help='Locator of a Table to read')
+    args = parser.parse_args()
+
+    selenium = manager.start(url_key='about:blank')
+    counter = RoundTripCounter(selenium)
+    browser = Browser(selenium)
+    widgets = (
+        [(SummaryForm, title) for title in args.summary_form] +
+        [(SummaryTable, title) for title in args.summary_table] +
+        [(Table, locator) for locator in args.table])
+    mismatches = 0
+    print('{:<24} {:<32} {:>10} {:>10} {:>10} {:>10}'.format(
+        'page', 'widget', 'script', 'elements', 'script [s]', 'elem. [s]'))
+    try:
+        for page in args.pages:
+            browser.url = 'file://{}'.format(os.path.abspath(page))
+            for widget_class, arg in widgets:
+                widget = widget_class(browser, arg)
+                if not widget.is_displayed:
+                    continue
+                if isinstance(widget, Table):
+                    # Read the headers for both alike
+                    widget.headers
+                by_script, script_trips, script_time = measure(counter, widget.read)
+                by_elements, element_trips, element_time = measure(
+                    counter, widget._read_elements)
+                if by_script != by_elements:
+                    mismatches += 1
+                    print('Mismatch in {} {!r}:\n  script:   {!r}\n  elements: {!r}'.format(
+                        page, arg, by_script, by_elements))
+                print('{:<24} {:<32} {:>10} {:>10} {:>10.2f} {:>10.2f}'.format(
+                    os.path.basename(page)[:24], '{}({})'.format(widget_class.__name__, arg)[:32],
+                    script_trips, element_trips, script_time, element_time))
+    finally:
+        manager.quit()
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
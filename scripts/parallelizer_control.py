@@ -0,0 +1,59 @@
+#!/usr/bin/env python2
+"""Add appliances to or retire them from a running parallelized test session
+
+The parallelizer master prints the address of its control socket when it starts distributing
+tests ("Control socket at ipc://..."). New appliances get a slave of their own right away and
+pick up the pending test groups, retired ones finish the tests they have, then shut down.
+
+Example usage:
+
+    ``scripts/parallelizer_control.py ipc://.cache/d/parallelize/1234-control status``
+
+    ``scripts/parallelizer_control.py ipc://.cache/d/parallelize/1234-control add https://10.0.0.5``
+
+    ``scripts/parallelizer_control.py ipc://.cache/d/parallelize/1234-control retire slave03``
+
+"""
+from __future__ import print_function
+import argparse
+import json
+import sys
+
+import zmq
+
+#: How long to wait for the master to answer, it only does so between handling slave events
+TIMEOUT = 30 * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('endpoint', help='Control socket address printed by the master')
+    subparsers = parser.add_subparsers(dest='command')
+    add = subparsers.add_parser('add', help='Start a slave on another appliance')
+    add.add_argument('url', help='Appliance URL, like the --appliance parameter')
+    retire = subparsers.add_parser('retire', help='Drain and shut down a slave')
+    retire.add_argument('slave', help='Slave id or appliance URL')
+    subparsers.add_parser('status', help='Show the slaves and the remaining work')
+    args = parser.parse_args()
+
+    request = {'command': args.command}
+    if args.command == 'add':
+        request['url'] = args.url
+    elif args.command == 'retire':
+        request['slave'] = args.slave
+
+    sock = zmq.Context.instance().socket(zmq.REQ)
+    sock.setsockopt(zmq.LINGER, 0)
+    sock.connect(args.endpoint)
+    sock.send_json(request)
+    if not sock.poll(TIMEOUT):
+        print('No reply from {}, is the session still running?'.format(args.endpoint))
+        return 1
+    reply = sock.recv_json()
+    print(json.dumps(reply, indent=2, sort_keys=True))
+    return 1 if 'error' in reply else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python2
+"""Replay a test collection through the parallelizer schedulers and compare them
+
+Groups the collection the way the parallelizer master does, then simulates slaves asking for
+tests with every group taking as long as the timing data says. Reports the makespan and how
+often slaves had to be cleansed for another provider for the first-fit policy the master used
+before, for the provider queue scheduler, and for the provider queue scheduler with the groups
+balanced to the target duration like the master does.
+
+The collection is a file with one nodeid per line (``py.test --collect-only -q`` output works),
+the timing data is a JSON object mapping nodeids to seconds, like the one the master keeps in
+the pytest cache under ``parallelize/durations``.
+
+Example usage:
+
+    ``scripts/simulate_parallelizer.py collection.txt --durations durations.json --slaves 8``
+
+"""
+from __future__ import print_function
+import argparse
+import json
+import sys
+
+from fixtures.parallelizer.scheduler import (
+    TARGET_GROUP_DURATION, DurationStore, ProviderScheduler, TestGroup, balance_groups,
+    modscope_groups, provider_of_tests, simulate)
+
+
+class FirstFitScheduler(object):
+    """The policy of the old ``ParallelSession.get``: first group in collection order that fits
+
+    A group fits if it needs no provider, or the provider the slave is on, or the slave isn't on
+    any provider yet. If none fits, the slave switches to the provider of the first group left.
+    """
+    def __init__(self, groups):
+        self.pool = list(groups)
+
+    def next_group(self, slaveid, provider=None):
+        for group in self.pool:
+            if provider is None or group.provider in (None, provider):
+                self.pool.remove(group)
+                return group, group.provider or provider
+        if not self.pool:
+            return None, provider
+        group = self.pool.pop(0)
+        return group, group.provider
+
+
+def read_collection(path):
+    with open(path) as f:
+        return [line.strip() for line in f if '::' in line]
+
+
+def main():
+    parser = argparse.ArgumentParser(epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('collection', help='File with one test nodeid per line')
+    parser.add_argument('--durations', default=None,
+                        help='JSON file mapping nodeids to their duration in seconds')
+    parser.add_argument('--slaves', type=int, default=4, help='Number of slaves')
+    parser.add_argument('--switch-cost', type=float, default=300.0,
+                        help='Seconds it takes to cleanse an appliance and set up a provider')
+    parser.add_argument('--target', type=float, default=TARGET_GROUP_DURATION,
+                        help='Seconds of tests to put in a balanced group')
+    parser.add_argument('--providers', default=None,
+                        help='Comma separated provider keys, defaults to the ones in cfme_data')
+    args = parser.parse_args()
+
+    if args.providers:
+        providers = args.providers.split(',')
+    else:
+        from cfme.utils.conf import cfme_data
+        providers = list(cfme_data['management_systems'].keys())
+    providers.sort(key=len, reverse=True)
+    durations = {}
+    if args.durations:
+        with open(args.durations) as f:
+            durations = json.load(f)
+    durations = DurationStore(durations)
+
+    collection = read_collection(args.collection)
+    groups = [TestGroup(tests, provider_of_tests(tests, providers), durations.cost(tests))
+              for tests in modscope_groups(collection)]
+    print('{} tests in {} groups, {} providers, {} slaves, {:.0f}s of tests'.format(
+        len(collection), len(groups), len({group.provider for group in groups} - {None}),
+        args.slaves, sum(group.cost for group in groups)))
+
+    print('{:<12} {:>12} {:>10}'.format('scheduler', 'makespan [s]', 'switches'))
+    balanced = list(balance_groups(groups, durations, args.target))
+    for name, scheduler in (('first-fit', FirstFitScheduler(groups)),
+                            ('provider', ProviderScheduler(groups)),
+                            ('balanced', ProviderScheduler(balanced))):
+        makespan, switches = simulate(scheduler, args.slaves, durations, args.switch_cost)
+        print('{:<12} {:>12.0f} {:>10}'.format(name, makespan, switches))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,6 +2,7 @@
 import inspect
 import json
 import re
+import time
 from celery import chain
 from celery.result import AsyncResult
 from datetime import datetime
@@ -10,12 +11,16 @@ from django.db import transaction
 from django.http import HttpResponse
 from django.shortcuts import render
 from ipware.ip import get_ip
+from redis.exceptions import RedisError
 
+from appliances.locks import lock_metrics
 from appliances.models import (
-    Appliance, AppliancePool, Provider, Group, Template, User, GroupShepherd)
+    Appliance, AppliancePool, Provider, Group, Template, User, GroupShepherd,
+    POOL_STATE_CHANNEL, pool_state_version)
 from appliances.tasks import (
     appliance_power_on, appliance_power_off, appliance_suspend, appliance_rename,
     connect_direct_lun, disconnect_direct_lun, mark_appliance_ready, wait_appliance_ready)
+from sprout import redis_client
 from sprout.log import create_logger
 
 
@@ -23,30 +28,42 @@ def json_response(data):
     return HttpResponse(json.dumps(data), content_type="application/json")
 
 
-def json_exception(e):
-    return json_response({
+def exception_response(e):
+    return {
         "status": "exception",
         "result": {
             "class": type(e).__name__,
             "message": str(e)
         }
-    })
+    }
 
 
-def json_autherror(message):
-    return json_response({
+def autherror_response(message):
+    return {
         "status": "autherror",
         "result": {
             "message": str(message)
         }
-    })
+    }
 
 
-def json_success(result):
-    return json_response({
+def success_response(result):
+    return {
         "status": "success",
         "result": result
-    })
+    }
+
+
+def json_exception(e):
+    return json_response(exception_response(e))
+
+
+def json_autherror(message):
+    return json_response(autherror_response(message))
+
+
+def json_success(result):
+    return json_response(success_response(result))
 
 
 class JSONMethod(object):
@@ -101,14 +118,49 @@ class JSONApi(object):
         return render(request, 'appliances/apidoc.html', {})
 
     def __call__(self, request):
+        """Calls the method the request asks for.
+
+        The request can be a list of calls as well, then the response is the list of their
+        responses in the same order. The calls run one after the other and a failing call does
+        not stop the following ones.
+        """
         if request.method != 'POST':
             return json_success({
                 "available_methods": sorted(
                     map(lambda m: m.description, self._methods.itervalues()),
                     key=lambda m: m["name"]),
             })
+        ipaddr = get_ip(request)
         try:
             data = json.loads(request.body)
+        except ValueError as e:
+            return json_exception(e)
+        if isinstance(data, list):
+            # Checking a password is slow on purpose, do it once per batch
+            users = {}
+            return json_response([self.call(call, ipaddr, users) for call in data])
+        return json_response(self.call(data, ipaddr))
+
+    def authenticate(self, username, password):
+        try:
+            user = User.objects.get(username=username)
+        except ObjectDoesNotExist:
+            return autherror_response("User {} does not exist!".format(username))
+        if not user.check_password(password):
+            return autherror_response("Wrong password for user {}!".format(username))
+        return user
+
+    def call(self, data, ipaddr, users=None):
+        """Calls one method and returns the response data
+
+        Args:
+            data: the call, with ``method``, ``args``, ``kwargs`` and optional ``auth``
+            ipaddr: where the call came from, for the log
+            users: authenticated users by their credentials, shared by the calls of a batch
+        """
+        users = {} if users is None else users
+        method = __name__
+        try:
             method_name = data["method"]
             args = data["args"]
             kwargs = data["kwargs"]
@@ -116,29 +168,28 @@ class JSONApi(object):
                 method = self._methods[method_name]
             except KeyError:
                 raise NameError("Method {} not found!".format(method_name))
-            ipaddr = get_ip(request)
             create_logger(method).info(
                 "Calling with parameters {!r}{!r} from {!r}".format(tuple(args), kwargs, ipaddr))
             if method.auth:
                 if "auth" in data:
                     username, password = data["auth"]
-                    try:
-                        user = User.objects.get(username=username)
-                    except ObjectDoesNotExist:
-                        return json_autherror("User {} does not exist!".format(username))
-                    if not user.check_password(password):
-                        return json_autherror("Wrong password for user {}!".format(username))
+                    if (username, password) not in users:
+                        users[username, password] = self.authenticate(username, password)
+                    user = users[username, password]
+                    if not isinstance(user, User):
+                        return user
                     create_logger(method).info(
                         "Called by user {}/{}".format(user.id, user.username))
-                    return json_success(method(user, *args, **kwargs))
+                    return success_response(method(user, *args, **kwargs))
                 else:
-                    return json_autherror("Method {} needs authentication!".format(method_name))
+                    return autherror_response(
+                        "Method {} needs authentication!".format(method_name))
             else:
-                return json_success(method(*args, **kwargs))
+                return success_response(method(*args, **kwargs))
         except Exception as e:
             create_logger(method).error(
                 "Exception raised during call: {}: {}".format(type(e).__name__, str(e)))
-            return json_exception(e)
+            return exception_response(e)
         else:
             create_logger(method).info("Call finished")
 
@@ -242,9 +293,42 @@ def request_appliances(
         ram, cpu, provider_type, template_type).id
 
 
+#: Longest time wait_for_pool_change holds the request, so that it does not hit HTTP timeouts
+POOL_CHANGE_MAX_WAIT = 25
+
+
 @jsonapi.authenticated_method
 def request_check(user, request_id):
     """Return status of the appliance pool"""
+    return pool_status(user, request_id)
+
+
+@jsonapi.authenticated_method
+def wait_for_pool_change(user, request_id, version=None, timeout=20):
+    """Return status of the appliance pool once it differs from the version the caller knows.
+
+    The status contains the ``version`` to pass in the next call. Without a version, or when the
+    state did not change within ``timeout`` seconds, the current status is returned.
+    """
+    if version is not None:
+        deadline = time.time() + min(timeout, POOL_CHANGE_MAX_WAIT)
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(POOL_STATE_CHANNEL.format(request_id))
+            # Subscribed before the check, so that a change in between is not missed
+            while pool_state_version(request_id) == version and time.time() < deadline:
+                pubsub.get_message(timeout=max(0, deadline - time.time()))
+        except RedisError as e:
+            create_logger(__name__).warning(
+                'Could not wait for pool %s to change: %s', request_id, e)
+        finally:
+            pubsub.close()
+    status = pool_status(user, request_id)
+    status['version'] = pool_state_version(request_id)
+    return status
+
+
+def pool_status(user, request_id):
     request = AppliancePool.objects.get(id=request_id)
     if user != request.owner and not user.is_staff:
         raise Exception("This pool belongs to a different user!")
@@ -289,6 +373,16 @@ def destroy_pool(user, id):
     pool.kill()
 
 
+@jsonapi.method
+def task_lock_metrics(task_name):
+    """Return the lock metrics of a task, like ``appliances.tasks.refresh_appliances_provider``.
+
+    The numbers of runs, of runs coalesced into a later one and of runs dropped, locks lost before
+    the run finished, and milliseconds spent waiting for the lock and holding it.
+    """
+    return lock_metrics(task_name)
+
+
 @jsonapi.method
 def pool_exists(id):
     """Check whether pool does exist"""
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Locks that keep the runs of a task with the same arguments from overlapping.
+
+A lock is a lease on a cache key, owned by the run that took it. The run renews the lease from a
+heartbeat thread for as long as it runs, so the lease can be short and the lock of a worker that
+died gets free soon. A run that finds the lock taken can leave a request for another run behind,
+the holder runs the task once more after it is done, however many such requests there were.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+from sprout.log import create_logger
+
+#: Seconds the lock is held for without renewal
+LOCK_LEASE = 60
+#: How long a request for another run waits for the holder of the lock
+PENDING_EXPIRE = 24 * 3600
+METRICS = ('runs', 'coalesced', 'dropped', 'lost', 'wait_ms', 'hold_ms')
+METRICS_EXPIRE = 7 * 24 * 3600
+
+
+def lock_owner():
+    """Unique identity of who takes a lock, tells which worker holds it"""
+    return '{}:{}:{}:{}'.format(
+        socket.gethostname(), os.getpid(), threading.current_thread().name, uuid.uuid4().hex)
+
+
+def _metric_key(name, metric):
+    return 'task-lock-metric-{}-{}'.format(name, metric)
+
+
+def record_metrics(name, **values):
+    """Adds the values to the lock metrics of the task"""
+    for metric, value in values.items():
+        key = _metric_key(name, metric)
+        cache.add(key, 0, METRICS_EXPIRE)
+        try:
+            cache.incr(key, int(value))
+        except ValueError:
+            # Expired meanwhile
+            cache.set(key, int(value), METRICS_EXPIRE)
+
+
+def lock_metrics(name):
+    """Lock metrics of the task: runs, runs coalesced into a later one, runs dropped, locks lost
+    before the run finished, milliseconds spent waiting for the lock and holding it.
+    """
+    return {metric: cache.get(_metric_key(name, metric), 0) for metric in METRICS}
+
+
+class TaskLock(object):
+    """Lease based lock on a cache key
+
+    Args:
+        key: cache key of the lock
+        lease: seconds the lock is held for if its owner stops renewing it
+    """
+    def __init__(self, key, lease=LOCK_LEASE):
+        self.key = key
+        self.pending_key = '{}-pending'.format(key)
+        self.lease = lease
+        self.owner = lock_owner()
+        self.acquired_at = None
+        #: When the earliest run that left the work to this one tried to take the lock
+        self.requested_at = None
+        self.lost = False
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    @property
+    def logger(self):
+        return create_logger(__name__)
+
+    def acquire(self):
+        """Takes the lock if it is free and starts renewing it
+
+        Returns:
+            Whether the lock was taken
+        """
+        if not cache.add(self.key, self.owner, self.lease):
+            return False
+        self.acquired_at = time.time()
+        # This run does what the runs that gave up until now wanted
+        self.requested_at = self.take_pending()
+        self._stop.clear()
+        self._heartbeat = threading.Thread(
+            target=self._renew, name='heartbeat-{}'.format(self.key))
+        self._heartbeat.daemon = True
+        self._heartbeat.start()
+        return True
+
+    def acquire_or_defer(self):
+        """Takes the lock, or asks its holder to run once more when done
+
+        Returns:
+            Whether the lock was taken. If not, the holder runs again.
+        """
+        if self.acquire():
+            return True
+        cache.add(self.pending_key, time.time(), PENDING_EXPIRE)
+        # The holder might have released the lock before the request was there
+        return self.acquire()
+
+    def take_pending(self):
+        """Returns when another run was requested, if it was, and clears the request"""
+        requested_at = cache.get(self.pending_key)
+        if requested_at is not None:
+            cache.delete(self.pending_key)
+        return requested_at
+
+    def _renew(self):
+        while not self._stop.wait(self.lease / 3.0):
+            # Not atomic, but a lease still has two thirds of its time left when renewed
+            if cache.get(self.key) != self.owner:
+                self.lost = True
+                self.logger.warning('Lock %s was lost by %s', self.key, self.owner)
+                return
+            cache.set(self.key, self.owner, self.lease)
+
+    def release(self):
+        """Stops renewing the lock and frees it, unless somebody else took it meanwhile
+
+        Returns:
+            Seconds the lock was held for
+        """
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        if cache.get(self.key) == self.owner:
+            cache.delete(self.key)
+        else:
+            self.lost = True
+        held = time.time() - self.acquired_at
+        self.acquired_at = None
+        return held
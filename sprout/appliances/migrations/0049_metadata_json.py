@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+import yaml
+from django.db import migrations
+
+METADATA_MODELS = [
+    'Appliance', 'AppliancePool', 'DelayedProvisionTask', 'Group', 'GroupShepherd', 'Provider',
+    'Template']
+
+
+def convert_metadata(apps, schema_editor, load, dump):
+    for model_name in METADATA_MODELS:
+        model = apps.get_model('appliances', model_name)
+        objects = model.objects.using(schema_editor.connection.alias)
+        for pk, data in objects.values_list('pk', 'object_meta_data').iterator():
+            try:
+                converted = dump(load(data))
+            except (TypeError, ValueError, yaml.YAMLError):
+                # Keep what JSON cannot store in YAML, the models can read both
+                continue
+            if converted != data:
+                objects.filter(pk=pk).update(object_meta_data=converted)
+
+
+def yaml_to_json(apps, schema_editor):
+    convert_metadata(
+        apps, schema_editor, yaml.load,
+        lambda value: json.dumps(value, separators=(',', ':'), sort_keys=True))
+
+
+def json_to_yaml(apps, schema_editor):
+    convert_metadata(apps, schema_editor, yaml.load, yaml.dump)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appliances', '0048_openshift_project_made_bigger'),
+    ]
+
+    operations = [
+        migrations.RunPython(yaml_to_json, json_to_yaml),
+    ]
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 import base64
+import copy
+import json
 import re
+import threading
 import yaml
 
 try:
@@ -15,15 +18,17 @@ from celery import chain
 from contextlib import contextmanager
 from datetime import timedelta, date
 from django.contrib.auth.models import User, Group as DjangoGroup
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models, transaction
-from django.db.models import Q
-from django.db.models.signals import pre_save
-from django.dispatch import receiver
+from django.db.models import Case, Count, F, Q, When
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import Signal, receiver
 from django.utils import timezone
 from json_field import JSONField
+from redis.exceptions import RedisError
 
-from sprout import critical_section, redis
+from sprout import critical_section, redis, redis_client
 from sprout.log import create_logger
 
 from cfme.utils.appliance import Appliance as CFMEAppliance, IPAppliance
@@ -58,10 +63,22 @@ def apply_if_not_none(o, meth, *args, **kwargs):
     return getattr(o, meth)(*args, **kwargs)
 
 
+def dump_metadata(value):
+    return json.dumps(value, separators=(',', ':'), sort_keys=True)
+
+
+def load_metadata(data):
+    """Parses the stored metadata. Rows not converted to JSON yet are YAML."""
+    try:
+        return json.loads(data)
+    except ValueError:
+        return yaml.load(data)
+
+
 class MetadataMixin(models.Model):
     class Meta:
         abstract = True
-    object_meta_data = models.TextField(default=yaml.dump({}))
+    object_meta_data = models.TextField(default='{}\n')
     created_on = models.DateTimeField(default=timezone.now, editable=False)
     modified_on = models.DateTimeField(default=timezone.now)
 
@@ -88,13 +105,20 @@ class MetadataMixin(models.Model):
 
     @property
     def metadata(self):
-        return yaml.load(self.object_meta_data)
+        """The metadata, parsed only once for the instance. Do not modify it, use
+        :py:attr:`edit_metadata` or assign a new dict instead."""
+        data = self.object_meta_data
+        cached = self.__dict__.get('_metadata_cache')
+        if cached is None or (cached[0] is not data and cached[0] != data):
+            cached = self._metadata_cache = (data, load_metadata(data))
+        return cached[1]
 
     @metadata.setter
     def metadata(self, value):
         if not isinstance(value, dict):
             raise TypeError("You can store only dict in metadata!")
-        self.object_meta_data = yaml.dump(value)
+        # Raises TypeError for values JSON cannot store
+        self.object_meta_data = dump_metadata(value)
 
     @property
     @contextmanager
@@ -103,9 +127,11 @@ class MetadataMixin(models.Model):
             with self.metadata_lock:
                 o = type(self).objects.get(pk=self.pk)
                 metadata = o.metadata
+                original = copy.deepcopy(metadata)
                 yield metadata
-                o.metadata = metadata
-                o.save()
+                if metadata != original:
+                    o.metadata = metadata
+                    o.save(update_fields=['object_meta_data', 'modified_on'])
         self.reload()
 
     @property
@@ -117,6 +143,46 @@ class MetadataMixin(models.Model):
         return create_logger(cls, id)
 
 
+_capacity_memo = threading.local()
+
+
+@contextmanager
+def provider_capacity_memo():
+    """Reads the capacity of the providers only once for everything in the block.
+
+    Meant to wrap one scheduling pass of a task. Appliances created in the block are added to the
+    memoized counts, so the pass cannot provision past the limits. Appliances finishing or going
+    away in the meantime are not, that only makes the pass more careful.
+    """
+    if hasattr(_capacity_memo, 'providers'):
+        # Already in a pass
+        yield
+        return
+    _capacity_memo.providers = None
+    try:
+        yield
+    finally:
+        del _capacity_memo.providers
+
+
+class ProviderQuerySet(models.QuerySet):
+    def with_appliance_counts(self):
+        """Counts the appliances of the providers in the same query.
+
+        The load and slot properties of the providers then do not need queries of their own.
+        """
+        appliance = 'provider_templates__appliance'
+        provisioning = When(
+            Q(**{
+                appliance + '__ready': False,
+                appliance + '__marked_for_deletion': False,
+                appliance + '__ip_address': None}),
+            then=F(appliance + '__id'))
+        return self.annotate(
+            appliance_count=Count(appliance, distinct=True),
+            provisioning_appliance_count=Count(Case(provisioning), distinct=True))
+
+
 class DelayedProvisionTask(MetadataMixin):
     pool = models.ForeignKey("AppliancePool", on_delete=models.CASCADE)
     lease_time = models.IntegerField(null=True, blank=True)
@@ -163,9 +229,25 @@ class Provider(MetadataMixin):
 
     provider_type = models.CharField(max_length=16, null=True, blank=True)
 
+    objects = ProviderQuerySet.as_manager()
+
     class Meta:
         ordering = ['id']
 
+    @classmethod
+    def capacities(cls):
+        """All providers with their appliance counts by id, from one query.
+
+        Inside :py:func:`provider_capacity_memo` the query runs only the first time.
+        """
+        providers = getattr(_capacity_memo, 'providers', None)
+        if providers is None:
+            providers = {provider.id: provider
+                         for provider in cls.objects.with_appliance_counts()}
+            if hasattr(_capacity_memo, 'providers'):
+                _capacity_memo.providers = providers
+        return providers
+
     def perf_sync(self):
         try:
             stats = self.api.usage_and_quota()
@@ -199,13 +281,15 @@ class Provider(MetadataMixin):
 
     @property
     def num_currently_provisioning(self):
-        return len(
-            Appliance.objects.filter(
-                ready=False, marked_for_deletion=False, template__provider=self, ip_address=None))
+        if hasattr(self, 'provisioning_appliance_count'):
+            return self.provisioning_appliance_count
+        return Appliance.objects.filter(
+            ready=False, marked_for_deletion=False, template__provider=self,
+            ip_address=None).count()
 
     @property
     def num_templates_preparing(self):
-        return len(Template.objects.filter(provider=self, ready=False))
+        return Template.objects.filter(provider=self, ready=False).count()
 
     @property
     def remaining_configuring_slots(self):
@@ -225,7 +309,9 @@ class Provider(MetadataMixin):
 
     @property
     def num_currently_managing(self):
-        return len(Appliance.objects.filter(template__provider=self))
+        if hasattr(self, 'appliance_count'):
+            return self.appliance_count
+        return Appliance.objects.filter(template__provider=self).count()
 
     @property
     def currently_managed_appliances(self):
@@ -1116,6 +1202,19 @@ class Appliance(MetadataMixin):
             return None
 
 
+@receiver(post_save, sender=Appliance)
+def count_new_appliance_in_capacity_memo(sender, instance, created, **kwargs):
+    providers = getattr(_capacity_memo, 'providers', None)
+    if not created or providers is None:
+        return
+    provider = providers.get(instance.template.provider_id)
+    if provider is None:
+        return
+    provider.appliance_count += 1
+    if not instance.ready and not instance.marked_for_deletion and instance.ip_address is None:
+        provider.provisioning_appliance_count += 1
+
+
 class AppliancePool(MetadataMixin):
     total_count = models.IntegerField(help_text="How many appliances should be in this pool.")
     group = models.ForeignKey(
@@ -1316,11 +1415,17 @@ class AppliancePool(MetadataMixin):
     @property
     def possible_templates(self):
         q = Template.objects.filter(ready=True, exists=True, usable=True,
-                    **self.filter_params).select_related('provider').distinct().order_by()
+                    **self.filter_params).distinct().order_by()
+        providers = Provider.capacities()
+        templates = []
+        for template in q:
+            # Their providers know their load without further queries
+            template.provider = providers[template.provider_id]
+            templates.append(template)
         if self.provider_type is None:
-            return list(q)
+            return templates
         else:
-            return [t for t in q if t.provider.provider_type == self.provider_type]
+            return [t for t in templates if t.provider.provider_type == self.provider_type]
 
     @property
     def possible_provisioning_templates(self):
@@ -1349,36 +1454,52 @@ class AppliancePool(MetadataMixin):
     def current_count(self):
         return len(self.appliances)
 
-    @property
-    def percent_finished(self):
+    def _appliance_counts(self):
+        """Counts the appliances of the pool by their progress in one query"""
+        return self.appliances.order_by().aggregate(
+            total=Count('id'),
+            known_power=Count(Case(When(
+                ~Q(power_state__in=[Appliance.Power.UNKNOWN, Appliance.Power.ORPHANED]),
+                then=1))),
+            powered_on=Count(Case(When(power_state=Appliance.Power.ON, then=1))),
+            with_ip=Count(Case(When(ip_address__isnull=False, then=1))),
+            ready=Count(Case(When(ready=True, then=1))))
+
+    def _percent_finished(self, counts):
         if self.total_count is None:
             return 0.0
         total = 4 * self.total_count
         if total == 0:
             return 1.0
-        finished = 0
-        for appliance in self.appliances:
-            if appliance.power_state not in {Appliance.Power.UNKNOWN, Appliance.Power.ORPHANED}:
-                finished += 1
-            if appliance.power_state == Appliance.Power.ON:
-                finished += 1
-            if appliance.ip_address is not None:
-                finished += 1
-            if appliance.ready:
-                finished += 1
+        finished = (
+            counts['known_power'] + counts['powered_on'] + counts['with_ip'] + counts['ready'])
         return float(finished) / float(total)
 
+    def _fulfilled(self, counts):
+        return counts['with_ip'] == self.total_count and counts['ready'] == counts['total']
+
+    @property
+    def percent_finished(self):
+        return self._percent_finished(self._appliance_counts())
+
     @property
     def appliance_ips(self):
         return [ap.ip_address for ap in filter(lambda a: a.ip_address is not None, self.appliances)]
 
     @property
     def fulfilled(self):
-        try:
-            return len(self.appliance_ips) == self.total_count\
-                and all(a.ready for a in self.appliances)
-        except ObjectDoesNotExist:
-            return False
+        return self._fulfilled(self._appliance_counts())
+
+    def state(self):
+        """Progress of the pool, what :py:data:`pool_state_changed` tells about"""
+        counts = self._appliance_counts()
+        return {
+            'fulfilled': self._fulfilled(counts),
+            'finished': self.finished,
+            'progress': int(round(self._percent_finished(counts) * 100)),
+            'appliances': counts['total'],
+            'ready': counts['ready'],
+        }
 
     @property
     def broken_with_no_appliances(self):
@@ -1504,6 +1625,88 @@ class AppliancePool(MetadataMixin):
             self.id, self.group.id, self.total_count)
 
 
+#: Sent when the :py:meth:`AppliancePool.state` of a pool changes, with its new ``state`` and the
+#: ``previous`` one. The states carry a ``version``, increased by every change.
+pool_state_changed = Signal(providing_args=['pool_id', 'state', 'previous'])
+
+#: Redis channel the changed pool states are published on as JSON
+POOL_STATE_CHANNEL = 'sprout-pool-state-{}'
+POOL_STATE_CACHE_TIME = 7 * 24 * 3600
+#: Appliance fields the state of its pool depends on
+POOL_STATE_FIELDS = {'appliance_pool', 'power_state', 'ip_address', 'ready'}
+
+
+def _pool_state_key(pool_id):
+    return 'pool-state-{}'.format(pool_id)
+
+
+def pool_state_version(pool_id):
+    """Version of the last known state of the pool, 0 if there is none"""
+    return (cache.get(_pool_state_key(pool_id)) or {}).get('version', 0)
+
+
+def update_pool_state(pool_id):
+    """Recomputes the state of the pool and sends :py:data:`pool_state_changed` if it changed.
+
+    Runs when an appliance of the pool changes, so nothing has to check the pools periodically.
+    """
+    key = _pool_state_key(pool_id)
+    try:
+        pool = AppliancePool.objects.get(id=pool_id)
+    except ObjectDoesNotExist:
+        cache.delete(key)
+        return
+    state = pool.state()
+    previous = cache.get(key) or {}
+    if state == {k: v for k, v in previous.items() if k != 'version'}:
+        return
+    state['version'] = previous.get('version', 0) + 1
+    cache.set(key, state, POOL_STATE_CACHE_TIME)
+    pool_state_changed.send(sender=AppliancePool, pool_id=pool_id, state=state, previous=previous)
+
+
+def _update_pool_state_on_commit(pool_id):
+    # The state must be computed from what the others can see
+    transaction.on_commit(lambda: update_pool_state(pool_id))
+
+
+@receiver(post_init, sender=Appliance)
+def remember_appliance_pool(sender, instance, **kwargs):
+    # __dict__ so that deferred fields are not loaded
+    instance._loaded_pool_id = instance.__dict__.get('appliance_pool_id')
+
+
+@receiver(post_save, sender=Appliance)
+def appliance_saved_update_pool_state(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not POOL_STATE_FIELDS.intersection(update_fields):
+        return
+    pool_ids = {instance.appliance_pool_id, getattr(instance, '_loaded_pool_id', None)}
+    instance._loaded_pool_id = instance.appliance_pool_id
+    for pool_id in pool_ids - {None}:
+        _update_pool_state_on_commit(pool_id)
+
+
+@receiver(post_delete, sender=Appliance)
+def appliance_deleted_update_pool_state(sender, instance, **kwargs):
+    if instance.appliance_pool_id is not None:
+        _update_pool_state_on_commit(instance.appliance_pool_id)
+
+
+@receiver(post_save, sender=AppliancePool)
+def pool_saved_update_pool_state(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'finished', 'total_count'}.intersection(update_fields):
+        _update_pool_state_on_commit(instance.id)
+
+
+@receiver(pool_state_changed)
+def publish_pool_state(sender, pool_id, state, **kwargs):
+    try:
+        redis_client.publish(POOL_STATE_CHANNEL.format(pool_id), json.dumps(state))
+    except RedisError as e:
+        AppliancePool.class_logger(pool_id).warning(
+            'Could not publish the pool state: {}'.format(e))
+
+
 class MismatchVersionMailer(models.Model):
     provider = models.ForeignKey(Provider, on_delete=models.CASCADE)
     template_name = models.CharField(max_length=64)
@@ -8,13 +8,14 @@ import iso8601
 import random
 import re
 import command
+import time
 import yaml
 from contextlib import closing
-from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.mail import send_mail
 from django.db import transaction
 from django.db.models import Q
+from django.dispatch import receiver
 from django.utils import timezone
 from celery import chain, chord, shared_task
 from celery.exceptions import MaxRetriesExceededError
@@ -26,9 +27,10 @@ from paramiko import SSHException
 from urllib2 import urlopen, HTTPError
 import socket
 
+from appliances.locks import LOCK_LEASE, TaskLock, record_metrics
 from appliances.models import (
     Provider, Group, Template, Appliance, AppliancePool, DelayedProvisionTask,
-    MismatchVersionMailer, User, GroupShepherd)
+    MismatchVersionMailer, User, GroupShepherd, pool_state_changed, provider_capacity_memo)
 from sprout import settings, redis
 from sprout.irc_bot import send_message
 from sprout.log import create_logger
@@ -42,7 +44,6 @@ from cfme.utils.version import Version
 from cfme.utils.wait import wait_for
 
 
-LOCK_EXPIRE = 60 * 15  # 15 minutes
 VERSION_REGEXPS = [
     r"^cfme-(\d)(\d)(\d)(\d)(\d{2})",  # 1.2.3.4.11
     # newer format
@@ -107,10 +108,23 @@ def logged_task(*args, **kwargs):
 
 
 def singleton_task(*args, **kwargs):
+    """Task that runs only once at a time for the same arguments
+
+    Keyword Args:
+        wait: whether the run retries later when another one is running, instead of giving up
+        wait_countdown: seconds between the retries
+        wait_retries: how many times the run retries
+        coalesce: whether the run asks the one in progress to run once more after it, instead of
+            giving up. For the tasks that synchronize some state, a run that started before the
+            state changed can miss the change.
+        lease: seconds the lock stays held if the worker holding it dies
+    """
     kwargs["bind"] = True
     wait = kwargs.pop('wait', False)
     wait_countdown = kwargs.pop('wait_countdown', 10)
     wait_retries = kwargs.pop('wait_retries', 30)
+    coalesce = kwargs.pop('coalesce', False)
+    lease = kwargs.pop('lease', LOCK_LEASE)
 
     def f(task):
         @wraps(task)
@@ -121,9 +135,14 @@ def singleton_task(*args, **kwargs):
             keys = sorted(kwargs.keys())
             digest_base += "//" + "/".join("{}={}".format(key, kwargs[key]) for key in keys)
             digest = hashlib.sha256(digest_base).hexdigest()
-            lock_id = '{0}-lock-{1}'.format(self.name, digest)
-
-            if cache.add(lock_id, 'true', LOCK_EXPIRE):
+            lock = TaskLock('{0}-lock-{1}'.format(self.name, digest), lease)
+
+            start = time.time()
+            acquired = lock.acquire_or_defer() if coalesce else lock.acquire()
+            if acquired:
+                record_metrics(
+                    self.name, runs=1,
+                    wait_ms=1000 * (lock.acquired_at - (lock.requested_at or start)))
                 try:
                     return task(self, *args, **kwargs)
                 except Exception as e:
@@ -133,10 +152,18 @@ def singleton_task(*args, **kwargs):
                     self.logger.exception(e)
                     raise
                 finally:
-                    cache.delete(lock_id)
+                    record_metrics(self.name, hold_ms=1000 * lock.release(), lost=lock.lost)
+                    if coalesce and lock.take_pending() is not None:
+                        self.logger.info("Running again for the calls made meanwhile.")
+                        self.apply_async(args=args, kwargs=kwargs)
+            elif coalesce:
+                record_metrics(self.name, coalesced=1)
+                self.logger.info("Another instance of the task will run again after it ends.")
             elif wait:
                 self.logger.info("Waiting for another instance of the task to end.")
                 self.retry(args=args, countdown=wait_countdown, max_retries=wait_retries)
+            else:
+                record_metrics(self.name, dropped=1)
 
         return shared_task(*args, **kwargs)(wrapped_task)
     return f
@@ -622,29 +649,59 @@ def request_appliance_pool(self, appliance_pool_id, time_minutes):
     self.logger.info(
         "Appliance pool {} requested for {} minutes.".format(appliance_pool_id, time_minutes))
     pool = AppliancePool.objects.get(id=appliance_pool_id)
+    with pool.edit_metadata as metadata:
+        # For finish_fulfilled_pool
+        metadata['lease_time'] = time_minutes
     n = Appliance.give_to_pool(pool)
-    for i in range(pool.total_count - n):
-        tpls = pool.possible_provisioning_templates
-        if tpls:
-            template_id = tpls[0].id
-            clone_template_to_pool(template_id, pool.id, time_minutes)
-        else:
-            with transaction.atomic():
-                task = DelayedProvisionTask(pool=pool, lease_time=time_minutes)
-                task.save()
+    with provider_capacity_memo():
+        for i in range(pool.total_count - n):
+            tpls = pool.possible_provisioning_templates
+            if tpls:
+                template_id = tpls[0].id
+                clone_template_to_pool(template_id, pool.id, time_minutes)
+            else:
+                with transaction.atomic():
+                    task = DelayedProvisionTask(pool=pool, lease_time=time_minutes)
+                    task.save()
     apply_lease_times_after_pool_fulfilled.delay(appliance_pool_id, time_minutes)
 
 
+def finish_pool(pool, time_minutes):
+    """Marks the fulfilled pool finished and applies the lease times, unless it was done already"""
+    with transaction.atomic():
+        pool = AppliancePool.objects.select_for_update().get(id=pool.id)
+        if pool.finished:
+            return
+        pool.finished = True
+        pool.save(update_fields=['finished'])
+    for appliance in pool.appliances:
+        apply_lease_times.delay(appliance.id, time_minutes)
+    rename_appliances_for_pool.delay(pool.id)
+
+
+@receiver(pool_state_changed)
+def finish_pool_when_fulfilled(sender, pool_id, state, previous, **kwargs):
+    if state['fulfilled'] and not state['finished'] and not previous.get('fulfilled'):
+        finish_fulfilled_pool.delay(pool_id)
+
+
+@singleton_task()
+def finish_fulfilled_pool(self, appliance_pool_id):
+    """Finishes the pool as soon as its last appliance gets ready"""
+    pool = AppliancePool.objects.get(id=appliance_pool_id)
+    time_minutes = pool.metadata.get('lease_time')
+    if time_minutes is not None and pool.fulfilled:
+        finish_pool(pool, time_minutes)
+
+
 @singleton_task()
 def apply_lease_times_after_pool_fulfilled(self, appliance_pool_id, time_minutes):
+    """Finishes the pool if the pool state change did not, it is only checked once in a while"""
     pool = AppliancePool.objects.get(id=appliance_pool_id)
+    if pool.finished:
+        return
     if pool.fulfilled:
-        for appliance in pool.appliances:
-            apply_lease_times.delay(appliance.id, time_minutes)
-        rename_appliances_for_pool.delay(pool.id)
-        with transaction.atomic():
-            pool.finished = True
-            pool.save(update_fields=['finished'])
+        finish_pool(pool, time_minutes)
     else:
         # Look whether we can swap any provisioning appliance with some in shepherd
         unfinished = list(
@@ -659,7 +716,7 @@ def apply_lease_times_after_pool_fulfilled(self, appliance_pool_id, time_minutes
                     appl.appliance_pool = None
                     appl.save(update_fields=['appliance_pool'])
         try:
-            self.retry(args=(appliance_pool_id, time_minutes), countdown=30, max_retries=120)
+            self.retry(args=(appliance_pool_id, time_minutes), countdown=120, max_retries=30)
         except MaxRetriesExceededError:  # Bad luck, pool fulfillment failed. So destroy it.
             pool.logger.error("Waiting for fulfillment failed. Initiating the destruction process.")
             pool.kill()
@@ -1109,7 +1166,7 @@ def refresh_appliances(self):
         refresh_appliances_provider.delay(provider.id)
 
 
-@singleton_task(soft_time_limit=180)
+@singleton_task(soft_time_limit=180, coalesce=True)
 def refresh_appliances_provider(self, provider_id):
     """Downloads the list of VMs from the provider, then matches them by name or UUID with
     appliances stored in database.
@@ -1301,12 +1358,14 @@ def generic_shepherd(self, preconfigured):
                 rnd=fauxfactory.gen_alphanumeric(8))
             with transaction.atomic():
                 # Now look for templates that are on non-busy providers
+                providers = Provider.capacities()
                 tpl_free = filter(
-                    lambda t: t.provider.free,
+                    lambda t: providers[t.provider_id].free,
                     possible_templates_for_provision)
                 if tpl_free:
                     appliance = Appliance(
-                        template=sorted(tpl_free, key=lambda t: t.provider.appliance_load)[0],
+                        template=sorted(
+                            tpl_free, key=lambda t: providers[t.provider_id].appliance_load)[0],
                         name=new_appliance_name)
                     appliance.save()
             if tpl_free:
@@ -1337,10 +1396,11 @@ def generic_shepherd(self, preconfigured):
                     Appliance.kill(a)
 
 
-@singleton_task()
+@singleton_task(coalesce=True)
 def free_appliance_shepherd(self):
-    generic_shepherd(self, True)
-    generic_shepherd(self, False)
+    with provider_capacity_memo():
+        generic_shepherd(self, True)
+        generic_shepherd(self, False)
 
 
 @singleton_task()
@@ -1794,7 +1854,7 @@ def parsedate(d):
         return iso8601.parse_date(d)
 
 
-@singleton_task()
+@singleton_task(coalesce=True)
 def synchronize_untracked_vms_in_provider(self, provider_id):
     """'re'-synchronizes any vms that might be lost during outages."""
     provider = Provider.objects.get(id=provider_id, working=True, disabled=False)
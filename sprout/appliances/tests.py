@@ -1,4 +1,348 @@
 # -*- coding: utf-8 -*-
-# from django.test import TestCase
+import json
+import threading
+import time
+from datetime import date
+from importlib import import_module
 
-# Create your tests here.
+import yaml
+from django.apps import apps
+from django.contrib.auth.models import User, Group as DjangoGroup
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from appliances import models
+from appliances.locks import TaskLock, lock_metrics, record_metrics
+from appliances.models import (
+    Appliance, AppliancePool, Group, Provider, Template, pool_state_changed,
+    pool_state_version, provider_capacity_memo, publish_pool_state)
+from appliances.tasks import finish_pool_when_fulfilled
+
+
+class ProviderCapacityTest(TestCase):
+    """Query count benchmark of the provider load accounting on a big enough database"""
+    PROVIDERS = 300
+    APPLIANCES_PER_PROVIDER = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        user_group = DjangoGroup.objects.create(name='benchmark')
+        owner = User.objects.create(username='benchmark')
+        owner.groups.add(user_group)
+        group = Group.objects.create(id='downstream')
+        Provider.objects.bulk_create(
+            Provider(id='provider{:03}'.format(i), working=True, appliance_limit=20)
+            for i in range(cls.PROVIDERS))
+        Provider.user_groups.through.objects.bulk_create(
+            Provider.user_groups.through(provider_id=provider_id, group_id=user_group.id)
+            for provider_id in Provider.objects.values_list('id', flat=True))
+        Template.objects.bulk_create(
+            Template(
+                provider_id=provider_id, template_group=group, date=date.today(),
+                original_name='template', name='template', ready=True, usable=True)
+            for provider_id in Provider.objects.values_list('id', flat=True))
+        Appliance.objects.bulk_create(
+            Appliance(template_id=template_id, name='appliance{}'.format(i),
+                      ready=bool(i % 3), ip_address='10.0.0.1' if i % 3 else None)
+            for template_id in Template.objects.values_list('id', flat=True)
+            for i in range(cls.APPLIANCES_PER_PROVIDER))
+        cls.pool = AppliancePool.objects.create(total_count=1, group=group, owner=owner)
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            result = func()
+        return result, len(queries)
+
+    def test_capacities(self):
+        def per_provider_queries():
+            return [(p.free, p.appliance_load) for p in Provider.objects.all()]
+
+        def aggregated():
+            return [(p.free, p.appliance_load) for p in Provider.capacities().values()]
+
+        expected, n_per_provider = self.count_queries(per_provider_queries)
+        result, n_aggregated = self.count_queries(aggregated)
+        self.assertEqual(sorted(result), sorted(expected))
+        self.assertEqual(n_aggregated, 1)
+        self.assertGreater(n_per_provider, self.PROVIDERS)
+        provider = Provider.capacities()['provider000']
+        self.assertEqual(provider.num_currently_managing, self.APPLIANCES_PER_PROVIDER)
+        self.assertEqual(provider.num_currently_provisioning, 4)
+
+    def test_possible_provisioning_templates(self):
+        def possible_provisioning_templates():
+            return self.pool.possible_provisioning_templates
+
+        templates, queries = self.count_queries(possible_provisioning_templates)
+        self.assertEqual(len(templates), self.PROVIDERS)
+        self.assertLess(queries, 5)
+
+    def test_capacity_memo(self):
+        with provider_capacity_memo():
+            self.assertIs(Provider.capacities(), Provider.capacities())
+            template = Template.objects.get(provider_id='provider000')
+            Appliance(template=template, name='new').save()
+            provider = Provider.capacities()['provider000']
+            self.assertEqual(provider.num_currently_managing, self.APPLIANCES_PER_PROVIDER + 1)
+            self.assertEqual(provider.num_currently_provisioning, 5)
+        self.assertIsNot(Provider.capacities(), Provider.capacities())
+
+
+class MetadataTest(TestCase):
+    """Metadata parses a shepherd cycle does, stored in YAML and in JSON"""
+    PROVIDERS = 300
+    TEMPLATES = 200
+    READS = 10
+    METADATA = {
+        'templates': ['template-{:04}'.format(i) for i in range(TEMPLATES)],
+        'provider_data': {'type': 'virtualcenter', 'ipaddress': '10.0.0.1', 'sprout': {}},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        Provider.objects.bulk_create(
+            Provider(id='provider{:03}'.format(i), object_meta_data=yaml.dump(cls.METADATA))
+            for i in range(cls.PROVIDERS))
+
+    def shepherd_cycle(self, read):
+        """Returns what the metadata was parsed from during the cycle"""
+        parsed = []
+        load_metadata = models.load_metadata
+
+        def counting_load_metadata(data):
+            parsed.append(data)
+            return load_metadata(data)
+
+        models.load_metadata = counting_load_metadata
+        try:
+            for provider in Provider.objects.all():
+                for _ in range(self.READS):
+                    self.assertIn('template-0000', read(provider)['templates'])
+        finally:
+            models.load_metadata = load_metadata
+        return parsed
+
+    def test_metadata_json(self):
+        # The metadata used to be parsed on every access
+        parsed = self.shepherd_cycle(
+            lambda provider: models.load_metadata(provider.object_meta_data))
+        self.assertEqual(len(parsed), self.PROVIDERS * self.READS)
+        # Now once for each instance, YAML until the rows are converted
+        parsed = self.shepherd_cycle(lambda provider: provider.metadata)
+        self.assertEqual(len(parsed), self.PROVIDERS)
+        self.assertRaises(ValueError, json.loads, parsed[0])
+        migration = import_module('appliances.migrations.0049_metadata_json')
+        migration.yaml_to_json(apps, type('SchemaEditor', (object, ), {'connection': connection}))
+        parsed = self.shepherd_cycle(lambda provider: provider.metadata)
+        self.assertEqual(len(parsed), self.PROVIDERS)
+        for data in parsed:
+            self.assertEqual(json.loads(data), self.METADATA)
+
+    def test_metadata_reads_yaml(self):
+        provider = Provider.objects.first()
+        self.assertEqual(provider.metadata, self.METADATA)
+        provider.metadata = dict(self.METADATA, template_name_length=20)
+        self.assertEqual(provider.template_name_length, 20)
+        self.assertEqual(json.loads(provider.object_meta_data)['template_name_length'], 20)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PoolStateTest(TransactionTestCase):
+    """The pool state changes are signalled when the appliances change, not found by polling"""
+    COUNT = 3
+
+    def setUp(self):
+        self.changes = []
+        pool_state_changed.disconnect(publish_pool_state)
+        pool_state_changed.disconnect(finish_pool_when_fulfilled)
+        pool_state_changed.connect(self.record_change)
+        owner = User.objects.create(username='pool-owner')
+        group = Group.objects.create(id='downstream')
+        provider = Provider.objects.create(id='provider', working=True)
+        template = Template.objects.create(
+            provider=provider, template_group=group, date=date.today(),
+            original_name='template', name='template', ready=True, usable=True)
+        self.pool = AppliancePool.objects.create(
+            total_count=self.COUNT, group=group, owner=owner)
+        self.appliances = [
+            Appliance.objects.create(
+                template=template, appliance_pool=self.pool, name='appliance{}'.format(i))
+            for i in range(self.COUNT)]
+
+    def tearDown(self):
+        pool_state_changed.disconnect(self.record_change)
+        pool_state_changed.connect(publish_pool_state)
+        pool_state_changed.connect(finish_pool_when_fulfilled)
+
+    def record_change(self, sender, pool_id, state, previous, **kwargs):
+        self.changes.append((time.time(), state, previous))
+
+    def fulfilled_changes(self):
+        return [
+            (when, state) for when, state, previous in self.changes
+            if state['fulfilled'] and not previous.get('fulfilled')]
+
+    def test_fulfilled_signalled_once(self):
+        for appliance in self.appliances:
+            appliance.ip_address = '10.0.0.1'
+            appliance.save(update_fields=['ip_address'])
+        self.assertEqual(self.fulfilled_changes(), [])
+        for appliance in self.appliances:
+            appliance.ready = True
+            saved_at = time.time()
+            appliance.save(update_fields=['ready'])
+            saved = time.time()
+        (fulfilled_at, state), = self.fulfilled_changes()
+        # Signalled by the save itself, not by anything that runs later
+        self.assertTrue(saved_at <= fulfilled_at <= saved)
+        self.assertEqual(state['ready'], self.COUNT)
+        self.assertEqual(pool_state_version(self.pool.id), state['version'])
+        # Saving what does not change the state signals nothing
+        changes = len(self.changes)
+        for appliance in self.appliances:
+            appliance.save()
+            appliance.status = 'Idle'
+            appliance.save(update_fields=['status'])
+        self.assertEqual(len(self.changes), changes)
+
+    def test_finished_signalled(self):
+        version = pool_state_version(self.pool.id)
+        self.pool.finished = True
+        self.pool.save(update_fields=['finished'])
+        state = self.changes[-1][1]
+        self.assertTrue(state['finished'])
+        self.assertEqual(state['version'], version + 1)
+
+
+class BatchApiTest(TestCase):
+    """Several calls in one request, each with a result of its own"""
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create(username='api-user')
+        owner.set_password('secret')
+        owner.save()
+        cls.pool = AppliancePool.objects.create(
+            total_count=0, group=Group.objects.create(id='downstream'), owner=owner)
+
+    def post(self, data):
+        response = self.client.post('/appliances/api', json.dumps(data), 'application/json')
+        return json.loads(response.content)
+
+    def call(self, method, *args, **kwargs):
+        return {
+            'method': method, 'args': args, 'kwargs': kwargs, 'auth': ['api-user', 'secret']}
+
+    def test_batch(self):
+        responses = self.post([
+            self.call('request_check', self.pool.id),
+            self.call('no_such_method'),
+            self.call('request_check', self.pool.id + 1),
+            dict(self.call('request_check', self.pool.id), auth=['api-user', 'wrong']),
+        ])
+        self.assertEqual(
+            [response['status'] for response in responses],
+            ['success', 'exception', 'exception', 'autherror'])
+        self.assertTrue(responses[0]['result']['fulfilled'])
+        self.assertEqual(responses[1]['result']['class'], 'NameError')
+        self.assertEqual(responses[2]['result']['class'], 'DoesNotExist')
+
+    def test_single_call(self):
+        response = self.post(self.call('request_check', self.pool.id))
+        self.assertEqual(response['status'], 'success')
+        self.assertEqual(response['result']['appliances'], [])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TaskLockTest(TestCase):
+    """Runs of a singleton task from many workers at once"""
+    WORKERS = 20
+
+    def setUp(self):
+        self.running = []
+        self.runs = []
+        self.deferred = []
+
+    def run_task(self, key, duration=0.01, hold=None):
+        # What singleton_task does for a task with coalesce=True
+        lock = TaskLock(key, lease=0.3)
+        called = time.time()
+        if not lock.acquire_or_defer():
+            self.deferred.append(called)
+            return
+        try:
+            self.running.append(lock.owner)
+            self.runs.append((time.time(), len(self.running)))
+            time.sleep(duration)
+            if hold is not None:
+                hold.wait()
+            self.running.remove(lock.owner)
+        finally:
+            lock.release()
+        if lock.take_pending() is not None:
+            self.run_task(key, duration)
+
+    def start_workers(self, target, count):
+        workers = [threading.Thread(target=target) for _ in range(count)]
+        for worker in workers:
+            worker.start()
+        return workers
+
+    def test_contended_runs_coalesce(self):
+        hold = threading.Event()
+        holder, = self.start_workers(lambda: self.run_task('task', hold=hold), 1)
+        while not self.runs:
+            time.sleep(0.01)
+        for worker in self.start_workers(lambda: self.run_task('task'), self.WORKERS):
+            worker.join()
+        self.assertEqual(len(self.deferred), self.WORKERS)
+        hold.set()
+        holder.join()
+        # The runs of all the workers were done by one follow-up run
+        self.assertEqual(len(self.runs), 2)
+
+    def test_concurrent_runs(self):
+        def worker():
+            for _ in range(5):
+                self.run_task('task')
+
+        for thread in self.start_workers(worker, self.WORKERS):
+            thread.join()
+        # Never more than one at a time, and every deferred run was covered by a later one
+        self.assertEqual(max(running for started, running in self.runs), 1)
+        self.assertGreater(max(started for started, running in self.runs), max(self.deferred))
+        # The deferred calls coalesced into fewer runs
+        self.assertLess(len(self.runs), 5 * self.WORKERS)
+
+    def test_lease(self):
+        lock = TaskLock('task', lease=0.3)
+        self.assertTrue(lock.acquire())
+        # The heartbeat keeps the lock past its lease
+        time.sleep(0.5)
+        self.assertFalse(TaskLock('task', lease=0.3).acquire())
+        self.assertGreaterEqual(lock.release(), 0.5)
+        self.assertFalse(lock.lost)
+        # A dead worker does not renew the lock, it gets free after the lease
+        dead = TaskLock('task', lease=0.3)
+        self.assertTrue(dead.acquire())
+        dead._stop.set()
+        time.sleep(0.4)
+        other = TaskLock('task', lease=0.3)
+        self.assertTrue(other.acquire())
+        dead.release()
+        self.assertTrue(dead.lost)
+        # Released by its owner only
+        self.assertFalse(TaskLock('task').acquire())
+        other.release()
+        last = TaskLock('task')
+        self.assertTrue(last.acquire())
+        last.release()
+
+    def test_metrics(self):
+        record_metrics('task', runs=1, wait_ms=2.5)
+        record_metrics('task', runs=1, dropped=1)
+        metrics = lock_metrics('task')
+        self.assertEqual(metrics['runs'], 2)
+        self.assertEqual(metrics['wait_ms'], 2)
+        self.assertEqual(metrics['dropped'], 1)
+        self.assertEqual(metrics['hold_ms'], 0)
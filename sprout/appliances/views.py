@@ -98,7 +98,8 @@ def providers(request, provider_id=None):
         except ObjectDoesNotExist:
             messages.warning(request, "Provider '{}' does not exist.".format(provider_id))
             return redirect("providers")
-    providers = Provider.objects.filter(hidden=False, **user_filter).order_by("id").distinct()
+    providers = Provider.objects.filter(
+        hidden=False, **user_filter).order_by("id").distinct().with_appliance_counts()
     return render(request, 'appliances/providers.html', locals())
 
 
@@ -319,7 +320,8 @@ def providers_for_date_group_and_version(request):
                 filters["date"] = parser.parse(date)
             providers = Template.objects.filter(**filters).values("provider").distinct()
             providers = sorted([p.values()[0] for p in providers])
-            providers = list(Provider.objects.filter(id__in=providers))
+            providers = list(
+                Provider.objects.filter(id__in=providers).with_appliance_counts())
             if provider_type is None:
                 providers = list(providers)
             else:
@@ -35,7 +35,7 @@ from widgetastic.widget import (
     ClickableMixin,
     ConditionalSwitchableView,
     do_not_read_this_widget)
-from widgetastic.xpath import quote
+from widgetastic.xpath import normalize_space, quote
 from widgetastic_patternfly import (
     Accordion as PFAccordion, BootstrapSwitch, BootstrapTreeview,
     BootstrapSelect, Button, Dropdown, Input, VerticalNavigation, Tab)
@@ -51,6 +51,39 @@ class DynamicTableAddError(Exception):
 # TODO: replace below calls with direct calls later
 ManageIQTree = BootstrapTreeview
 
+#: Functions for the scripts that read a whole widget in one call. The texts they return are raw,
+#: normalizing them is left to Python like :py:meth:`widgetastic.browser.Browser.text` does.
+READ_SCRIPT_HELPERS = '''\
+    function xpathAll(xpath, context) {
+        var result = document.evaluate(
+            xpath, context, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var nodes = [];
+        for (var i = 0; i < result.snapshotLength; i++) {
+            nodes.push(result.snapshotItem(i));
+        }
+        return nodes;
+    }
+    function text(el) {
+        return el.innerText || el.textContent || "";
+    }
+    // Cells of the rows as Table._all_rows and TableRow locate them, null for a missing row
+    function tableRows(table, rowsXpath, headerInRowsXpath, rowAtIndex) {
+        var offset = xpathAll(headerInRowsXpath, table).length > 0 ? 1 : 0;
+        var count = xpathAll(rowsXpath, table).length;
+        var rows = [];
+        for (var i = 0; i < count; i++) {
+            var row = xpathAll(rowAtIndex.split("{0}").join(String(i + offset + 1)), table)[0];
+            rows.push(row === undefined ? null : xpathAll("./td", row));
+        }
+        return rows;
+    }
+'''
+
+
+def text_lines(text):
+    """Splits a raw text read by a script into lines like WebElement.text would have them"""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
 
 class SummaryFormItem(Widget):
     """The UI item that shows the values for objects that are NOT VMs, Providers and such ones."""
@@ -101,6 +134,16 @@ class SummaryForm(Widget):
     ROOT = ParametrizedLocator(".//h3[normalize-space(.)={@group_title|quote}]")
     ALL_LABELS = "./following-sibling::div//label"
     LABEL_TEXT = "./following-sibling::div//label[normalize-space(.)={}]/following-sibling::div"
+    # Pairs of the label text and the text of its value
+    READ_SCRIPT = jsmin(READ_SCRIPT_HELPERS + '''\
+        return xpathAll(arguments[1], arguments[0]).map(function(label) {
+            var value = label.nextElementSibling;
+            while (value !== null && value.tagName.toLowerCase() !== "div") {
+                value = value.nextElementSibling;
+            }
+            return [text(label), value === null ? null : text(value)];
+        });
+        ''')
 
     def __init__(self, parent, group_title, logger=None):
         Widget.__init__(self, parent, logger=logger)
@@ -141,6 +184,25 @@ class SummaryForm(Widget):
             return multiple_lines[0]
 
     def read(self):
+        """Reads all the items with one script, falls back to reading them one by one"""
+        try:
+            items = self.browser.execute_script(
+                self.READ_SCRIPT, self.browser.element(self), self.ALL_LABELS, silent=True)
+        except WebDriverException:
+            return self._read_elements()
+        result = {}
+        for label, value in items:
+            item = normalize_space(label)
+            if item in result:
+                continue
+            elif value is None:
+                result[item] = self.get_text_of(item)
+                continue
+            lines = text_lines(value)
+            result[item] = lines if len(lines) > 1 else ''.join(lines)
+        return result
+
+    def _read_elements(self):
         return {item: self.get_text_of(item) for item in self.items}
 
 
@@ -407,6 +469,13 @@ class Table(VanillaTable):
         './thead/tr/th/div/i[contains(@class, "fa-sort-")]'])
     SORT_LINK = './thead/tr/th[{}]'
     Row = TableRow
+    # Texts of the cells in every row
+    READ_SCRIPT = jsmin(READ_SCRIPT_HELPERS + '''\
+        var rows = tableRows(arguments[0], arguments[1], arguments[2], arguments[3]);
+        return rows.map(function(cells) {
+            return cells === null ? null : cells.map(text);
+        });
+        ''')
 
     @property
     def checkbox_all(self):
@@ -484,6 +553,62 @@ class Table(VanillaTable):
             self.click_sort(column)
             self.logger.debug('sort_by(%r, %r): order already selected', column, order)
 
+    @property
+    def _reads_cell_texts(self):
+        """Whether reading a row only takes the texts of its cells, so it can be done by script"""
+        return (
+            not self.column_widgets and
+            six.get_unbound_function(self.Row.read) is
+            six.get_unbound_function(VanillaTableRow.read) and
+            six.get_unbound_function(self.Row.Column.read) is
+            six.get_unbound_function(VanillaTableColumn.read))
+
+    def read(self):
+        """Reads the texts of all the cells with one script
+
+        Tables with column widgets or customized row reading are read row by row as before.
+        """
+        if not self._reads_cell_texts:
+            return self._read_elements()
+        try:
+            rows = self.browser.execute_script(
+                self.READ_SCRIPT, self.browser.element(self), self.ROWS, self.HEADER_IN_ROWS,
+                self.ROW_AT_INDEX, silent=True)
+        except WebDriverException:
+            return self._read_elements()
+        headers = self.headers
+        if any(cells is None or len(cells) < len(headers) for cells in rows):
+            return self._read_elements()
+        rows = [
+            {i if header is None else header: normalize_space(cells[i])
+             for i, header in enumerate(headers)}
+            for cells in rows]
+        # Cut the unwanted rows if necessary
+        if self.rows_ignore_top is not None:
+            rows = rows[self.rows_ignore_top:]
+        if self.rows_ignore_bottom is not None and self.rows_ignore_bottom > 0:
+            rows = rows[:-self.rows_ignore_bottom]
+        if self.assoc_column_position is None:
+            return rows
+        result = {}
+        for row_read in rows:
+            for key in (
+                    self.header_index_mapping.get(self.assoc_column_position),
+                    self.assoc_column_position, self.assoc_column):
+                if key in row_read:
+                    key = row_read.pop(key)
+                    break
+            else:
+                raise ValueError(
+                    'The assoc_column={!r} could not be retrieved'.format(self.assoc_column))
+            if key in result:
+                raise ValueError('Duplicate value for {}={!r}'.format(key, result[key]))
+            result[key] = row_read
+        return result
+
+    def _read_elements(self):
+        return VanillaTable.read(self)
+
 
 class SummaryTable(VanillaTable):
     """Table used in Provider, VM, Host, ... summaries.
@@ -496,6 +621,18 @@ class SummaryTable(VanillaTable):
     """
     BASELOC = './/table[./thead/tr/th[contains(@align, "left") and normalize-space(.)={}]]'
     Image = namedtuple('Image', ['alt', 'title', 'src'])
+    # Class, text and rowspan of the field cell and the text of the value cell for every row
+    READ_SCRIPT = jsmin(READ_SCRIPT_HELPERS + '''\
+        var rows = tableRows(arguments[0], arguments[1], arguments[2], arguments[3]);
+        return rows.map(function(cells) {
+            if (cells === null || cells.length === 0) {
+                return null;
+            }
+            return [
+                cells[0].getAttribute("class"), text(cells[0]), cells[0].getAttribute("rowspan"),
+                cells.length > 1 ? text(cells[1]) : null];
+        });
+        ''')
 
     def __init__(self, parent, title, *args, **kwargs):
         VanillaTable.__init__(self, parent, self.BASELOC.format(quote(title)), *args, **kwargs)
@@ -580,6 +717,35 @@ class SummaryTable(VanillaTable):
         return self.get_field(field_name)[1].click()
 
     def read(self):
+        """Reads all the fields with one script, falls back to reading them one by one
+
+        Fields spanning more rows are still read by :py:meth:`get_text_of`.
+        """
+        try:
+            rows = self.browser.execute_script(
+                self.READ_SCRIPT, self.browser.element(self), self.ROWS, self.HEADER_IN_ROWS,
+                self.ROW_AT_INDEX, silent=True)
+        except WebDriverException:
+            return self._read_elements()
+        if None in rows:
+            return self._read_elements()
+        # Values as row((0, field)) finds them, that is from the first row of that name
+        values = {}
+        for klass, field, rowspan, value in rows:
+            values.setdefault(normalize_space(field), (rowspan, value))
+        result = {}
+        for klass, field, rowspan, value in rows:
+            if not klass:
+                continue
+            field = normalize_space(field)
+            rowspan, value = values[field]
+            if rowspan or value is None:
+                result[field] = self.get_text_of(field)
+            else:
+                result[field] = normalize_space(value)
+        return result
+
+    def _read_elements(self):
         return {field: self.get_text_of(field) for field in self.fields}
 
 
@@ -1277,6 +1443,10 @@ class ReportDataControllerMixin(object):
             return None
 
 
+#: The largest choice of items per page the paginators offer
+MAX_ITEMS_PER_PAGE = 1000
+
+
 class JSPaginationPane(View, ReportDataControllerMixin):
     """ Represents Paginator Pane with js api provided by ManageIQ.
 
@@ -1343,6 +1513,11 @@ class JSPaginationPane(View, ReportDataControllerMixin):
     def items_amount(self):
         return self._invoke_cmd('pagination_range')['total']
 
+    def set_max_items_per_page(self):
+        """Shows as many items per page as possible if they do not fit on one page"""
+        if int(self.items_amount) > int(self.items_per_page):
+            self.set_items_per_page(MAX_ITEMS_PER_PAGE)
+
     def pages(self):
         """Generator to iterate over pages, yielding after moving to the next page"""
         if self.exists:
@@ -1530,6 +1705,11 @@ class NonJSPaginationPane(View):
     def items_amount(self):
         return self.paginator.page_info()[2]
 
+    def set_max_items_per_page(self):
+        """Shows as many items per page as possible if they do not fit on one page"""
+        if int(self.items_amount) > self.items_per_page:
+            self.set_items_per_page(MAX_ITEMS_PER_PAGE)
+
     @property
     def min_item(self):
         return self.paginator.page_info()[0]
@@ -2943,6 +3123,15 @@ class EntitiesConditionalView(View, ReportDataControllerMixin):
     search = View.nested(Search)
     paginator = PaginationPane()
 
+    def __init__(self, *args, **kwargs):
+        View.__init__(self, *args, **kwargs)
+        # Pages the entities were seen on while surfing the pages, by name. Kept until flushed
+        self._entity_pages = {}
+
+    def flush_widget_cache(self):
+        View.flush_widget_cache(self)
+        self._entity_pages.clear()
+
     @property
     def _current_page_elements(self):
         elements = []
@@ -2976,12 +3165,45 @@ class EntitiesConditionalView(View, ReportDataControllerMixin):
         """
         return [el['name'] for el in self._current_page_elements]
 
-    def get_id_by_name(self, name):
-        for el in self._current_page_elements:
+    def get_id_by_name(self, name, elements=None):
+        if elements is None:
+            elements = self._current_page_elements
+        for el in elements:
             if el['name'] == name:
                 return el['entity_id']
         return None
 
+    def _surf_pages(self, max_items_per_page=True):
+        """Same as ``paginator.pages()``, but with as many entities per page as possible first,
+        so that going through all pages takes the least page loads
+        """
+        if max_items_per_page and self.paginator.exists:
+            self.paginator.set_max_items_per_page()
+        return self.paginator.pages()
+
+    def _page_elements(self, page):
+        """Entities of the current page, remembering they were seen on ``page``"""
+        elements = self._current_page_elements
+        for el in elements:
+            self._entity_pages[el['name']] = page
+        return elements
+
+    def _entity_on_known_page(self, name):
+        """Goes to the page the entity was seen on before and returns the entity
+
+        Returns None if the entity wasn't seen yet or isn't on that page anymore
+        """
+        page = self._entity_pages.get(name)
+        if page is None or not hasattr(self.paginator, 'go_to_page'):
+            return None
+        if self.paginator.cur_page != page:
+            self.paginator.go_to_page(page)
+        entity_id = self.get_id_by_name(name)
+        if entity_id is None:
+            self._entity_pages.clear()
+            return None
+        return self.parent.entity_class(parent=self, entity_id=entity_id)
+
     def get_entities_by_keys(self, **keys):
         # some fields aren't available in Tile or Grid View.
         # So, we decided to switch to List View mode if several keys are passed
@@ -3051,10 +3273,10 @@ class EntitiesConditionalView(View, ReportDataControllerMixin):
                                              name=el['name']) for el in self._current_page_elements]
         else:
             entities = []
-            for _ in self.paginator.pages():
+            for page in self._surf_pages():
                 entities.extend([self.parent.entity_class(parent=self, entity_id=el['entity_id'],
                                                           name=el['name'])
-                                for el in self._current_page_elements])
+                                for el in self._page_elements(page)])
             return entities
 
     def get_entity(self, surf_pages=False, use_search=False, **keys):
@@ -3066,13 +3288,20 @@ class EntitiesConditionalView(View, ReportDataControllerMixin):
 
         Returns: matched entity (QuadIcon/etc.)
         """
+        by_name = len(keys) == 1 and 'name' in keys
         if use_search and 'name' in keys:
             self.search.clear_simple_search()
             self.search.simple_search(text=keys['name'])
+            self._entity_pages.clear()
+        elif surf_pages and by_name:
+            entity = self._entity_on_known_page(keys['name'])
+            if entity is not None:
+                return entity
 
-        for _ in self.paginator.pages():
-            if len(keys) == 1 and 'name' in keys:
-                entity_id = self.get_id_by_name(name=keys['name'])
+        for page in self._surf_pages(max_items_per_page=surf_pages):
+            if by_name:
+                entity_id = self.get_id_by_name(name=keys['name'],
+                                                elements=self._page_elements(page))
             elif len(keys) == 1 and 'entity_id' in keys:
                 entity_id = keys['entity_id']
             else: